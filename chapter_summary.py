@@ -6,6 +6,8 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import logging
 
+from llm_cache import llm_cache
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -53,7 +55,8 @@ def generate_chapter_summary(
     chapter_content: str, 
     chapter_number: int = 1,
     story_context: str = "",
-    story_title: str = "Untitled Story"
+    story_title: str = "Untitled Story",
+    use_cache: bool = True
 ) -> Dict[str, Any]:
     """
     Generate a summary of a chapter using LLM.
@@ -63,6 +66,7 @@ def generate_chapter_summary(
         chapter_number: The chapter number being summarized
         story_context: Context about the story (outline, previous summaries, etc.)
         story_title: Title of the story for context
+        use_cache: Reuse the cached summary of identical input
     
     Returns:
         Dict containing the summary and metadata
@@ -106,11 +110,11 @@ def generate_chapter_summary(
         logger.info(f"🚀 SUMMARY LLM: Calling LLM chain...")
         
         try:
-            result = summary_chain.invoke({
+            result = llm_cache.invoke(summary_chain, {
                 "chapter_content": chapter_content,
                 "chapter_number": chapter_number,
                 "story_context": story_context
-            })
+            }, use_cache=use_cache)
             
             logger.info(f"✅ SUMMARY LLM: LLM chain completed successfully")
             logger.info(f"📊 SUMMARY LLM: Raw result type: {type(result)}")
@@ -37,10 +37,44 @@ class Settings:
     PORT: int = int(os.getenv("PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "False").lower() in ("true", "1", "yes")
     RELOAD: bool = os.getenv("RELOAD", "False").lower() in ("true", "1", "yes")
+    BLOCKING_CALL_GUARD: str = os.getenv("BLOCKING_CALL_GUARD", "error")
+    EVENT_LOOP_SLOW_CALLBACK_MS: float = float(os.getenv("EVENT_LOOP_SLOW_CALLBACK_MS", "0"))
     
     # Vector Store Configuration
     VECTOR_COLLECTION_NAME: str = os.getenv("VECTOR_COLLECTION_NAME", "chapter_chunks")
     VECTOR_SEARCH_K: int = int(os.getenv("VECTOR_SEARCH_K", "5"))
+    VECTOR_DIMENSIONS: int = int(os.getenv("VECTOR_DIMENSIONS", "1536"))
+    VECTOR_HNSW_EF_SEARCH: int = int(os.getenv("VECTOR_HNSW_EF_SEARCH", "0"))
+    VECTOR_IVFFLAT_PROBES: int = int(os.getenv("VECTOR_IVFFLAT_PROBES", "0"))
+    VECTOR_ITERATIVE_SCAN: str = os.getenv("VECTOR_ITERATIVE_SCAN", "")
+    VECTOR_SEARCH_PRECISION: str = os.getenv("VECTOR_SEARCH_PRECISION", "full")
+    VECTOR_RERANK_FACTOR: int = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+    VECTOR_COARSE_CHAPTERS: int = int(os.getenv("VECTOR_COARSE_CHAPTERS", "8"))
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embedding_cache.sqlite3")
+    EMBEDDING_CACHE_MAX_BYTES: int = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "10"))
+    EMBEDDING_WRITE_BATCH_SIZE: int = int(os.getenv("EMBEDDING_WRITE_BATCH_SIZE", "256"))
+    EMBEDDING_RPM: int = int(os.getenv("EMBEDDING_RPM", "3000"))
+    EMBEDDING_TPM: int = int(os.getenv("EMBEDDING_TPM", "1000000"))
+    EMBEDDING_GC_DELAY_SECONDS: float = float(os.getenv("EMBEDDING_GC_DELAY_SECONDS", "30"))
+    STORY_VECTOR_INDEX_ENABLED: bool = os.getenv("STORY_VECTOR_INDEX_ENABLED", "True").lower() in ("true", "1", "yes")
+    STORY_VECTOR_INDEX_MAX_BYTES: int = int(os.getenv("STORY_VECTOR_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+    STORY_VECTOR_INDEX_DTYPE: str = os.getenv("STORY_VECTOR_INDEX_DTYPE", "float32")
+    STORY_VECTOR_INDEX_TTL_SECONDS: float = float(os.getenv("STORY_VECTOR_INDEX_TTL_SECONDS", "300"))
+    
+    # Cache Configuration
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    CACHE_MEMORY_MAX_BYTES: int = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_CODEC: str = os.getenv("CACHE_CODEC", "msgpack")
+    CACHE_COMPRESS_THRESHOLD: int = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "4096"))
+    
+    # LLM Response Cache Configuration
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    LLM_CACHE_MAX_BYTES: int = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
     
     # CORS Configuration
     ALLOWED_ORIGINS: list[str] = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -24,6 +24,8 @@ from langchain.chains import LLMChain
 from dotenv import load_dotenv
 import os
 
+from llm_cache import llm_cache
+
 # Load environment variables
 load_dotenv()
 
@@ -142,8 +144,8 @@ SUPER-SUMMARY:"""
             
             logger.info(f"📝 Input to super-summary LLM: {len(formatted_summaries)} chars")
             
-            # Generate super-summary using LLM
-            result = self.super_summary_chain.invoke({
+            # Generate super-summary using LLM (unchanged summaries hit the cache)
+            result = llm_cache.invoke(self.super_summary_chain, {
                 "chapter_summaries": formatted_summaries,
                 "start_chapter": start_chapter,
                 "end_chapter": end_chapter
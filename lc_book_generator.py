@@ -7,6 +7,8 @@ import json
 import logging
 from typing import Dict, Any, Optional
 
+from llm_cache import llm_cache
+
 # Load environment variables from .env
 load_dotenv()
 
@@ -244,8 +246,8 @@ class BookStoryGenerator:
         self.chain = chain
         logger.info("🚀 BookStoryGenerator initialized with JSON support")
     
-    def generate_chapter(self, outline: str, chapter_number: int = 1) -> Dict[str, Any]:
-        """Generate a chapter from either text outline or JSON outline."""
+    def generate_chapter(self, outline: str, chapter_number: int = 1, use_cache: bool = True) -> Dict[str, Any]:
+        """Generate a chapter from either text outline or JSON outline (use_cache=False to regenerate)."""
         logger.info(f"📖 Generating Chapter {chapter_number}...")
         
         try:
@@ -264,7 +266,11 @@ class BookStoryGenerator:
                 logger.info("-" * 50)
                 
                 # Generate chapter
-                result = self.chain.invoke({"outline": formatted_outline, "chapter_number": chapter_number})
+                result = llm_cache.invoke(
+                    self.chain,
+                    {"outline": formatted_outline, "chapter_number": chapter_number},
+                    use_cache=use_cache
+                )
                 
                 logger.info(f"✅ Chapter {chapter_number} generated successfully!")
                 logger.info(f"📊 Generated content length: {len(result.content)} characters")
@@ -281,7 +287,11 @@ class BookStoryGenerator:
                 logger.info(outline[:500] + "..." if len(outline) > 500 else outline)
                 logger.info("-" * 50)
                 
-                result = self.chain.invoke({"outline": outline, "chapter_number": chapter_number})
+                result = llm_cache.invoke(
+                    self.chain,
+                    {"outline": outline, "chapter_number": chapter_number},
+                    use_cache=use_cache
+                )
                 
                 logger.info(f"✅ Chapter {chapter_number} generated successfully!")
                 logger.info(f"📊 Generated content length: {len(result.content)} characters")
@@ -387,8 +397,13 @@ class BookStoryGenerator:
                 "error": f"Parsing error: {str(e)}"
             }
     
-    def generate_chapter_from_json(self, json_outline: Dict[str, Any], chapter_number: int = 1) -> Dict[str, Any]:
-        """Generate a chapter specifically from JSON outline data."""
+    def generate_chapter_from_json(
+        self,
+        json_outline: Dict[str, Any],
+        chapter_number: int = 1,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """Generate a chapter specifically from JSON outline data (use_cache=False to regenerate)."""
         logger.info(f"📖 Generating Chapter {chapter_number} from JSON data...")
         
         # Log the JSON we received
@@ -401,7 +416,11 @@ class BookStoryGenerator:
             formatted_outline = extract_chapter_info_from_json(json_outline, chapter_number)
             
             # Generate chapter
-            result = self.chain.invoke({"outline": formatted_outline, "chapter_number": chapter_number})
+            result = llm_cache.invoke(
+                self.chain,
+                {"outline": formatted_outline, "chapter_number": chapter_number},
+                use_cache=use_cache
+            )
             
             logger.info(f"✅ Chapter {chapter_number} generated from JSON successfully!")
             logger.info(f"📊 Generated content length: {len(result.content)} characters")
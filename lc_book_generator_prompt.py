@@ -6,6 +6,8 @@ import os
 import json
 from typing import Dict, Any, List, Optional
 
+from llm_cache import llm_cache
+
 # Load environment variables from .env
 load_dotenv()
 
@@ -291,9 +293,11 @@ def format_json_to_display_text(outline_json: Dict[str, Any]) -> str:
     except Exception as e:
         return f"❌ Error formatting outline: {str(e)}"
 
-def generate_book_outline_json(idea: str) -> Dict[str, Any]:
+def generate_book_outline_json(idea: str, use_cache: bool = True) -> Dict[str, Any]:
     """
     Generate book outline and return both JSON and extracted metadata with LLM usage metrics.
+    
+    Pass use_cache=False to get a fresh outline for an idea that was seen before.
     """
     try:
         # Capture LLM parameters for metrics (all dynamic from actual LLM object)
@@ -306,7 +310,7 @@ def generate_book_outline_json(idea: str) -> Dict[str, Any]:
         input_word_count = len(input_text.split())
         
         # Generate the outline
-        result = chain.invoke({"idea": idea})
+        result = llm_cache.invoke(chain, {"idea": idea}, use_cache=use_cache)
         raw_response = result.content.strip()
         
         # Calculate output metrics
@@ -9,6 +9,7 @@ import json # Added for JSON parsing
 
 # Import the new hierarchical summarization module
 from hierarchial_summarizer import get_smart_context_for_chapter, hierarchical_summarizer
+from llm_cache import llm_cache
 
 # Load environment variables
 load_dotenv()
@@ -160,7 +161,8 @@ class NextChapterGenerator:
         story_outline: str, 
         previous_chapter_summaries: List[str], 
         chapter_number: int,
-        user_choice: str = ""
+        user_choice: str = "",
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Generate the next chapter in a story using hierarchical summarization for optimal context.
@@ -171,6 +173,7 @@ class NextChapterGenerator:
             previous_chapter_summaries: List of summaries from all previous Chapters
             chapter_number: The chapter number to generate
             user_choice: The user's selected choice from the previous chapter
+            use_cache: Reuse the cached chapter for identical input; False regenerates
             
         Returns:
             Dict containing chapter content, choices, and token usage metrics
@@ -214,13 +217,13 @@ class NextChapterGenerator:
             logger.info(f"📊 TOKEN TRACKING: Input prompt: {input_word_count} words (~{estimated_input_tokens} tokens)")
             
             # Generate the chapter using the smart context
-            result = self.chain.invoke({
+            result = llm_cache.invoke(self.chain, {
                 "story_title": story_title,
                 "story_outline": story_outline,
                 "previous_summaries": smart_context,
                 "chapter_number": chapter_number,
                 "user_choice": user_choice or "No specific choice - continue story naturally"
-            })
+            }, use_cache=use_cache)
             
             generated_response = result.content.strip()
             
@@ -398,7 +401,8 @@ def generate_next_chapter(
     story_outline: str, 
     previous_chapter_summaries: List[str], 
     chapter_number: int,
-    user_choice: str = ""
+    user_choice: str = "",
+    use_cache: bool = True
 ) -> Dict[str, Any]:
     """
     Convenience function for generating next Chapters.
@@ -409,6 +413,7 @@ def generate_next_chapter(
         previous_chapter_summaries: List of summaries from all previous Chapters
         chapter_number: The chapter number to generate
         user_choice: The user's selected choice from the previous chapter
+        use_cache: Reuse the cached chapter for identical input; False regenerates
         
     Returns:
         Dict containing chapter content and token usage metrics
@@ -418,5 +423,6 @@ def generate_next_chapter(
         story_outline=story_outline,
         previous_chapter_summaries=previous_chapter_summaries,
         chapter_number=chapter_number,
-        user_choice=user_choice
+        user_choice=user_choice,
+        use_cache=use_cache
     ) 
\ No newline at end of file
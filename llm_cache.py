@@ -0,0 +1,260 @@
+"""
+Content-addressed cache for LLM responses, persisted in a local SQLite file.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage
+
+from config import settings
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Bump to orphan every cached response (e.g. after a prompt format change)
+CACHE_KEY_VERSION = 1
+
+
+class SQLiteKVStore:
+    """
+    Persistent byte-valued key/value store bounded by total size.
+
+    Entries are evicted least recently read first once the total size
+    passes ``max_bytes``. The file is opened in WAL mode, so several
+    worker processes can share it; each keeps an approximate running
+    total and re-reads the real one before evicting.
+    """
+
+    def __init__(self, path: str, max_bytes: int, table: str = "kv"):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._table = table
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use."""
+        if self._conn is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self._table}_accessed_at ON {self._table} (accessed_at)"
+            )
+            self._conn = conn
+            self._total_bytes = self._measure()
+        return self._conn
+
+    def _measure(self) -> int:
+        row = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self._table}").fetchone()
+        return int(row[0])
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Read a value and mark it as recently used."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(f"SELECT value FROM {self._table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self._table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return bytes(row[0])
+
+    def mget(self, keys: list) -> Dict[str, bytes]:
+        """Read several values; missing keys are omitted."""
+        if not keys:
+            return {}
+        with self._lock:
+            conn = self._connect()
+            found: Dict[str, bytes] = {}
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, value FROM {self._table} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update((key, bytes(value)) for key, value in rows)
+                if rows:
+                    conn.execute(
+                        f"UPDATE {self._table} SET accessed_at = ? WHERE key IN ({placeholders})",
+                        (time.time(), *chunk)
+                    )
+            return found
+
+    def set(self, key: str, value: bytes):
+        """Store a value, evicting old entries if over budget."""
+        size = len(value) + len(key)
+        if size > self._max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            previous = conn.execute(f"SELECT size FROM {self._table} WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self._max_bytes:
+                self._evict()
+
+    def delete(self, key: str):
+        """Remove a key."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            self._total_bytes = self._measure()
+
+    def _evict(self):
+        """Drop least recently used entries down to 90% of the budget."""
+        self._total_bytes = self._measure()
+        target = int(self._max_bytes * 0.9)
+        if self._total_bytes <= self._max_bytes:
+            return
+
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                f"SELECT key, size FROM {self._table} ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                if self._total_bytes <= target:
+                    break
+                victims.append((key,))
+                self._total_bytes -= size
+            self._conn.executemany(f"DELETE FROM {self._table} WHERE key = ?", victims)
+            evicted += len(victims)
+        logger.info(f"Evicted {evicted} entries from {self._path}:{self._table}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store size statistics."""
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+            return {
+                "path": self._path,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self._max_bytes
+            }
+
+
+class LLMResponseCache:
+    """
+    Caches chat model responses by what was actually sent to the model.
+
+    The key is a SHA-256 of the model name, temperature, max_tokens and
+    the fully rendered prompt messages, so byte-identical requests share
+    one response regardless of which code path made them. Truncated
+    responses (finish_reason "length") are never stored.
+    """
+
+    def __init__(self, store: SQLiteKVStore, enabled: bool = True):
+        self._store = store
+        self._enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(llm: Any, prompt_value: Any) -> str:
+        """
+        Hash a model configuration and rendered prompt.
+
+        Args:
+            llm: Chat model about to be called
+            prompt_value: Rendered prompt (output of the prompt template)
+
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = {
+            "v": CACHE_KEY_VERSION,
+            "model": getattr(llm, "model_name", None) or getattr(llm, "model", None),
+            "temperature": getattr(llm, "temperature", None),
+            "max_tokens": getattr(llm, "max_tokens", None),
+            "messages": [[message.type, message.content] for message in prompt_value.to_messages()]
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def invoke(self, chain: Any, inputs: Dict[str, Any], use_cache: bool = True) -> AIMessage:
+        """
+        Run a ``prompt | llm`` chain, answering from the cache when possible.
+
+        Args:
+            chain: Two-step runnable sequence of a prompt template and a chat model
+            inputs: Prompt variables
+            use_cache: False to always call the model (e.g. to regenerate
+                creative output); the fresh response still replaces the
+                cached one
+
+        Returns:
+            The model's message
+        """
+        prompt_value = chain.first.invoke(inputs)
+        llm = chain.last
+
+        if not self._enabled:
+            return llm.invoke(prompt_value)
+
+        key = self.make_key(llm, prompt_value)
+        if use_cache:
+            try:
+                cached = self._store.get(key)
+            except Exception as e:
+                logger.warning(f"LLM cache read failed: {e}")
+                cached = None
+            if cached is not None:
+                self.hits += 1
+                logger.info(f"LLM cache hit ({key[:12]})")
+                return AIMessage(**json.loads(cached))
+            self.misses += 1
+
+        result = llm.invoke(prompt_value)
+
+        if (result.response_metadata or {}).get("finish_reason") != "length":
+            try:
+                self._store.set(key, json.dumps({
+                    "content": result.content,
+                    "response_metadata": result.response_metadata or {}
+                }, default=str).encode())
+            except Exception as e:
+                logger.warning(f"LLM cache write failed: {e}")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counts and store size."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self._enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "store": self._store.get_stats() if self._enabled else {}
+        }
+
+
+# Global LLM response cache instance
+llm_cache = LLMResponseCache(
+    SQLiteKVStore(settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_BYTES, table="llm_responses"),
+    enabled=settings.LLM_CACHE_ENABLED
+)
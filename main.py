@@ -25,6 +25,8 @@ from services.database_service import db_service
 from services.story_service import story_service  
 from services.embedding_service import embedding_service
 from services.cache_service import cache_service
+from services.story_repository import story_repository, chapter_choice_records
+from services.loop_guard import enable_slow_callback_monitoring
 
 # Import models
 from models.story_models import Story, Chapter
@@ -36,6 +38,7 @@ from supabase import create_client, Client
 from typing import Optional
 
 from chapter_summary import generate_chapter_summary, build_story_context_for_next_chapter
+from llm_cache import llm_cache
 
 logger = setup_logger(__name__)
 
@@ -49,11 +52,24 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Bookology backend with simplified services...")
     
     try:
+        # Report callbacks that block the event loop (off unless configured)
+        enable_slow_callback_monitoring()
+        
         # Initialize Supabase client only (minimal initialization)
         global supabase
         supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
         logger.info("Supabase client initialized")
         
+        # Shared cache tier (memory-only when REDIS_URL is unset)
+        await cache_service.initialize_redis(settings.REDIS_URL)
+        
+        # Database pool, and which story/chapter table variants exist
+        await db_service.initialize_async_pool()
+        try:
+            await db_service.discover_schema()
+        except Exception as e:
+            logger.warning(f"Story schema discovery failed, will retry on first query: {e}")
+        
         logger.info("Basic services initialized successfully")
         yield
         
@@ -62,6 +78,8 @@ async def lifespan(app: FastAPI):
         yield
     finally:
         # Minimal cleanup
+        await cache_service.close()
+        await db_service.close_async_pool()
         logger.info("Application shutdown complete")
 
 # FastAPI app with lifespan
@@ -321,7 +339,7 @@ async def ensure_story_embeddings_optimized(
 #         await embedding_service.ensure_embeddings(body.story_id)
 #         
 #         # Process chat with proper type conversion
-#         response = story_chatbot.chat(
+#         response = await story_chatbot.chat(
 #             str(user.id),
 #             str(body.story_id),  # Convert int to str for chatbot
 #             body.message
@@ -473,9 +491,10 @@ async def save_outline_endpoint(
         
         try:
             # Try saving to database
-            story_response = supabase.table("Stories").insert(story_data).execute()
-            story_id = story_response.data[0]["id"]
+            saved_story = await story_repository.insert_story(story_data)
+            story_id = saved_story["id"]
             logger.info(f"✅ Outline saved successfully with story_id: {story_id}")
+            await story_service.invalidate_user_cache(user.id)
 
             # --- IMMEDIATELY GENERATE AND SAVE CHAPTER 1 AND CHOICES ---
             try:
@@ -494,24 +513,12 @@ async def save_outline_endpoint(
                         "content": chapter_content,
                         "word_count": len(chapter_content.split()),
                     }
-                    supabase.table("Chapters").insert(chapter_insert_data).execute()
+                    await story_repository.insert_chapter(chapter_insert_data)
                     logger.info(f"✅ Chapter 1 saved to Chapters table for story_id: {story_id}")
-                    # Save choices
-                    for idx, choice in enumerate(choices):
-                        logger.info(f"DEBUG: Saving choice dict: {choice}")
-                        choice_data = {
-                            "story_id": story_id,
-                            "chapter_number": 1,
-                            "choice_id": f"choice_{idx+1}",
-                            "title": choice.get("title"),
-                            "description": choice.get("description"),
-                            "story_impact": choice.get("impact") or choice.get("story_impact") or "medium",
-                            "choice_type": choice.get("type") or choice.get("choice_type") or "action",
-                            "user_id": user.id,
-                            "is_selected": False,
-                        }
-                        supabase.table("story_choices").insert(choice_data).execute()
-                        logger.info(f"✅ Choice saved: {choice_data}")
+                    await story_service.invalidate_story_cache(story_id)
+                    # Save all choices in one statement
+                    saved_choices = await story_repository.insert_chapter_choices(story_id, 1, user.id, choices)
+                    logger.info(f"✅ Saved {len(saved_choices)} choices: {[c['id'] for c in saved_choices]}")
                 else:
                     logger.error(f"❌ Failed to generate Chapter 1 after outline save for story_id: {story_id}")
             except Exception as gen_error:
@@ -556,13 +563,12 @@ async def generate_choices_endpoint(
         logger.info(f"🎯 Generating choices for Chapter {choice_input.current_chapter_num + 1}, Story {choice_input.story_id}")
         
         # CRITICAL: Verify story belongs to user
-        story_response = supabase.table("Stories").select("*").eq("id", choice_input.story_id).eq("user_id", user.id).execute()
+        story_data = await story_repository.get_story(choice_input.story_id, user.id)
         
-        if not story_response.data:
+        if not story_data:
             logger.error(f"❌ STORY ISOLATION: Story {choice_input.story_id} not found for user {user.id}")
             raise HTTPException(status_code=404, detail="Story not found or access denied")
         
-        story_data = story_response.data[0]
         story_outline = story_data.get("story_outline", "")
         
         logger.info(f"✅ Story verified: {story_data.get('story_title', 'Untitled')}")
@@ -625,13 +631,13 @@ Each choice should lead to different story directions and consequences.
         
         # Insert choices into database to get real IDs
         try:
-            choices_response = supabase.table("story_choices").insert(choice_records).execute()
-            if choices_response.data:
+            saved_choices = await story_repository.insert_choices(choice_records)
+            if saved_choices:
                 logger.info(f"✅ Saved {len(choice_records)} choices to database for story {choice_input.story_id}")
                 
                 # CRITICAL FIX: Update choices with real database IDs
                 for i, choice in enumerate(choices):
-                    database_record = choices_response.data[i]
+                    database_record = saved_choices[i]
                     choice["id"] = database_record["id"]  # Use real database ID
                     choice["choice_id"] = database_record["id"]  # Use real database ID
                     choice["database_id"] = database_record["id"]  # Keep reference
@@ -680,9 +686,7 @@ async def generate_chapter_with_choice_endpoint(request: SelectChoiceInput):
         # First, fetch all available choices for this chapter to validate
         current_chapter_number = request.next_chapter_num - 1  # Choices are for the previous chapter
         logger.info(f"🔍 Fetching available choices for story {request.story_id}, chapter {current_chapter_number}")
-        choices_response = supabase.table('story_choices').select('*').eq('story_id', request.story_id).eq('user_id', user_id).eq('chapter_number', current_chapter_number).execute()
-        
-        available_choices = choices_response.data
+        available_choices = await story_repository.list_choices(request.story_id, user_id, current_chapter_number)
         logger.info(f"📋 Available choices count: {len(available_choices)}")
         
         for i, choice in enumerate(available_choices):
@@ -715,26 +719,16 @@ async def generate_chapter_with_choice_endpoint(request: SelectChoiceInput):
 
         logger.info(f"🎯 Selected choice found: {selected_choice}")
         
-        # Mark this choice as selected in the database
-        logger.info(f"💾 Marking choice as selected in database")
-        from datetime import datetime
-        update_response = supabase.table('story_choices').update({
-            'is_selected': True,
-            'selected_at': datetime.utcnow().isoformat()
-        }).eq('id', selected_choice['id']).execute()
-        
-        logger.info(f"💾 Choice selection update response: {update_response}")
-
         # Get the story details
         logger.info(f"📖 Fetching story details for story_id={request.story_id}")
-        story_response = supabase.table('Stories').select('*').eq('id', request.story_id).eq('user_id', user_id).single().execute()
-        story = story_response.data
+        story = await story_repository.get_story(request.story_id, user_id)
+        if not story:
+            raise HTTPException(status_code=404, detail="Story not found or access denied")
         logger.info(f"📖 Story retrieved: title='{story.get('story_title', 'No title')}'")
 
         # Get all previous Chapters
         logger.info(f"📚 Fetching previous Chapters for story_id={request.story_id}")
-        Chapters_response = supabase.table('Chapters').select('*').eq('story_id', request.story_id).order('chapter_number').execute()
-        previous_Chapters = Chapters_response.data
+        previous_Chapters = await story_repository.list_chapters(request.story_id)
         logger.info(f"📚 Previous Chapters count: {len(previous_Chapters)}")
 
         # Generate the next chapter
@@ -764,85 +758,61 @@ async def generate_chapter_with_choice_endpoint(request: SelectChoiceInput):
 
         logger.info(f"🎉 Chapter generation process completed successfully")
 
-        # --- SAVE GENERATED CHAPTER TO DATABASE ---
+        # Use the correct key for chapter content
+        chapter_text = next_chapter_result.get("chapter_content") or next_chapter_result.get("chapter") or next_chapter_result.get("content", "")
+
+        # --- GENERATE CHAPTER SUMMARY (saved together with the chapter) ---
+        summary_text = None
         try:
-            logger.info(f"💾 Saving generated chapter {next_chapter_number} to database...")
-            # Use the correct key for chapter content
-            chapter_text = next_chapter_result.get("chapter_content") or next_chapter_result.get("chapter") or next_chapter_result.get("content", "")
+            from chapter_summary import generate_chapter_summary
+            summary_result = generate_chapter_summary(
+                chapter_content=chapter_text,
+                chapter_number=next_chapter_number,
+                story_context=story.get("story_outline", ""),
+                story_title=story.get("story_title", "Untitled Story")
+            )
+            if summary_result["success"]:
+                summary_text = summary_result["summary"]
+                logger.info(f"✅ Chapter summary generated for chapter {next_chapter_number}")
+            else:
+                logger.error(f"❌ Failed to generate summary for chapter {next_chapter_number}: {summary_result['error']}")
+        except Exception as summary_error:
+            logger.error(f"❌ Error generating summary for chapter {next_chapter_number}: {str(summary_error)}")
+
+        # --- COMMIT CHAPTER, CHOICES, STORY PROGRESS AND SELECTION IN ONE TRANSACTION ---
+        try:
+            logger.info(f"💾 Committing chapter {next_chapter_number} to database...")
             chapter_insert_data = {
                 "story_id": request.story_id,
                 "chapter_number": next_chapter_number,
                 "title": next_chapter_result.get("title") or f"Chapter {next_chapter_number}",
                 "content": chapter_text,
+                "summary": summary_text,
                 "word_count": len(chapter_text.split()),
-                # No summary at this stage; can be added later
                 # Token tracking fields (optional, if available)
                 "token_count_prompt": next_chapter_result.get("token_count_prompt"),
                 "token_count_completion": next_chapter_result.get("token_count_completion"),
                 "token_count_total": next_chapter_result.get("token_count_total"),
                 "temperature_used": next_chapter_result.get("temperature_used"),
             }
-            chapter_response = supabase.table("Chapters").insert(chapter_insert_data).execute()
-            logger.info(f"✅ Chapter insert response: {chapter_response}")
-            if not chapter_response.data:
-                logger.error(f"❌ DATABASE ERROR: Insert returned no data")
-                raise HTTPException(status_code=500, detail="Failed to save generated chapter")
-            chapter_id = chapter_response.data[0]["id"]
-            logger.info(f"✅ Chapter saved with ID: {chapter_id}")
-            # --- GENERATE AND SAVE CHAPTER SUMMARY ---
-            try:
-                from chapter_summary import generate_chapter_summary
-                story_outline = story.get("story_outline", "") if 'story' in locals() else ""
-                summary_result = generate_chapter_summary(
-                    chapter_content=chapter_text,
-                    chapter_number=next_chapter_number,
-                    story_context=story_outline,
-                    story_title=story.get("story_title", "Untitled Story") if 'story' in locals() else "Untitled Story"
-                )
-                if summary_result["success"]:
-                    summary_text = summary_result["summary"]
-                    supabase.table("Chapters").update({"summary": summary_text}).eq("id", chapter_id).execute()
-                    logger.info(f"✅ Chapter summary saved for chapter {next_chapter_number}")
-                else:
-                    logger.error(f"❌ Failed to generate summary for chapter {next_chapter_number}: {summary_result['error']}")
-            except Exception as summary_error:
-                logger.error(f"❌ Error generating/saving summary for chapter {next_chapter_number}: {str(summary_error)}")
+            choices = next_chapter_result.get("choices", [])
+            committed = await story_service.commit_chapter(
+                chapter_insert_data,
+                chapter_choice_records(request.story_id, next_chapter_number, user_id, choices),
+                selected_choice_id=selected_choice["id"]
+            )
         except Exception as db_error:
-            logger.error(f"❌ DATABASE INSERT FAILED: {str(db_error)}")
+            logger.error(f"❌ DATABASE COMMIT FAILED: {str(db_error)}")
             raise HTTPException(status_code=500, detail=f"Database insert failed: {str(db_error)}")
 
-        # --- SAVE GENERATED CHOICES FOR THE NEW CHAPTER ---
-        try:
-            logger.info(f"💾 Saving generated choices for chapter {next_chapter_number} to database...")
-            choices = next_chapter_result.get("choices", [])
-            for idx, choice in enumerate(choices):
-                logger.info(f"DEBUG: Saving choice dict: {choice}")
-                choice_data = {
-                    "story_id": request.story_id,
-                    "chapter_number": next_chapter_number,
-                    "choice_id": f"choice_{idx+1}",
-                    "title": choice.get("title"),
-                    "description": choice.get("description"),
-                    "story_impact": choice.get("impact") or choice.get("story_impact") or "medium",
-                    "choice_type": choice.get("type") or choice.get("choice_type") or "action",
-                    "user_id": user_id,
-                    "is_selected": False,
-                }
-                supabase.table("story_choices").insert(choice_data).execute()
-                logger.info(f"✅ Choice saved: {choice_data}")
-        except Exception as choice_db_error:
-            logger.error(f"❌ Failed to save choices for chapter {next_chapter_number}: {str(choice_db_error)}")
-            # Do not raise, allow chapter save to succeed even if choices fail
-
-        # --- UPDATE STORY'S CURRENT CHAPTER ---
-        try:
-            logger.info(f"📈 Updating story's current_chapter to {next_chapter_number}")
-            story_update_response = supabase.table("Stories").update({
-                "current_chapter": next_chapter_number
-            }).eq("id", request.story_id).execute()
-            logger.info(f"✅ Story current_chapter updated")
-        except Exception as e:
-            logger.warning(f"⚠️ Could not update story current_chapter: {e}")
+        logger.info(f"✅ Chapter saved with ID: {committed['chapter']['id']}")
+        # Hand the real database IDs to the frontend (rows come back in input order)
+        for choice, database_record in zip(choices, committed["choices"]):
+            choice["id"] = database_record["id"]
+            choice["choice_id"] = database_record["id"]
+            choice["database_id"] = database_record["id"]
+        if committed["selected_choice"]:
+            selected_choice = committed["selected_choice"]
 
         # --- (OPTIONAL) TRIGGER EMBEDDING GENERATION IN BACKGROUND ---
         # TODO: Add background task to update embeddings for the new chapter
@@ -853,6 +823,7 @@ async def generate_chapter_with_choice_endpoint(request: SelectChoiceInput):
             "chapter_content": chapter_text,  # Frontend expects this field
             "chapter_number": next_chapter_result.get("chapter_number", request.next_chapter_num),
             "story_id": request.story_id,  # Include story_id for verification
+            "chapter_id": committed["chapter"]["id"],
             "chapter": next_chapter_result,  # Keep full chapter data
             "selected_choice": selected_choice,
             "choices": next_chapter_result.get("choices", [])  # Include any new choices generated
@@ -880,9 +851,9 @@ async def get_choice_history_endpoint(
         logger.info(f"📚 Getting choice history for story {story_id}")
         
         # Get all choices for this story
-        choices_response = supabase.table("story_choices").select("*").eq("story_id", story_id).eq("user_id", user.id).order("chapter_number").order("choice_id").execute()
+        story_choices = await story_repository.list_choices(story_id, user.id)
         
-        if not choices_response.data:
+        if not story_choices:
             return {
                 "success": True,
                 "story_id": story_id,
@@ -892,7 +863,7 @@ async def get_choice_history_endpoint(
         
         # Organize choices by chapter
         choice_history = {}
-        for choice in choices_response.data:
+        for choice in story_choices:
             chapter_num = choice["chapter_number"]
             if chapter_num not in choice_history:
                 choice_history[chapter_num] = {
@@ -986,9 +957,9 @@ async def generate_chapter_endpoint(chapter: ChapterInput):
                     }
                     # Remove None fields (story_id may not be present)
                     chapter_insert_data = {k: v for k, v in chapter_insert_data.items() if v is not None}
-                    chapter_response = supabase.table("Chapters").insert(chapter_insert_data).execute()
-                    logger.info(f"✅ Chapter 1 insert response: {chapter_response}")
-                    chapter_id = chapter_response.data[0]["id"]
+                    saved_chapter = await story_repository.insert_chapter(chapter_insert_data)
+                    logger.info(f"✅ Chapter 1 saved with ID: {saved_chapter['id']}")
+                    chapter_id = saved_chapter["id"]
                     # --- GENERATE AND SAVE CHAPTER 1 SUMMARY ---
                     try:
                         from chapter_summary import generate_chapter_summary
@@ -1001,32 +972,28 @@ async def generate_chapter_endpoint(chapter: ChapterInput):
                         )
                         if summary_result["success"]:
                             summary_text = summary_result["summary"]
-                            supabase.table("Chapters").update({"summary": summary_text}).eq("id", chapter_id).execute()
+                            await story_repository.update_chapter(chapter_id, {"summary": summary_text})
                             logger.info(f"✅ Chapter 1 summary saved")
                         else:
                             logger.error(f"❌ Failed to generate summary for Chapter 1: {summary_result['error']}")
                     except Exception as summary_error:
                         logger.error(f"❌ Error generating/saving summary for Chapter 1: {str(summary_error)}")
+                    # Drop cached story data so readers and embeddings see Chapter 1 and its summary
+                    user_id = getattr(chapter, 'user_id', None)  # If user_id is available
+                    if chapter_insert_data.get("story_id") is not None:
+                        await story_service.invalidate_story_cache(chapter_insert_data["story_id"])
+                    if user_id is not None:
+                        await story_service.invalidate_user_cache(user_id)
                     # Save choices
                     logger.info(f"💾 Saving Chapter 1 choices to story_choices table...")
-                    user_id = getattr(chapter, 'user_id', None)  # If user_id is available
-                    for idx, choice in enumerate(choices):
-                        logger.info(f"DEBUG: Saving choice dict: {choice}")
-                        choice_data = {
-                            "story_id": chapter_insert_data.get("story_id"),
-                            "chapter_number": 1,
-                            "choice_id": f"choice_{idx+1}",
-                            "title": choice.get("title"),
-                            "description": choice.get("description"),
-                            "story_impact": choice.get("impact") or choice.get("story_impact") or "medium",
-                            "choice_type": choice.get("type") or choice.get("choice_type") or "action",
-                            "user_id": user_id,
-                            "is_selected": False,
-                        }
-                        # Remove None fields
-                        choice_data = {k: v for k, v in choice_data.items() if v is not None}
-                        supabase.table("story_choices").insert(choice_data).execute()
-                        logger.info(f"✅ Choice saved: {choice_data}")
+                    saved_choices = await story_repository.insert_chapter_choices(
+                        chapter_insert_data.get("story_id"), 1, user_id, choices
+                    )
+                    for choice, database_record in zip(choices, saved_choices):
+                        choice["id"] = database_record["id"]
+                        choice["choice_id"] = database_record["id"]
+                        choice["database_id"] = database_record["id"]
+                    logger.info(f"✅ Saved {len(saved_choices)} choices: {[c['id'] for c in saved_choices]}")
             except Exception as db_error:
                 logger.error(f"❌ Failed to save Chapter 1 or choices: {str(db_error)}")
                 # Do not raise, allow generation to succeed even if save fails
@@ -1250,8 +1217,8 @@ async def save_story_endpoint(
         
         # Try to insert with all fields, fallback to minimal if schema issues
         try:
-            story_response = supabase.table("Stories").insert(story_insert_data).execute()
-            story_id = story_response.data[0]["id"]
+            saved_story = await story_repository.insert_story(story_insert_data)
+            story_id = saved_story["id"]
             logger.info(f"Story inserted successfully with full metadata: {story_id}")
         except Exception as db_error:
             logger.warning(f"Full metadata insert failed: {db_error}")
@@ -1267,8 +1234,8 @@ async def save_story_endpoint(
             }
             
             try:
-                story_response = supabase.table("Stories").insert(minimal_story_data).execute()
-                story_id = story_response.data[0]["id"]
+                saved_story = await story_repository.insert_story(minimal_story_data)
+                story_id = saved_story["id"]
                 logger.info(f"Story inserted successfully with minimal data: {story_id}")
             except Exception as minimal_error:
                 logger.error(f"Even minimal story insert failed: {minimal_error}")
@@ -1356,35 +1323,18 @@ async def save_story_endpoint(
         # Try to insert chapter with fallback handling
         logger.info(f"🎯 CHAPTER 1 DATABASE: Executing INSERT...")
         try:
-            chapter_response = supabase.table("Chapters").insert(chapter_insert_data).execute()
+            saved_chapter = await story_repository.insert_chapter(chapter_insert_data)
             
-            logger.info(f"📊 CHAPTER 1 DATABASE: Response: {chapter_response}")
-            logger.info(f"📊 CHAPTER 1 DATABASE: Response data: {chapter_response.data}")
+            logger.info(f"📊 CHAPTER 1 DATABASE: Saved row: {saved_chapter}")
             
-            if not chapter_response.data:
+            if not saved_chapter:
                 logger.error(f"❌ CHAPTER 1 DATABASE: Insert returned no data")
                 chapter_id = None
             else:
-                chapter_id = chapter_response.data[0]["id"]
-                saved_chapter = chapter_response.data[0]
+                chapter_id = saved_chapter["id"]
                 
                 logger.info(f"✅ CHAPTER 1 DATABASE: Chapter inserted with metadata: {chapter_id}")
                 logger.info(f"🔍 CHAPTER 1 DATABASE: Saved summary field: {saved_chapter.get('summary', 'NOT_FOUND')}")
-                
-                # Verification query
-                logger.info(f"🔍 CHAPTER 1 DATABASE: Verifying saved chapter...")
-                verify_response = supabase.table("Chapters").select("id, summary").eq("id", chapter_id).execute()
-                
-                if verify_response.data:
-                    verified_summary = verify_response.data[0].get("summary")
-                    logger.info(f"✅ CHAPTER 1 VERIFICATION: Summary in DB: {bool(verified_summary)}")
-                    if verified_summary:
-                        logger.info(f"📝 CHAPTER 1 VERIFICATION: Summary length: {len(verified_summary)} chars")
-                        logger.info(f"📝 CHAPTER 1 VERIFICATION: Summary preview: {verified_summary[:100]}...")
-                    else:
-                        logger.error(f"❌ CHAPTER 1 VERIFICATION: Summary is NULL in database!")
-                else:
-                    logger.error(f"❌ CHAPTER 1 VERIFICATION: Could not query saved chapter!")
                     
         except Exception as chapter_error:
             logger.error(f"❌ CHAPTER 1 DATABASE: Full metadata insert failed: {chapter_error}")
@@ -1403,8 +1353,8 @@ async def save_story_endpoint(
             logger.info(f"🔧 CHAPTER 1 FALLBACK: Minimal data keys: {list(minimal_chapter_data.keys())}")
             
             try:
-                chapter_response = supabase.table("Chapters").insert(minimal_chapter_data).execute()
-                chapter_id = chapter_response.data[0]["id"]
+                saved_chapter = await story_repository.insert_chapter(minimal_chapter_data)
+                chapter_id = saved_chapter["id"]
                 logger.info(f"✅ CHAPTER 1 FALLBACK: Chapter inserted with minimal data: {chapter_id}")
             except Exception as minimal_chapter_error:
                 logger.error(f"❌ CHAPTER 1 FALLBACK: Even minimal chapter insert failed: {minimal_chapter_error}")
@@ -1436,9 +1386,9 @@ async def save_story_endpoint(
                     choice_records.append(choice_record)
                 
                 # Insert all choices into database
-                choices_response = supabase.table("story_choices").insert(choice_records).execute()
+                saved_choices = await story_repository.insert_choices(choice_records)
                 
-                if choices_response.data:
+                if saved_choices:
                     choices_saved_count = len(choice_records)
                     logger.info(f"✅ CHOICES: Saved {choices_saved_count} choices to database for story {story_id}")
                 else:
@@ -1508,6 +1458,8 @@ async def get_performance_stats(user = Depends(get_authenticated_user)):
         return {
             "story_service": story_stats,
             "embedding_service": embedding_stats,
+            "cache_metrics": cache_service.get_cache_metrics(),
+            "llm_cache": llm_cache.get_stats(),
             "timestamp": asyncio.get_event_loop().time()
         }
     except Exception as e:
@@ -1526,8 +1478,8 @@ async def clear_cache(pattern: str = "", user = Depends(get_authenticated_user))
             await cache_service.clear_pattern(pattern)
             return {"message": f"Cleared cache pattern: {pattern}"}
         else:
-            # Clear all memory cache
-            cache_service._memory_cache.clear()
+            # Clear all memory cache (on every worker)
+            await cache_service.clear()
             return {"message": "Cleared memory cache"}
     except Exception as e:
         logger.error(f"Cache clear failed: {e}")
@@ -1833,9 +1785,10 @@ async def test_auto_save_outline_flow(idea: str = "A brave knight embarks on a q
             logger.info(f"🧪 Saving test outline with fields: {list(story_data.keys())}")
             
             # Insert to database
-            story_response = supabase.table("Stories").insert(story_data).execute()
-            story_id = story_response.data[0]["id"]
+            saved_story = await story_repository.insert_story(story_data)
+            story_id = saved_story["id"]
             database_save_success = True
+            await story_service.invalidate_user_cache(mock_user.id)
             
             logger.info(f"✅ Test outline auto-saved with story_id: {story_id}")
             
@@ -1902,15 +1855,12 @@ async def save_chapter_with_summary_endpoint(
         
         # Verify story belongs to user
         logger.info(f"🔍 STEP 1: Verifying story ownership...")
-        story_response = supabase.table("Stories").select("*").eq("id", chapter_data.story_id).eq("user_id", user.id).execute()
-        
-        logger.info(f"📊 Database Query Response: found {len(story_response.data) if story_response.data else 0} Stories")
+        story = await story_repository.get_story(chapter_data.story_id, user.id)
         
-        if not story_response.data:
+        if not story:
             logger.error(f"❌ AUTHORIZATION FAILED: Story {chapter_data.story_id} not found for user {user.id}")
             raise HTTPException(status_code=404, detail="Story not found or access denied")
         
-        story = story_response.data[0]
         story_title = story.get("story_title", "Untitled Story")
         story_outline = story.get("story_outline", "")
         
@@ -1922,13 +1872,15 @@ async def save_chapter_with_summary_endpoint(
         
         # Get previous Chapters for context (if any)
         logger.info(f"🔍 STEP 2a: Fetching previous Chapters for context...")
-        previous_Chapters_response = supabase.table("Chapters").select("content, summary").eq("story_id", chapter_data.story_id).lt("chapter_number", chapter_data.chapter_number).order("chapter_number").execute()
+        previous_Chapters = await story_repository.list_chapters(
+            chapter_data.story_id, before_chapter=chapter_data.chapter_number, columns=("content", "summary")
+        )
         
-        logger.info(f"📊 Previous Chapters found: {len(previous_Chapters_response.data) if previous_Chapters_response.data else 0}")
+        logger.info(f"📊 Previous Chapters found: {len(previous_Chapters)}")
         
         previous_summaries = []
-        if previous_Chapters_response.data:
-            for i, prev_chapter in enumerate(previous_Chapters_response.data):
+        if previous_Chapters:
+            for i, prev_chapter in enumerate(previous_Chapters):
                 if prev_chapter.get("summary"):
                     previous_summaries.append(prev_chapter["summary"])
                     logger.info(f"📝 Previous Chapter {i+1}: Has summary ({len(prev_chapter['summary'])} chars)")
@@ -2004,67 +1956,30 @@ async def save_chapter_with_summary_endpoint(
         logger.info(f"📊 Token metrics: prompt={chapter_insert_data.get('token_count_prompt', 0)}, completion={chapter_insert_data.get('token_count_completion', 0)}, total={chapter_insert_data.get('token_count_total', 0)}")
         logger.info(f"🌡️ Temperature used: {chapter_insert_data.get('temperature_used', 'N/A')}")
         
-        # Insert chapter with summary in one operation
-        logger.info(f"🎯 STEP 3a: Executing database INSERT...")
+        # Insert chapter with summary and advance the story in one transaction
+        logger.info(f"🎯 STEP 3: Committing chapter and story progress...")
         
         try:
-            chapter_response = supabase.table("Chapters").insert(chapter_insert_data).execute()
-            
-            logger.info(f"📊 Database response: {chapter_response}")
-            logger.info(f"📊 Response data: {chapter_response.data}")
-            
-            if not chapter_response.data:
-                logger.error(f"❌ DATABASE ERROR: Insert returned no data")
-                raise HTTPException(status_code=500, detail="Failed to save chapter with summary")
-            
-            chapter_id = chapter_response.data[0]["id"]
-            saved_chapter = chapter_response.data[0]
+            committed = await story_service.commit_chapter(chapter_insert_data)
+            saved_chapter = committed["chapter"]
+            chapter_id = saved_chapter["id"]
             
-            logger.info(f"✅ STEP 3a COMPLETE: Chapter saved! ID: {chapter_id}")
-            logger.info(f"🔍 VERIFICATION: Checking saved summary...")
-            logger.info(f"📝 Saved summary field: {saved_chapter.get('summary', 'NOT_FOUND')}")
-            
-            # Additional verification - query the database to confirm
-            logger.info(f"🔍 STEP 3b: Verifying saved chapter in database...")
-            verify_response = supabase.table("Chapters").select("id, summary").eq("id", chapter_id).execute()
-            
-            if verify_response.data:
-                verified_summary = verify_response.data[0].get("summary")
-                logger.info(f"✅ VERIFICATION: Chapter {chapter_id} summary in DB: {bool(verified_summary)}")
-                if verified_summary:
-                    logger.info(f"📝 Verified summary length: {len(verified_summary)} chars")
-                    logger.info(f"📝 Verified summary preview: {verified_summary[:100]}...")
-                else:
-                    logger.error(f"❌ VERIFICATION FAILED: Summary is NULL in database!")
-            else:
-                logger.error(f"❌ VERIFICATION FAILED: Could not query saved chapter!")
-                
+            logger.info(f"✅ STEP 3 COMPLETE: Chapter saved! ID: {chapter_id}")
+            logger.info(f"📝 Saved summary field: {bool(saved_chapter.get('summary'))}")
         except Exception as db_error:
             logger.error(f"❌ DATABASE INSERT FAILED: {str(db_error)}")
             logger.error(f"🔍 Error type: {type(db_error)}")
             logger.error(f"🔍 Error details: {db_error}")
             raise HTTPException(status_code=500, detail=f"Database insert failed: {str(db_error)}")
         
-        # Update story's current_chapter count
-        logger.info(f"📈 STEP 4: Updating story current_chapter count...")
-        try:
-            story_update_response = supabase.table("Stories").update({
-                "current_chapter": chapter_data.chapter_number
-            }).eq("id", chapter_data.story_id).execute()
-            
-            logger.info(f"✅ STEP 4 COMPLETE: Story current_chapter updated")
-        except Exception as e:
-            logger.warning(f"⚠️ STEP 4 WARNING: Could not update story current_chapter: {e}")
-        
         # STEP 5: Generate embeddings for the updated story (including new chapter)
         logger.info(f"🔍 STEP 5: Triggering embedding generation for story {chapter_data.story_id}...")
         from services.embedding_service import embedding_service
         
         try:
             background_tasks.add_task(
-                embedding_service.create_embeddings_async,
-                chapter_data.story_id,
-                True  # Force recreate to include the new chapter
+                embedding_service.update_embeddings_async,
+                chapter_data.story_id  # Only embeds the Chapters that changed
             )
             logger.info(f"✅ STEP 5 COMPLETE: Embedding generation scheduled in background")
         except Exception as embedding_error:
@@ -2088,8 +2003,8 @@ async def save_chapter_with_summary_endpoint(
             "debug_info": {
                 "summary_included_in_insert": bool(chapter_insert_data.get("summary")),
                 "summary_length": len(summary_text),
-                "database_response_received": bool(chapter_response.data),
-                "verification_summary_exists": bool(verified_summary) if 'verified_summary' in locals() else "not_checked"
+                "database_response_received": bool(saved_chapter),
+                "verification_summary_exists": bool(saved_chapter.get("summary"))
             }
         }
         
@@ -2113,19 +2028,20 @@ async def generate_next_chapter_endpoint(
         logger.info(f"📖 Generating Chapter {chapter_input.chapter_number} for story {chapter_input.story_id}...")
         
         # Verify story belongs to user
-        story_response = supabase.table("Stories").select("*").eq("id", chapter_input.story_id).eq("user_id", user.id).execute()
-        if not story_response.data:
+        story = await story_repository.get_story(chapter_input.story_id, user.id)
+        if not story:
             raise HTTPException(status_code=404, detail="Story not found or access denied")
         
-        story = story_response.data[0]
         story_title = story.get("story_title", "Untitled Story")
         
         # Get previous Chapters and their summaries for context
-        previous_Chapters_response = supabase.table("Chapters").select("content, summary").eq("story_id", chapter_input.story_id).lt("chapter_number", chapter_input.chapter_number).order("chapter_number").execute()
+        previous_Chapters = await story_repository.list_chapters(
+            chapter_input.story_id, before_chapter=chapter_input.chapter_number, columns=("content", "summary")
+        )
         
         previous_summaries = []
-        if previous_Chapters_response.data:
-            for prev_chapter in previous_Chapters_response.data:
+        if previous_Chapters:
+            for prev_chapter in previous_Chapters:
                 if prev_chapter.get("summary"):
                     previous_summaries.append(prev_chapter["summary"])
                 else:
@@ -2199,19 +2115,20 @@ async def generate_and_save_chapter_endpoint(
         logger.info(f"🚀 GENERATE & SAVE: Starting Chapter {chapter_input.chapter_number} for story {chapter_input.story_id}...")
         
         # Verify story belongs to user - use capitalized table name
-        story_response = supabase.table("Stories").select("*").eq("id", chapter_input.story_id).eq("user_id", user.id).execute()
-        if not story_response.data:
+        story = await story_repository.get_story(chapter_input.story_id, user.id)
+        if not story:
             raise HTTPException(status_code=404, detail="Story not found or access denied")
         
-        story = story_response.data[0]
         story_title = story.get("story_title", "Untitled Story")
         
         # Get previous Chapters and their summaries for context - use capitalized table name
-        previous_Chapters_response = supabase.table("Chapters").select("content, summary").eq("story_id", chapter_input.story_id).lt("chapter_number", chapter_input.chapter_number).order("chapter_number").execute()
+        previous_Chapters = await story_repository.list_chapters(
+            chapter_input.story_id, before_chapter=chapter_input.chapter_number, columns=("content", "summary")
+        )
         
         previous_summaries = []
-        if previous_Chapters_response.data:
-            for prev_chapter in previous_Chapters_response.data:
+        if previous_Chapters:
+            for prev_chapter in previous_Chapters:
                 if prev_chapter.get("summary"):
                     previous_summaries.append(prev_chapter["summary"])
                 else:
@@ -2294,33 +2211,20 @@ async def generate_and_save_chapter_endpoint(
         logger.info(f"📊 Total tokens: prompt={total_prompt_tokens}, completion={total_completion_tokens}, total={total_all_tokens}")
         
         try:
-            chapter_response = supabase.table("Chapters").insert(chapter_insert_data).execute()
-            
-            if not chapter_response.data:
-                raise HTTPException(status_code=500, detail="Failed to save chapter")
-            
-            chapter_id = chapter_response.data[0]["id"]
+            # Chapter and story current_chapter are written in one transaction
+            committed = await story_service.commit_chapter(chapter_insert_data)
+            chapter_id = committed["chapter"]["id"]
             
             logger.info(f"✅ STEP 3 COMPLETE: Chapter saved with ID: {chapter_id}")
             
-            # Update story's current_chapter count if field exists
-            try:
-                supabase.table("Stories").update({
-                    "current_chapter": chapter_input.chapter_number
-                }).eq("id", chapter_input.story_id).execute()
-                logger.info(f"✅ Updated story current_chapter to {chapter_input.chapter_number}")
-            except Exception as update_error:
-                logger.warning(f"⚠️ Could not update story current_chapter: {update_error}")
-            
             # Generate embeddings for the updated story (including new chapter)
             logger.info(f"🔍 Triggering embedding generation for story {chapter_input.story_id}...")
             from services.embedding_service import embedding_service
             
             try:
                 background_tasks.add_task(
-                    embedding_service.create_embeddings_async,
-                    chapter_input.story_id,
-                    True  # Force recreate to include the new chapter
+                    embedding_service.update_embeddings_async,
+                    chapter_input.story_id  # Only embeds the Chapters that changed
                 )
                 logger.info(f"✅ Embedding generation scheduled in background")
             except Exception as embedding_error:
@@ -2385,21 +2289,20 @@ async def debug_story_Chapters(
         logger.info(f"🔍 DEBUG - Getting Chapters for story {story_id}, user {user.id}")
         
         # Verify story belongs to user
-        story_response = supabase.table("Stories").select("*").eq("id", story_id).eq("user_id", user.id).execute()
+        story_data = await story_repository.get_story(story_id, user.id)
         
-        if not story_response.data:
+        if not story_data:
             logger.error(f"❌ DEBUG - Story {story_id} not found for user {user.id}")
             raise HTTPException(status_code=404, detail="Story not found or access denied")
         
-        story_data = story_response.data[0]
         logger.info(f"✅ DEBUG - Found story: {story_data.get('story_title', 'Untitled')}")
         
         # Get Chapters from database
-        Chapters_response = supabase.table("Chapters").select("*").eq("story_id", story_id).order("chapter_number").execute()
+        Chapters = await story_repository.list_chapters(story_id)
         
         Chapters_info = []
-        if Chapters_response.data:
-            for chapter in Chapters_response.data:
+        if Chapters:
+            for chapter in Chapters:
                 Chapters_info.append({
                     "id": chapter["id"],
                     "chapter_number": chapter["chapter_number"],
@@ -0,0 +1,10 @@
+-- Expression indexes for per-story lookups on the vector table
+-- Lets the embedding index answer exists/count/list for a story with an
+-- index scan instead of a similarity search or a sequential scan
+
+-- Run outside a transaction block (CONCURRENTLY avoids locking writers)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_langchain_pg_embedding_story_id"
+    ON langchain_pg_embedding ((cmetadata->>'story_id'), collection_id);
+
+-- Refresh planner statistics for the new expressions
+ANALYZE langchain_pg_embedding;
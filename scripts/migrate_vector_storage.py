@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Migrate the embedding table to a typed, partitioned, ANN-indexed layout.
+
+Steps (each can be run on its own):
+    describe   Show the current layout
+    type       Type the embedding column as vector(N)
+    partition  Move rows onto hash partitions of story_id
+    index      Build an HNSW or IVFFlat index (per partition), optionally
+               over half-precision vectors
+    drop-legacy  Drop the pre-partitioning table after verifying
+
+Example:
+    python scripts/migrate_vector_storage.py type --dimensions 1536
+    python scripts/migrate_vector_storage.py partition --partitions 16
+    python scripts/migrate_vector_storage.py index --method hnsw --precision half
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from services.vector_storage import vector_storage
+
+
+async def run(args) -> bool:
+    if args.command == "describe":
+        print(json.dumps(await vector_storage.describe(), indent=2, default=str))
+        return True
+
+    if args.command == "type":
+        print(f"Typing embedding column as vector({args.dimensions})...")
+        return await vector_storage.set_dimensions(args.dimensions)
+
+    if args.command == "partition":
+        print(f"Partitioning embeddings into {args.partitions} partitions...")
+        result = await vector_storage.partition_by_story(
+            partitions=args.partitions,
+            dimensions=args.dimensions,
+            batch_size=args.batch_size
+        )
+        print(json.dumps(result, indent=2))
+        return True
+
+    if args.command == "index":
+        print(f"Building {args.method} index...")
+        name = await vector_storage.create_ann_index(
+            method=args.method,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+            precision=args.precision
+        )
+        print(f"Index {name} is ready")
+        return True
+
+    if args.command == "drop-legacy":
+        await vector_storage.drop_legacy_table()
+        print("Legacy embedding table dropped")
+        return True
+
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("describe")
+
+    type_parser = subparsers.add_parser("type")
+    type_parser.add_argument("--dimensions", type=int, default=settings.VECTOR_DIMENSIONS)
+
+    partition_parser = subparsers.add_parser("partition")
+    partition_parser.add_argument("--partitions", type=int, default=16)
+    partition_parser.add_argument("--dimensions", type=int, default=settings.VECTOR_DIMENSIONS)
+    partition_parser.add_argument("--batch-size", type=int, default=5000)
+
+    index_parser = subparsers.add_parser("index")
+    index_parser.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+    index_parser.add_argument("--m", type=int, default=16)
+    index_parser.add_argument("--ef-construction", type=int, default=64)
+    index_parser.add_argument("--lists", type=int, default=None)
+    index_parser.add_argument("--precision", choices=["full", "half"], default="full")
+
+    subparsers.add_parser("drop-legacy")
+
+    args = parser.parse_args()
+    try:
+        ok = asyncio.run(run(args))
+    except Exception as e:
+        print(f"❌ Migration step '{args.command}' failed: {e}")
+        sys.exit(1)
+    if not ok:
+        print(f"❌ Migration step '{args.command}' did not complete")
+        sys.exit(1)
+    print("✅ Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Redis pub/sub bus keeping per-worker memory cache tiers coherent.
+"""
+
+import json
+import asyncio
+import uuid
+from typing import Any, Callable, List, Optional
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Channel shared by every worker using the same Redis
+INVALIDATION_CHANNEL = "bookology:cache:invalidate"
+
+# Invalidation operations carried on the bus
+OP_KEYS = "keys"
+OP_PATTERN = "pattern"
+OP_TAGS = "tags"
+OP_CLEAR = "clear"
+
+
+class CacheInvalidationBus:
+    """
+    Broadcasts memory-tier invalidations to every worker.
+
+    Each worker publishes the keys, patterns or tags it invalidates and
+    applies what the others publish to its own memory tier; messages a
+    worker sent itself are ignored. Pub/sub is fire-and-forget, so when
+    the subscription drops the handler is asked to clear everything once
+    it is re-established, since invalidations may have been missed.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, List[Any]], None],
+        channel: str = INVALIDATION_CHANNEL
+    ):
+        self._handler = handler
+        self._channel = channel
+        self._origin = uuid.uuid4().hex
+        self._client = None
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+        self.messages_sent = 0
+        self.messages_applied = 0
+
+    @property
+    def active(self) -> bool:
+        """Whether invalidations from other workers are currently received."""
+        return self._subscribed.is_set()
+
+    async def start(self, client, ready_timeout: float = 5.0):
+        """
+        Subscribe on a Redis client and start applying invalidations.
+
+        Args:
+            client: redis.asyncio client
+            ready_timeout: Seconds to wait for the first subscription
+        """
+        self._client = client
+        self._listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), ready_timeout)
+            logger.info(f"Cache invalidation bus subscribed to {self._channel}")
+        except asyncio.TimeoutError:
+            logger.warning("Cache invalidation bus not subscribed yet, retrying in background")
+
+    async def stop(self):
+        """Stop listening."""
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._subscribed.clear()
+        self._client = None
+
+    def message(self, op: str, args: List[Any]) -> str:
+        """Serialise an invalidation for publishing (e.g. inside a pipeline)."""
+        return json.dumps({"origin": self._origin, "op": op, "args": args})
+
+    async def publish(self, op: str, args: List[Any]):
+        """Broadcast an invalidation to the other workers."""
+        if not self._client:
+            return
+        try:
+            await self._client.publish(self._channel, self.message(op, args))
+            self.messages_sent += 1
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish error: {e}")
+
+    def queue_publish(self, pipe, op: str, args: List[Any]):
+        """Queue a broadcast on a pipeline that is about to execute."""
+        if self._client:
+            pipe.publish(self._channel, self.message(op, args))
+            self.messages_sent += 1
+
+    async def _listen(self):
+        """Apply invalidations from other workers, resubscribing after errors."""
+        first = True
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self._channel)
+                if not first:
+                    # Anything published while disconnected was lost
+                    self._handler(OP_CLEAR, [])
+                first = False
+                self._subscribed.set()
+
+                async for raw in pubsub.listen():
+                    self._apply(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation bus error: {e}, resubscribing")
+                self._subscribed.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _apply(self, raw: Any):
+        """Apply one pub/sub message."""
+        if not raw or raw.get("type") != "message":
+            return
+        try:
+            message = json.loads(raw["data"])
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed cache invalidation message")
+            return
+        if message.get("origin") == self._origin:
+            return
+
+        self._handler(message.get("op"), message.get("args") or [])
+        self.messages_applied += 1
@@ -0,0 +1,315 @@
+"""
+Typed binary codecs for values stored in the Redis cache tier.
+"""
+
+import json
+import time
+from abc import ABC, abstractmethod
+import uuid
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from models.story_models import Story, Chapter, StoryWithChapters, EmbeddingChunk
+from logger_config import setup_logger
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+logger = setup_logger(__name__)
+
+# First byte of every encoded payload; never the first byte of legacy JSON text
+MAGIC = 0xBC
+# Flag bit in the header marking a zlib-compressed body
+FLAG_COMPRESSED = 0x01
+
+_EXT_DATETIME = 1
+_EXT_UUID = 2
+_EXT_MODEL = 3
+_EXT_DATE = 4
+
+_MODELS: Dict[str, Type[BaseModel]] = {}
+
+
+def register_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Allow a pydantic model to round-trip through the cache codecs.
+
+    Models are tagged by class name, so names must be unique. Usable as a
+    class decorator.
+    """
+    _MODELS[model.__name__] = model
+    return model
+
+
+for _model in (Story, Chapter, StoryWithChapters, EmbeddingChunk):
+    register_model(_model)
+
+
+def _model_class(name: str) -> Type[BaseModel]:
+    """Resolve a registered model by its tag."""
+    try:
+        return _MODELS[name]
+    except KeyError:
+        raise TypeError(f"Cached model {name} is not registered with the cache codec")
+
+
+class CacheCodec(ABC):
+    """
+    Serialises cache values to bytes.
+
+    Subclasses must round-trip registered pydantic models, datetimes and
+    UUIDs exactly, and raise TypeError for anything else they cannot
+    represent instead of silently degrading it to a string.
+    """
+
+    name = "base"
+    codec_id = 0
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """Encode a value."""
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        """Decode a value produced by dumps()."""
+
+
+class JsonCodec(CacheCodec):
+    """JSON codec with tagged objects for non-JSON types."""
+
+    name = "json"
+    codec_id = 1
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=self._default, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data, object_hook=self._object_hook)
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, BaseModel):
+            return {"__t__": "model", "n": type(obj).__name__, "v": obj.model_dump(mode="json")}
+        if isinstance(obj, datetime):
+            return {"__t__": "datetime", "v": obj.isoformat()}
+        if isinstance(obj, date):
+            return {"__t__": "date", "v": obj.isoformat()}
+        if isinstance(obj, uuid.UUID):
+            return {"__t__": "uuid", "v": str(obj)}
+        raise TypeError(f"Cannot cache value of type {type(obj).__name__}")
+
+    @staticmethod
+    def _object_hook(obj: Dict[str, Any]) -> Any:
+        tag = obj.get("__t__")
+        if tag is None:
+            return obj
+        if tag == "model":
+            return _model_class(obj["n"]).model_validate(obj["v"])
+        if tag == "datetime":
+            return datetime.fromisoformat(obj["v"])
+        if tag == "date":
+            return date.fromisoformat(obj["v"])
+        if tag == "uuid":
+            return uuid.UUID(obj["v"])
+        return obj
+
+
+class MsgpackCodec(CacheCodec):
+    """Compact msgpack codec using extension types for models, datetimes and UUIDs."""
+
+    name = "msgpack"
+    codec_id = 2
+
+    def __init__(self):
+        if not MSGPACK_AVAILABLE:
+            raise ImportError("msgpack is not installed")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True, datetime=False)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+    def _default(self, obj: Any) -> Any:
+        if isinstance(obj, BaseModel):
+            payload = self.dumps([type(obj).__name__, obj.model_dump()])
+            return msgpack.ExtType(_EXT_MODEL, payload)
+        if isinstance(obj, datetime):
+            return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+        if isinstance(obj, date):
+            return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+        if isinstance(obj, uuid.UUID):
+            return msgpack.ExtType(_EXT_UUID, obj.bytes)
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Cannot cache value of type {type(obj).__name__}")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == _EXT_MODEL:
+            name, fields = self.loads(data)
+            return _model_class(name).model_validate(fields)
+        if code == _EXT_DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == _EXT_DATE:
+            return date.fromisoformat(data.decode())
+        if code == _EXT_UUID:
+            return uuid.UUID(bytes=data)
+        return msgpack.ExtType(code, data)
+
+
+class _PrefixStats:
+    """Encode/decode counters for one key prefix."""
+
+    __slots__ = (
+        "encodes", "encode_seconds", "decodes", "decode_seconds",
+        "raw_bytes", "stored_bytes", "compressed"
+    )
+
+    def __init__(self):
+        self.encodes = 0
+        self.encode_seconds = 0.0
+        self.decodes = 0
+        self.decode_seconds = 0.0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compressed = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "encodes": self.encodes,
+            "decodes": self.decodes,
+            "avg_encode_ms": round(self.encode_seconds / self.encodes * 1000, 3) if self.encodes else 0.0,
+            "avg_decode_ms": round(self.decode_seconds / self.decodes * 1000, 3) if self.decodes else 0.0,
+            "avg_payload_bytes": self.stored_bytes // self.encodes if self.encodes else 0,
+            "compression_ratio": round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else 1.0,
+            "compressed_payloads": self.compressed
+        }
+
+
+class CacheSerializer:
+    """
+    Frames codec output for storage and records its cost per key prefix.
+
+    Payloads carry a two-byte header (magic, then codec id and flags), so
+    the configured codec can change without invalidating what is already
+    in Redis; bodies above the threshold are zlib-compressed. Payloads
+    without the header are read as the plain JSON written by older
+    releases.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[CacheCodec] = None,
+        compress_threshold: int = 4096,
+        compress_level: int = 1
+    ):
+        self._codec = codec or default_codec()
+        self._codecs: Dict[int, CacheCodec] = {JsonCodec.codec_id: JsonCodec()}
+        if MSGPACK_AVAILABLE:
+            self._codecs[MsgpackCodec.codec_id] = MsgpackCodec()
+        self._codecs[self._codec.codec_id] = self._codec
+        self._compress_threshold = compress_threshold
+        self._compress_level = compress_level
+        self._stats: Dict[str, _PrefixStats] = {}
+
+    @property
+    def codec(self) -> CacheCodec:
+        """Codec used for new payloads."""
+        return self._codec
+
+    def encode(self, value: Any, prefix: str = "") -> bytes:
+        """
+        Encode a value for storage.
+
+        Args:
+            value: Value to encode
+            prefix: Key prefix the value is recorded under
+
+        Returns:
+            Framed payload
+        """
+        started = time.perf_counter()
+        body = self._codec.dumps(value)
+        raw_size = len(body)
+        flags = 0
+        if raw_size >= self._compress_threshold:
+            compressed = zlib.compress(body, self._compress_level)
+            if len(compressed) < raw_size:
+                body = compressed
+                flags |= FLAG_COMPRESSED
+        payload = bytes((MAGIC, (self._codec.codec_id << 1) | flags)) + body
+
+        stats = self._stats_for(prefix)
+        stats.encodes += 1
+        stats.encode_seconds += time.perf_counter() - started
+        stats.raw_bytes += raw_size
+        stats.stored_bytes += len(payload)
+        if flags & FLAG_COMPRESSED:
+            stats.compressed += 1
+        return payload
+
+    def decode(self, payload: bytes, prefix: str = "") -> Any:
+        """
+        Decode a stored payload.
+
+        Args:
+            payload: Bytes read from the backend
+            prefix: Key prefix the value is recorded under
+
+        Returns:
+            Decoded value
+        """
+        started = time.perf_counter()
+        if not payload or payload[0] != MAGIC:
+            value = json.loads(payload)
+        else:
+            header = payload[1]
+            codec = self._codecs.get(header >> 1)
+            if codec is None:
+                raise ValueError(f"Unknown cache codec id {header >> 1}")
+            body = payload[2:]
+            if header & FLAG_COMPRESSED:
+                body = zlib.decompress(body)
+            value = codec.loads(body)
+
+        stats = self._stats_for(prefix)
+        stats.decodes += 1
+        stats.decode_seconds += time.perf_counter() - started
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-prefix codec statistics."""
+        return {
+            "codec": self._codec.name,
+            "compress_threshold": self._compress_threshold,
+            "prefixes": {prefix: stats.to_dict() for prefix, stats in self._stats.items()}
+        }
+
+    def _stats_for(self, prefix: str) -> _PrefixStats:
+        stats = self._stats.get(prefix)
+        if stats is None:
+            stats = self._stats[prefix] = _PrefixStats()
+        return stats
+
+
+def default_codec(name: Optional[str] = None) -> CacheCodec:
+    """
+    Build the configured codec, falling back to JSON without msgpack.
+
+    Args:
+        name: "msgpack" or "json"; msgpack when not given
+    """
+    if name == JsonCodec.name:
+        return JsonCodec()
+    if MSGPACK_AVAILABLE:
+        return MsgpackCodec()
+    if name == MsgpackCodec.name:
+        logger.warning("msgpack not installed, falling back to JSON cache codec")
+    return JsonCodec()
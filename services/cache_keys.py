@@ -0,0 +1,140 @@
+"""
+Deterministic cache key and tag construction.
+"""
+
+import enum
+import hashlib
+import inspect
+import json
+import uuid
+from string import Formatter
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from pydantic import BaseModel
+
+# Longest key stored verbatim; longer keys are hashed
+MAX_KEY_LENGTH = 200
+
+_NONE_PART = "-"
+_RECEIVER_NAMES = ("self", "cls")
+
+
+def normalize_key_part(value: Any) -> str:
+    """
+    Render one argument as a stable, process-independent key fragment.
+
+    Ints and UUIDs normalise to the same fragment whether they arrive as
+    native objects or as strings, so ``42`` and ``"42"`` share a key.
+
+    Args:
+        value: Argument value
+
+    Returns:
+        Key fragment
+    """
+    if value is None:
+        return _NONE_PART
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return normalize_key_part(value.value)
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.lstrip("-").isdigit():
+            return str(int(stripped))
+        try:
+            return str(uuid.UUID(stripped))
+        except ValueError:
+            return stripped
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, BaseModel):
+        payload = value.model_dump_json()
+    else:
+        payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def make_tag(namespace: str, value: Any) -> str:
+    """Build an invalidation tag such as ``story:42`` or ``user:<uuid>``."""
+    return f"{namespace}:{normalize_key_part(value)}"
+
+
+def hash_long_key(prefix: str, key: str) -> str:
+    """Hash keys that would be unwieldy in Redis."""
+    if len(key) > MAX_KEY_LENGTH:
+        return f"{prefix}:{hashlib.md5(key.encode()).hexdigest()}"
+    return key
+
+
+class CacheKeyBuilder:
+    """
+    Builds cache keys and tags for calls to one decorated function.
+
+    Arguments are bound to the function signature, so positional and
+    keyword spellings of the same call map to one key, and a bound
+    receiver (``self``/``cls``) never becomes part of the key.
+    """
+
+    def __init__(self, func: Callable, key_prefix: str, tags: Iterable[str] = ()):
+        self._signature = inspect.signature(func)
+        parameters = list(self._signature.parameters)
+        self._skip_receiver = bool(parameters) and parameters[0] in _RECEIVER_NAMES
+        self._prefix = f"{key_prefix}:{func.__name__}"
+        self._tag_templates: List[Tuple[str, Tuple[str, ...]]] = [
+            (template, tuple(
+                field for _, field, _, _ in Formatter().parse(template) if field
+            ))
+            for template in tags
+        ]
+
+    @property
+    def prefix(self) -> str:
+        """Key prefix shared by every call to the function."""
+        return self._prefix
+
+    def bind(self, args: tuple, kwargs: dict) -> Dict[str, Any]:
+        """Bind call arguments by name, dropping the receiver."""
+        bound = self._signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        if self._skip_receiver:
+            arguments.pop(next(iter(self._signature.parameters)), None)
+        return arguments
+
+    def replace(self, args: tuple, kwargs: dict, name: str, value: Any) -> Tuple[tuple, dict]:
+        """Return call arguments with one parameter replaced, receiver kept."""
+        bound = self._signature.bind(*args, **kwargs)
+        bound.arguments[name] = value
+        return bound.args, bound.kwargs
+
+    def build(self, args: tuple, kwargs: dict) -> Tuple[str, List[str]]:
+        """
+        Build the key and tags for a call.
+
+        Returns:
+            Tuple of (cache key, invalidation tags)
+        """
+        arguments = self.bind(args, kwargs)
+        key = self.key_for(arguments)
+        return key, self.tags_for(arguments)
+
+    def key_for(self, arguments: Dict[str, Any]) -> str:
+        """Build the key for already-bound arguments."""
+        parts = [normalize_key_part(value) for value in arguments.values()]
+        return hash_long_key(self._prefix, ":".join([self._prefix, *parts]))
+
+    def tags_for(self, arguments: Dict[str, Any]) -> List[str]:
+        """Expand tag templates, skipping ones whose fields are unset."""
+        tags = []
+        for template, fields in self._tag_templates:
+            if any(arguments.get(field) is None for field in fields):
+                continue
+            tags.append(template.format(**{
+                field: normalize_key_part(arguments[field]) for field in fields
+            }))
+        return tags
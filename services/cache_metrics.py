@@ -0,0 +1,166 @@
+"""
+Constant-time cache metrics broken down by key prefix and tier.
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+# Tiers a cache event can be attributed to
+TIER_MEMORY = "memory"
+TIER_REDIS = "redis"
+
+# Upper bounds (ms) of the latency histogram buckets; the last is unbounded
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_EVENTS = ("hits", "stale_hits", "misses", "sets", "evictions", "expirations", "deletes")
+
+
+def key_prefix(key: Any) -> str:
+    """Group keys by namespace and function, e.g. ``story:get_story``."""
+    if isinstance(key, bytes):
+        key = key.decode(errors="replace")
+    return ":".join(str(key).split(":", 2)[:2])
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; recording is O(log buckets)."""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        """Record one observation."""
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given percentile, in ms."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + ["+inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class _PrefixCounters:
+    """Event counters and resident bytes for one key prefix."""
+
+    __slots__ = ("tiers", "memory_bytes", "memory_items")
+
+    def __init__(self):
+        self.tiers: Dict[str, Dict[str, int]] = {
+            TIER_MEMORY: dict.fromkeys(_EVENTS, 0),
+            TIER_REDIS: dict.fromkeys(_EVENTS, 0)
+        }
+        self.memory_bytes = 0
+        self.memory_items = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        memory = self.tiers[TIER_MEMORY]
+        redis = self.tiers[TIER_REDIS]
+        served = memory["hits"] + memory["stale_hits"] + redis["hits"] + redis["stale_hits"]
+        # Every lookup consults the memory tier first
+        lookups = memory["hits"] + memory["stale_hits"] + memory["misses"]
+        return {
+            "memory": dict(memory),
+            "redis": dict(redis),
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "memory_items": self.memory_items,
+            "memory_bytes": self.memory_bytes,
+            "avg_entry_bytes": self.memory_bytes // self.memory_items if self.memory_items else 0
+        }
+
+
+class CacheMetrics:
+    """
+    Counters for the cache tiers.
+
+    Every update is O(1) so metrics can stay on in production. Counters
+    are kept per key prefix and tier; the memory tier also reports the
+    bytes and entries it holds per prefix through the MemoryCache
+    observer hooks (``stored``/``released``), and Redis operations are
+    timed into per-operation latency histograms.
+    """
+
+    def __init__(self):
+        self._prefixes: Dict[str, _PrefixCounters] = {}
+        self._redis_latency: Dict[str, LatencyHistogram] = {}
+        self._started = time.time()
+
+    def record(self, key: Any, tier: str, event: str, count: int = 1):
+        """Count an event for a key."""
+        self._counters(key_prefix(key)).tiers[tier][event] += count
+
+    def stored(self, key: str, size: int):
+        """MemoryCache hook: an entry was stored."""
+        counters = self._counters(key_prefix(key))
+        counters.memory_bytes += size
+        counters.memory_items += 1
+
+    def released(self, key: str, size: int, reason: str):
+        """MemoryCache hook: an entry left the memory tier."""
+        counters = self._counters(key_prefix(key))
+        counters.memory_bytes -= size
+        counters.memory_items -= 1
+        if reason in ("deletes", "evictions", "expirations"):
+            counters.tiers[TIER_MEMORY][reason] += 1
+
+    @contextmanager
+    def time_redis(self, operation: str) -> Iterator[None]:
+        """Time a Redis round-trip into the operation's histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram = self._redis_latency.get(operation)
+            if histogram is None:
+                histogram = self._redis_latency[operation] = LatencyHistogram()
+            histogram.record(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get all metrics as plain data."""
+        totals = {tier: dict.fromkeys(_EVENTS, 0) for tier in (TIER_MEMORY, TIER_REDIS)}
+        for counters in self._prefixes.values():
+            for tier, events in counters.tiers.items():
+                for event, value in events.items():
+                    totals[tier][event] += value
+
+        return {
+            "since": self._started,
+            "totals": totals,
+            "prefixes": {prefix: counters.to_dict() for prefix, counters in self._prefixes.items()},
+            "redis_latency": {op: histogram.to_dict() for op, histogram in self._redis_latency.items()}
+        }
+
+    def _counters(self, prefix: str) -> _PrefixCounters:
+        counters = self._prefixes.get(prefix)
+        if counters is None:
+            counters = self._prefixes[prefix] = _PrefixCounters()
+        return counters
@@ -2,26 +2,68 @@
 Smart caching service with multiple backends.
 """
 
-import json
+import time
 import asyncio
-from typing import Any, Optional, Union, Dict
-from datetime import datetime, timedelta
-import hashlib
+import uuid
+from typing import Any, Awaitable, Callable, Optional, Dict, Iterable, List, Set, Tuple
+from datetime import timedelta
 from functools import wraps
+from config import settings
 from logger_config import setup_logger
+from .memory_cache import MemoryCache, MISSING
+from .cache_codec import CacheSerializer, default_codec
+from .cache_bus import CacheInvalidationBus, OP_KEYS, OP_PATTERN, OP_TAGS, OP_CLEAR
+from .cache_metrics import CacheMetrics, TIER_MEMORY, TIER_REDIS, key_prefix
+from .cache_keys import CacheKeyBuilder, hash_long_key, normalize_key_part
 
 logger = setup_logger(__name__)
 
+# Redis sets holding the keys for each tag
+TAG_KEY_PREFIX = "cache:tag:"
+# Tag sets outlive every entry they index
+TAG_SET_TTL = timedelta(days=2)
+# Redis keys for cross-worker recompute leases
+LEASE_KEY_PREFIX = "cache:lease:"
+# Longest a value read back from Redis stays fresh in the memory tier while
+# the invalidation bus is down; with the bus up copies live as long as in Redis
+MEMORY_COPY_TTL = timedelta(minutes=5)
+# Marks the metadata envelope stored around Redis values
+ENVELOPE_MARKER = "__cache__"
+
+# Delete a lease only if this worker still holds it
+_RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
 class CacheService:
     """
     Multi-tier caching service with memory and optional Redis backend.
     Provides smart caching for embeddings, Stories, and database queries.
     """
     
-    def __init__(self, max_memory_items: int = 1000):
-        self._memory_cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        max_memory_items: Optional[int] = None,
+        max_memory_bytes: int = settings.CACHE_MEMORY_MAX_BYTES
+    ):
+        self._metrics = CacheMetrics()
+        self._memory_cache = MemoryCache(
+            max_bytes=max_memory_bytes,
+            max_items=max_memory_items,
+            observer=self._metrics
+        )
         self._max_memory_items = max_memory_items
         self._redis_client = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._serializer = CacheSerializer(
+            default_codec(settings.CACHE_CODEC),
+            compress_threshold=settings.CACHE_COMPRESS_THRESHOLD
+        )
+        self._bus = CacheInvalidationBus(self._apply_invalidation)
         
     async def initialize_redis(self, redis_url: Optional[str] = None):
         """Initialize Redis backend if available."""
@@ -34,161 +76,712 @@ class CacheService:
             self._redis_client = redis.from_url(redis_url)
             await self._redis_client.ping()
             logger.info("Redis cache backend initialized")
+            await self._bus.start(self._redis_client)
         except ImportError:
             logger.warning("Redis not available, using memory-only cache")
         except Exception as e:
             logger.warning(f"Could not connect to Redis: {e}, using memory-only cache")
+            self._redis_client = None
     
-    def _generate_key(self, prefix: str, *args, **kwargs) -> str:
-        """Generate cache key from arguments."""
-        key_data = f"{prefix}:{':'.join(map(str, args))}"
-        if kwargs:
-            sorted_kwargs = sorted(kwargs.items())
-            key_data += f":{':'.join(f'{k}={v}' for k, v in sorted_kwargs)}"
+    async def close(self):
+        """Cancel background refreshes and close the Redis backend."""
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
         
-        # Hash long keys
-        if len(key_data) > 200:
-            key_data = f"{prefix}:{hashlib.md5(key_data.encode()).hexdigest()}"
+        await self._bus.stop()
         
-        return key_data
+        if self._redis_client:
+            await self._redis_client.aclose()
+            self._redis_client = None
+    
+    def _generate_key(self, prefix: str, *args, **kwargs) -> str:
+        """Generate cache key from arguments."""
+        parts = [normalize_key_part(arg) for arg in args]
+        parts.extend(f"{k}={normalize_key_part(v)}" for k, v in sorted(kwargs.items()))
+        return hash_long_key(prefix, ":".join([prefix, *parts]))
     
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache."""
+        """Get a fresh value from cache (None on miss)."""
+        value, stale = await self._lookup(key)
+        if value is MISSING or stale:
+            return None
+        return value
+    
+    async def _lookup(self, key: str) -> Tuple[Any, bool]:
+        """
+        Look a key up in memory, then Redis.
+        
+        Returns:
+            Tuple of (value or MISSING, whether the value is stale)
+        """
         # Try memory cache first
-        if key in self._memory_cache:
-            cache_item = self._memory_cache[key]
-            if datetime.now() < cache_item["expires_at"]:
-                logger.debug(f"Cache hit (memory): {key}")
-                return cache_item["value"]
-            else:
-                # Expired
-                del self._memory_cache[key]
+        value, stale = self._memory_cache.lookup(key)
+        if value is not MISSING:
+            logger.debug(f"Cache hit (memory{', stale' if stale else ''}): {key}")
+            self._metrics.record(key, TIER_MEMORY, "stale_hits" if stale else "hits")
+            return value, stale
+        self._metrics.record(key, TIER_MEMORY, "misses")
         
         # Try Redis if available
         if self._redis_client:
             try:
-                value = await self._redis_client.get(key)
-                if value:
-                    logger.debug(f"Cache hit (Redis): {key}")
-                    decoded_value = json.loads(value)
-                    # Store in memory for faster access
-                    self._set_memory_cache(key, decoded_value, timedelta(minutes=5))
-                    return decoded_value
+                with self._metrics.time_redis("get"):
+                    raw_value = await self._redis_client.get(key)
+                if raw_value is not None:
+                    return self._accept_redis_value(key, raw_value)
+                self._metrics.record(key, TIER_REDIS, "misses")
             except Exception as e:
                 logger.warning(f"Redis cache error: {e}")
         
         logger.debug(f"Cache miss: {key}")
-        return None
+        return MISSING, False
+    
+    async def _lookup_many(self, keys: Iterable[str]) -> Dict[str, Tuple[Any, bool]]:
+        """
+        Look keys up in memory, then fetch the rest from Redis in one MGET.
+        
+        Returns:
+            Dict of key -> (value, whether the value is stale) for hits only
+        """
+        found: Dict[str, Tuple[Any, bool]] = {}
+        remaining: List[str] = []
+        for key in dict.fromkeys(keys):
+            value, stale = self._memory_cache.lookup(key)
+            if value is MISSING:
+                self._metrics.record(key, TIER_MEMORY, "misses")
+                remaining.append(key)
+            else:
+                self._metrics.record(key, TIER_MEMORY, "stale_hits" if stale else "hits")
+                found[key] = (value, stale)
+        
+        if remaining and self._redis_client:
+            try:
+                with self._metrics.time_redis("mget"):
+                    raw_values = await self._redis_client.mget(remaining)
+            except Exception as e:
+                logger.warning(f"Redis cache mget error: {e}")
+                raw_values = [None] * len(remaining)
+            for key, raw_value in zip(remaining, raw_values):
+                if raw_value is None:
+                    self._metrics.record(key, TIER_REDIS, "misses")
+                    continue
+                try:
+                    found[key] = self._accept_redis_value(key, raw_value)
+                except Exception as e:
+                    logger.warning(f"Redis cache decode error for {key}: {e}")
+        
+        logger.debug(f"Cache get_many: {len(found)} hits")
+        return found
+    
+    def _accept_redis_value(self, key: str, raw_value: bytes) -> Tuple[Any, bool]:
+        """
+        Decode a Redis payload and copy it into the memory tier.
+        
+        Returns:
+            Tuple of (value, whether the value is stale)
+        """
+        value, fresh_for, stale_for, tags = self._unwrap(
+            self._serializer.decode(raw_value, key_prefix(key))
+        )
+        logger.debug(f"Cache hit (Redis): {key}")
+        self._metrics.record(key, TIER_REDIS, "stale_hits" if fresh_for <= 0 else "hits")
+        # Store in memory for faster access; past the copy TTL the
+        # memory entry simply expires so Redis is consulted again
+        copy_ttl = fresh_for if self._bus.active else MEMORY_COPY_TTL.total_seconds()
+        self._memory_cache.set(
+            key,
+            value,
+            max(min(fresh_for, copy_ttl), 0.0),
+            tags,
+            stale_for if fresh_for <= copy_ttl else 0.0
+        )
+        return value, fresh_for <= 0
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Get fresh values for several keys with at most one Redis round-trip.
+        
+        Args:
+            keys: Cache keys
+            
+        Returns:
+            Dict of key -> value for fresh hits; misses are omitted
+        """
+        found = await self._lookup_many(keys)
+        return {key: value for key, (value, stale) in found.items() if not stale}
+    
+    @staticmethod
+    def _wrap(value: Any, ttl: timedelta, stale_ttl: timedelta, tags: List[str]) -> Dict[str, Any]:
+        """Wrap a value with the metadata other workers need to reuse it."""
+        fresh_until = time.time() + ttl.total_seconds()
+        return {
+            ENVELOPE_MARKER: 1,
+            "value": value,
+            "fresh_until": fresh_until,
+            "stale_until": fresh_until + stale_ttl.total_seconds(),
+            "tags": tags
+        }
+    
+    @staticmethod
+    def _unwrap(payload: Any) -> Tuple[Any, float, float, List[str]]:
+        """
+        Unwrap a Redis payload.
+        
+        Returns:
+            Tuple of (value, seconds still fresh, seconds of stale window left, tags)
+        """
+        if not (isinstance(payload, dict) and ENVELOPE_MARKER in payload):
+            # Bare value written before envelopes existed
+            return payload, MEMORY_COPY_TTL.total_seconds(), 0.0, []
+        
+        now = time.time()
+        fresh_for = payload["fresh_until"] - now
+        stale_for = payload["stale_until"] - max(now, payload["fresh_until"])
+        return payload["value"], fresh_for, max(stale_for, 0.0), payload.get("tags", [])
     
-    async def set(self, key: str, value: Any, ttl: timedelta = timedelta(hours=1)):
-        """Set value in cache."""
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: timedelta = timedelta(hours=1),
+        tags: Iterable[str] = (),
+        stale_ttl: timedelta = timedelta(0)
+    ):
+        """
+        Set value in cache.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time the value stays fresh
+            tags: Invalidation tags, e.g. ``story:42`` or ``user:<uuid>``
+            stale_ttl: Extra window during which the value may be served stale
+        """
+        tags = list(tags)
+        
         # Store in memory
-        self._set_memory_cache(key, value, ttl)
+        self._set_memory_cache(key, value, ttl, tags, stale_ttl)
         
         # Store in Redis if available
         if self._redis_client:
             try:
-                serialized_value = json.dumps(value, default=str)
-                await self._redis_client.setex(
-                    key, 
-                    int(ttl.total_seconds()), 
-                    serialized_value
-                )
+                async with self._redis_client.pipeline(transaction=False) as pipe:
+                    self._queue_redis_set(pipe, key, value, ttl, tags, stale_ttl)
+                    # Other workers drop their memory copies of the old value
+                    self._bus.queue_publish(pipe, OP_KEYS, [key])
+                    with self._metrics.time_redis("set"):
+                        await pipe.execute()
                 logger.debug(f"Cached in Redis: {key}")
             except Exception as e:
                 logger.warning(f"Redis cache set error: {e}")
     
-    def _set_memory_cache(self, key: str, value: Any, ttl: timedelta):
-        """Set value in memory cache with LRU eviction."""
-        # LRU eviction
-        if len(self._memory_cache) >= self._max_memory_items:
-            # Remove oldest item
-            oldest_key = min(
-                self._memory_cache.keys(),
-                key=lambda k: self._memory_cache[k]["created_at"]
-            )
-            del self._memory_cache[oldest_key]
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl: timedelta = timedelta(hours=1),
+        tags: Optional[Dict[str, Iterable[str]]] = None,
+        stale_ttl: timedelta = timedelta(0)
+    ):
+        """
+        Set several values with a single Redis pipeline.
         
-        self._memory_cache[key] = {
-            "value": value,
-            "created_at": datetime.now(),
-            "expires_at": datetime.now() + ttl
-        }
-        logger.debug(f"Cached in memory: {key}")
+        Args:
+            items: Dict of key -> value
+            ttl: Time the values stay fresh
+            tags: Optional dict of key -> invalidation tags
+            stale_ttl: Extra window during which the values may be served stale
+        """
+        if not items:
+            return
+        tags = tags or {}
+        
+        for key, value in items.items():
+            self._set_memory_cache(key, value, ttl, tags.get(key, ()), stale_ttl)
+        
+        if self._redis_client:
+            try:
+                async with self._redis_client.pipeline(transaction=False) as pipe:
+                    for key, value in items.items():
+                        self._queue_redis_set(pipe, key, value, ttl, list(tags.get(key, ())), stale_ttl)
+                    self._bus.queue_publish(pipe, OP_KEYS, list(items))
+                    with self._metrics.time_redis("set_many"):
+                        await pipe.execute()
+                logger.debug(f"Cached {len(items)} keys in Redis")
+            except Exception as e:
+                logger.warning(f"Redis cache set_many error: {e}")
+    
+    def _queue_redis_set(
+        self,
+        pipe,
+        key: str,
+        value: Any,
+        ttl: timedelta,
+        tags: List[str],
+        stale_ttl: timedelta
+    ):
+        """Queue the commands that store one value and index its tags."""
+        serialized_value = self._serializer.encode(
+            self._wrap(value, ttl, stale_ttl, tags), key_prefix(key)
+        )
+        self._metrics.record(key, TIER_REDIS, "sets")
+        pipe.setex(key, int((ttl + stale_ttl).total_seconds()), serialized_value)
+        for tag in tags:
+            pipe.sadd(f"{TAG_KEY_PREFIX}{tag}", key)
+            pipe.expire(f"{TAG_KEY_PREFIX}{tag}", int(TAG_SET_TTL.total_seconds()))
+    
+    def _set_memory_cache(
+        self,
+        key: str,
+        value: Any,
+        ttl: timedelta,
+        tags: Iterable[str] = (),
+        stale_ttl: timedelta = timedelta(0)
+    ):
+        """Set value in memory cache with LRU eviction."""
+        self._metrics.record(key, TIER_MEMORY, "sets")
+        if self._memory_cache.set(key, value, ttl.total_seconds(), tags, stale_ttl.total_seconds()):
+            logger.debug(f"Cached in memory: {key}")
+        else:
+            logger.debug(f"Value too large for memory cache: {key}")
     
     async def delete(self, key: str):
         """Delete value from cache."""
         # Remove from memory
-        if key in self._memory_cache:
-            del self._memory_cache[key]
+        self._memory_cache.delete(key)
         
         # Remove from Redis
         if self._redis_client:
             try:
-                await self._redis_client.delete(key)
+                with self._metrics.time_redis("delete"):
+                    await self._redis_client.delete(key)
+                self._metrics.record(key, TIER_REDIS, "deletes")
             except Exception as e:
                 logger.warning(f"Redis cache delete error: {e}")
+            await self._bus.publish(OP_KEYS, [key])
+    
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        Delete several keys with a single Redis call.
+        
+        Returns:
+            Number of keys removed from the memory tier
+        """
+        keys = list(dict.fromkeys(keys))
+        removed = sum(self._memory_cache.delete(key) for key in keys)
+        
+        if keys and self._redis_client:
+            try:
+                with self._metrics.time_redis("delete"):
+                    await self._redis_client.delete(*keys)
+                for key in keys:
+                    self._metrics.record(key, TIER_REDIS, "deletes")
+            except Exception as e:
+                logger.warning(f"Redis cache delete_many error: {e}")
+            await self._bus.publish(OP_KEYS, keys)
+        
+        return removed
     
     async def clear_pattern(self, pattern: str):
         """Clear all keys matching pattern."""
         # Clear from memory
-        keys_to_delete = [k for k in self._memory_cache.keys() if pattern in k]
-        for key in keys_to_delete:
-            del self._memory_cache[key]
+        self._apply_invalidation(OP_PATTERN, [pattern])
         
-        # Clear from Redis
+        # Clear from Redis (SCAN, so Redis is never blocked by KEYS)
         if self._redis_client:
             try:
-                keys = await self._redis_client.keys(f"*{pattern}*")
-                if keys:
-                    await self._redis_client.delete(*keys)
+                batch = []
+                async for key in self._redis_client.scan_iter(match=f"*{pattern}*", count=500):
+                    batch.append(key)
+                    if len(batch) >= 500:
+                        await self._redis_client.delete(*batch)
+                        batch = []
+                if batch:
+                    await self._redis_client.delete(*batch)
             except Exception as e:
                 logger.warning(f"Redis pattern clear error: {e}")
+            await self._bus.publish(OP_PATTERN, [pattern])
     
-    def cached(self, ttl: timedelta = timedelta(hours=1), key_prefix: str = "func"):
-        """Decorator for caching function results."""
+    async def clear(self):
+        """Clear the memory tier of every worker; Redis entries expire normally."""
+        self._apply_invalidation(OP_CLEAR, [])
+        await self._bus.publish(OP_CLEAR, [])
+    
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        Invalidate every entry carrying any of the given tags.
+        
+        Costs O(entries tagged) in both tiers instead of a key scan.
+        
+        Args:
+            tags: Tags to invalidate, e.g. ``make_tag("story", 42)``
+            
+        Returns:
+            Number of memory-tier entries removed
+        """
+        removed = 0
+        for tag in tags:
+            removed += len(self._memory_cache.invalidate_tag(tag))
+        
+        if self._redis_client and tags:
+            try:
+                tag_keys = [f"{TAG_KEY_PREFIX}{tag}" for tag in tags]
+                async with self._redis_client.pipeline(transaction=False) as pipe:
+                    for tag_key in tag_keys:
+                        pipe.smembers(tag_key)
+                    with self._metrics.time_redis("tag_members"):
+                        members = await pipe.execute()
+                
+                keys: List[Any] = [key for group in members for key in group]
+                with self._metrics.time_redis("delete"):
+                    await self._redis_client.delete(*keys, *tag_keys)
+                for key in keys:
+                    self._metrics.record(key, TIER_REDIS, "deletes")
+            except Exception as e:
+                logger.warning(f"Redis tag invalidation error: {e}")
+            await self._bus.publish(OP_TAGS, list(tags))
+        
+        logger.debug(f"Invalidated tags {list(tags)} ({removed} memory entries)")
+        return removed
+    
+    def _apply_invalidation(self, op: str, args: List[Any]):
+        """Apply an invalidation to the memory tier (local or from the bus)."""
+        if op == OP_KEYS:
+            for key in args:
+                self._memory_cache.delete(key)
+        elif op == OP_PATTERN:
+            for pattern in args:
+                for key in [k for k in self._memory_cache.keys() if pattern in k]:
+                    self._memory_cache.delete(key)
+        elif op == OP_TAGS:
+            for tag in args:
+                self._memory_cache.invalidate_tag(tag)
+        elif op == OP_CLEAR:
+            self._memory_cache.clear()
+        else:
+            logger.warning(f"Unknown cache invalidation op: {op}")
+    
+    async def single_flight(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        lease: bool = False,
+        lease_ttl: timedelta = timedelta(seconds=30),
+        wait_timeout: timedelta = timedelta(seconds=10)
+    ) -> Any:
+        """
+        Coalesce concurrent computations of the same key.
+        
+        Within the process, followers await the leader's in-flight future.
+        With ``lease`` a Redis lease additionally elects one worker across
+        the fleet; workers that lose the lease poll the cache for its result.
+        Followers wait at most ``wait_timeout`` before computing themselves.
+        
+        Args:
+            key: Cache key being computed
+            compute: Coroutine factory that computes and caches the value
+            lease: Whether to take a Redis lease before computing
+            lease_ttl: Lease expiry, bounding how long a crashed leader blocks others
+            wait_timeout: Maximum time a follower waits for the leader
+            
+        Returns:
+            Computed (or coalesced) value
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(inflight), wait_timeout.total_seconds()
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Timed out waiting for in-flight computation: {key}")
+                return await compute()
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                return await compute()
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if lease:
+                result = await self._compute_with_lease(key, compute, lease_ttl, wait_timeout)
+            else:
+                result = await compute()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers re-raise it; don't log it as unretrieved
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+    
+    async def _compute_with_lease(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        lease_ttl: timedelta,
+        wait_timeout: timedelta
+    ) -> Any:
+        """Compute under a Redis lease, or wait for the worker holding it."""
+        if not self._redis_client:
+            return await compute()
+        
+        lease_key = f"{LEASE_KEY_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._redis_client.set(
+                lease_key, token, nx=True, px=int(lease_ttl.total_seconds() * 1000)
+            )
+        except Exception as e:
+            logger.warning(f"Redis lease error: {e}")
+            return await compute()
+        
+        if acquired:
+            try:
+                return await compute()
+            finally:
+                try:
+                    await self._redis_client.eval(_RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+                except Exception as e:
+                    logger.warning(f"Redis lease release error: {e}")
+        
+        # Another worker is computing: poll for its result with backoff
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_timeout.total_seconds()
+        delay = 0.05
+        while loop.time() < deadline:
+            await asyncio.sleep(delay)
+            value, stale = await self._lookup(key)
+            if value is not MISSING and not stale:
+                return value
+            try:
+                if not await self._redis_client.exists(lease_key):
+                    # Leader finished without caching a value (or died)
+                    break
+            except Exception:
+                break
+            delay = min(delay * 2, 0.5)
+        
+        logger.debug(f"Lease wait ended without a cached value, computing: {key}")
+        return await compute()
+    
+    def _schedule_refresh(self, key: str, load: Callable[[], Awaitable[Any]]):
+        """Recompute a stale key in the background unless already in progress."""
+        if key in self._inflight:
+            return
+        
+        task = asyncio.create_task(load())
+        self._background_tasks.add(task)
+        task.add_done_callback(lambda done: self._on_refresh_done(key, done))
+    
+    def _on_refresh_done(self, key: str, task: asyncio.Task):
+        """Forget a finished background refresh and log its failure."""
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh failed for {key}: {task.exception()}")
+    
+    def cached(
+        self,
+        ttl: timedelta = timedelta(hours=1),
+        key_prefix: str = "func",
+        tags: Iterable[str] = (),
+        single_flight: bool = True,
+        lease: bool = False,
+        lease_ttl: timedelta = timedelta(seconds=30),
+        wait_timeout: timedelta = timedelta(seconds=10),
+        negative_ttl: Optional[timedelta] = None,
+        stale_ttl: timedelta = timedelta(0)
+    ):
+        """
+        Decorator for caching function results.
+        
+        Args:
+            ttl: Time to live for cached results
+            key_prefix: Namespace for the generated keys
+            tags: Tag templates formatted with the call's arguments,
+                e.g. ``("story:{story_id}",)``; templates whose arguments
+                are None are skipped
+            single_flight: Coalesce concurrent misses for the same key
+            lease: Also elect one recomputing worker via a Redis lease
+            lease_ttl: Lease expiry
+            wait_timeout: Maximum time followers wait for the leader
+            negative_ttl: Cache None results for this long; by default
+                None is never cached
+            stale_ttl: Window after ``ttl`` during which an expired result
+                is still returned immediately while a background refresh
+                recomputes it
+        """
         def decorator(func):
+            key_builder = CacheKeyBuilder(func, key_prefix, tags)
+            
             @wraps(func)
             async def wrapper(*args, **kwargs):
                 # Generate cache key
-                cache_key = self._generate_key(
-                    f"{key_prefix}:{func.__name__}", 
-                    *args, 
-                    **kwargs
-                )
+                cache_key, cache_tags = key_builder.build(args, kwargs)
+                
+                async def compute():
+                    # Execute function
+                    if asyncio.iscoroutinefunction(func):
+                        result = await func(*args, **kwargs)
+                    else:
+                        result = func(*args, **kwargs)
+                    
+                    # Cache result
+                    if result is not None:
+                        await self.set(cache_key, result, ttl, cache_tags, stale_ttl)
+                    elif negative_ttl is not None:
+                        await self.set(cache_key, None, negative_ttl, cache_tags)
+                    return result
+                
+                async def load():
+                    if not single_flight:
+                        return await compute()
+                    return await self.single_flight(
+                        cache_key,
+                        compute,
+                        lease=lease,
+                        lease_ttl=lease_ttl,
+                        wait_timeout=wait_timeout
+                    )
                 
                 # Try to get from cache
-                cached_result = await self.get(cache_key)
-                if cached_result is not None:
+                cached_result, stale = await self._lookup(cache_key)
+                if cached_result is not MISSING:
+                    if stale:
+                        self._schedule_refresh(cache_key, load)
                     return cached_result
                 
-                # Execute function
-                if asyncio.iscoroutinefunction(func):
-                    result = await func(*args, **kwargs)
-                else:
-                    result = func(*args, **kwargs)
+                return await load()
+            
+            wrapper.key_builder = key_builder
+            return wrapper
+        return decorator
+    
+    def cached_batch(
+        self,
+        batch_arg: str,
+        ttl: timedelta = timedelta(hours=1),
+        key_prefix: str = "func",
+        tags: Iterable[str] = (),
+        negative_ttl: Optional[timedelta] = None
+    ):
+        """
+        Decorator caching a batch-shaped function per element.
+        
+        The decorated function takes a list of items in ``batch_arg`` and
+        returns a dict of item -> result. Each item is cached under its own
+        key, cached items are served with one bulk lookup, and the function
+        is called once with only the items that missed.
+        
+        Args:
+            batch_arg: Name of the parameter holding the items
+            ttl: Time to live for each cached result
+            key_prefix: Namespace for the generated keys
+            tags: Tag templates; ``{<batch_arg>}`` expands to a single item
+            negative_ttl: Cache items missing from the result as None for
+                this long; by default they are not cached
+        """
+        def decorator(func):
+            key_builder = CacheKeyBuilder(func, key_prefix, tags)
+            
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                arguments = key_builder.bind(args, kwargs)
+                items = list(arguments[batch_arg] or [])
+                
+                # One key (and tag set) per distinct item
+                item_keys: List[str] = []
+                keys: Dict[str, Any] = {}
+                item_tags: Dict[str, List[str]] = {}
+                for item in items:
+                    item_arguments = {**arguments, batch_arg: item}
+                    key = key_builder.key_for(item_arguments)
+                    item_keys.append(key)
+                    if key not in keys:
+                        keys[key] = item
+                        item_tags[key] = key_builder.tags_for(item_arguments)
+                
+                found = await self._lookup_many(keys)
+                results = {key: value for key, (value, stale) in found.items() if not stale}
+                missing = {key: item for key, item in keys.items() if key not in results}
                 
-                # Cache result
-                await self.set(cache_key, result, ttl)
-                return result
+                if missing:
+                    call_args, call_kwargs = key_builder.replace(
+                        args, kwargs, batch_arg, list(missing.values())
+                    )
+                    if asyncio.iscoroutinefunction(func):
+                        computed = await func(*call_args, **call_kwargs)
+                    else:
+                        computed = func(*call_args, **call_kwargs)
+                    # Match results to keys however the function spells its items
+                    computed = {
+                        normalize_key_part(item): value
+                        for item, value in (computed or {}).items()
+                    }
+                    
+                    to_cache: Dict[str, Any] = {}
+                    negatives: Dict[str, Any] = {}
+                    for key, item in missing.items():
+                        value = computed.get(normalize_key_part(item))
+                        results[key] = value
+                        if value is not None:
+                            to_cache[key] = value
+                        elif negative_ttl is not None:
+                            negatives[key] = None
+                    await self.set_many(to_cache, ttl, item_tags)
+                    if negatives:
+                        await self.set_many(negatives, negative_ttl, item_tags)
+                
+                return {
+                    item: results[key]
+                    for item, key in zip(items, item_keys)
+                    if results.get(key) is not None
+                }
             
+            wrapper.key_builder = key_builder
             return wrapper
         return decorator
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
+        # Entries held, then those among them past their deadline (released
+        # now), as the dict-based cache reported them
         memory_items = len(self._memory_cache)
-        memory_expired = sum(
-            1 for item in self._memory_cache.values()
-            if datetime.now() >= item["expires_at"]
-        )
+        memory_expired = self._memory_cache.expire()
+        memory_totals = self._metrics.snapshot()["totals"][TIER_MEMORY]
         
         return {
             "memory_items": memory_items,
             "memory_expired": memory_expired,
             "memory_active": memory_items - memory_expired,
-            "redis_available": self._redis_client is not None
+            "memory_expirations_total": memory_totals["expirations"],
+            "memory_evictions_total": memory_totals["evictions"],
+            "memory_bytes": self._memory_cache.current_bytes,
+            "memory_max_bytes": self._memory_cache.max_bytes,
+            "inflight_computations": len(self._inflight),
+            "background_refreshes": len(self._background_tasks),
+            "redis_available": self._redis_client is not None,
+            "invalidation_bus_active": self._bus.active,
+            "invalidations_sent": self._bus.messages_sent,
+            "invalidations_applied": self._bus.messages_applied
         }
+    
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """
+        Get per-prefix hit/miss/set/eviction counters, resident bytes,
+        Redis latency histograms and codec costs.
+        """
+        metrics = self._metrics.snapshot()
+        metrics["codec"] = self._serializer.get_stats()
+        return metrics
 
 # Global cache service instance
 cache_service = CacheService()
\ No newline at end of file
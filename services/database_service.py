@@ -3,25 +3,43 @@ Database service with connection pooling and async operations.
 """
 
 import asyncio
+import json
 import asyncpg
 import psycopg
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Tuple, Union
 from contextlib import asynccontextmanager
 import uuid
 from config import settings
 from logger_config import setup_logger
 from models.story_models import Story, Chapter
+from .pgvector_types import register_vector_codec
+from .loop_guard import assert_not_on_event_loop
 
 logger = setup_logger(__name__)
 
+# Table variants the app has used over time, in lookup order, with the
+# factory that maps each one's columns onto the unified models
+STORY_TABLES = (
+    ('"Stories"', Story.from_Stories_table),
+    ('Stories', Story.from_Stories_lowercase)
+)
+CHAPTER_TABLES = (
+    ('"Chapters"', Chapter.from_Chapters_table),
+    ('Chapters', Chapter.from_Chapters_lowercase)
+)
+
 class DatabaseService:
     """
     High-performance database service with connection pooling.
-    Handles both sync and async operations with automatic fallback.
+    All story data access is async on the asyncpg pool; scripts that need
+    blocking calls go through SyncDatabaseAdapter.
     """
     
     def __init__(self):
         self._async_pool: Optional[asyncpg.Pool] = None
+        # Set by discover_schema(); None means "not discovered, try every variant"
+        self._story_tables: Optional[List[tuple]] = None
+        self._chapter_tables: Optional[List[tuple]] = None
         self._sync_connection_string = self._get_sync_connection_string()
         self._async_connection_string = self._get_async_connection_string()
     
@@ -45,7 +63,8 @@ class DatabaseService:
                 self._async_connection_string,
                 min_size=min_size,
                 max_size=max_size,
-                command_timeout=60
+                command_timeout=60,
+                init=register_vector_codec
             )
             logger.info(f"Async database pool initialized (min={min_size}, max={max_size})")
         except Exception as e:
@@ -71,194 +90,221 @@ class DatabaseService:
         else:
             # Fallback to direct connection
             connection = await asyncpg.connect(self._async_connection_string)
+            await register_vector_codec(connection)
             try:
                 yield connection
             finally:
                 await connection.close()
     
+    @asynccontextmanager
+    async def get_maintenance_connection(self):
+        """
+        Get a dedicated connection without the pool's command timeout.
+        
+        For long-running DDL such as index builds and table migrations.
+        """
+        connection = await asyncpg.connect(self._async_connection_string, command_timeout=None)
+        await register_vector_codec(connection)
+        try:
+            yield connection
+        finally:
+            await connection.close()
+    
+    async def discover_schema(self) -> Dict[str, bool]:
+        """
+        Record which story and chapter table variants exist.
+        
+        Run once at startup so lookups only query tables that are there,
+        instead of falling back from one variant to the next per query.
+        
+        Returns:
+            Dict of table name -> whether it exists
+        """
+        names = [table for table, _ in STORY_TABLES + CHAPTER_TABLES]
+        async with self.get_async_connection() as conn:
+            rows = await conn.fetch(
+                'SELECT name, to_regclass(name) IS NOT NULL AS present FROM unnest($1::text[]) AS name',
+                names
+            )
+        present = {row["name"]: row["present"] for row in rows}
+        
+        self._story_tables = [variant for variant in STORY_TABLES if present.get(variant[0])]
+        self._chapter_tables = [variant for variant in CHAPTER_TABLES if present.get(variant[0])]
+        if not self._story_tables or not self._chapter_tables:
+            logger.warning(f"Story tables missing from the database: {present}")
+        logger.info(f"Discovered story schema: {present}")
+        return present
+    
+    async def _ensure_schema(self):
+        """Discover the schema on first use if startup did not."""
+        if self._story_tables is None or self._chapter_tables is None:
+            try:
+                await self.discover_schema()
+            except Exception as e:
+                logger.warning(f"Schema discovery failed, trying every table variant: {e}")
+    
+    def _story_variants(self) -> List[tuple]:
+        return list(STORY_TABLES) if self._story_tables is None else self._story_tables
+    
+    def _chapter_variants(self) -> List[tuple]:
+        return list(CHAPTER_TABLES) if self._chapter_tables is None else self._chapter_tables
+    
     def get_sync_connection(self):
-        """Get synchronous database connection."""
+        """
+        Get a blocking psycopg connection.
+        
+        Only for code running off the event loop (worker threads, scripts);
+        async code must use get_async_connection().
+        """
+        assert_not_on_event_loop("DatabaseService.get_sync_connection")
         return psycopg.connect(self._sync_connection_string)
     
     async def get_story_async(self, story_id: int, user_id: Optional[uuid.UUID] = None) -> Optional[Story]:
         """Get story by ID asynchronously."""
+        await self._ensure_schema()
         async with self.get_async_connection() as conn:
-            # Try Stories table first
-            query = 'SELECT * FROM "Stories" WHERE id = $1'
-            params = [story_id]
-            
-            if user_id:
-                query += ' AND user_id = $2'
-                params.append(user_id)
-            
-            try:
-                row = await conn.fetchrow(query, *params)
-                if row:
-                    return Story.from_Stories_table(dict(row))
-            except Exception as e:
-                logger.warning(f"Could not query Stories table: {e}")
-            
-            # Try Stories table
-            query = 'SELECT * FROM Stories WHERE id = $1'
-            params = [story_id]
-            
-            if user_id:
-                query += ' AND user_id = $2'
-                params.append(user_id)
-            
-            try:
-                row = await conn.fetchrow(query, *params)
-                if row:
-                    return Story.from_Stories_lowercase(dict(row))
-            except Exception as e:
-                logger.warning(f"Could not query Stories table: {e}")
-            
-            return None
-    
-    def get_story_sync(self, story_id: int, user_id: Optional[uuid.UUID] = None) -> Optional[Story]:
-        """Get story by ID synchronously."""
-        with self.get_sync_connection() as conn:
-            with conn.cursor() as cur:
-                # Try Stories table first
-                query = 'SELECT * FROM "Stories" WHERE id = %s'
+            for table, factory in self._story_variants():
+                query = f'SELECT * FROM {table} WHERE id = $1'
                 params = [story_id]
                 
                 if user_id:
-                    query += ' AND user_id = %s'
+                    query += ' AND user_id = $2'
                     params.append(user_id)
                 
                 try:
-                    cur.execute(query, params)
-                    row = cur.fetchone()
+                    row = await conn.fetchrow(query, *params)
                     if row:
-                        columns = [desc[0] for desc in cur.description]
-                        data = dict(zip(columns, row))
-                        return Story.from_Stories_table(data)
-                except Exception as e:
-                    logger.warning(f"Could not query Stories table: {e}")
+                        return factory(dict(row))
+                except asyncpg.UndefinedTableError as e:
+                    logger.warning(f"Could not query {table} table: {e}")
+            
+            return None
+    
+    async def get_story_with_Chapters_async(
+        self,
+        story_id: int,
+        user_id: Optional[uuid.UUID] = None
+    ) -> Optional[Tuple[Story, List[Chapter]]]:
+        """
+        Get a story and its ordered Chapters in one round-trip.
+        
+        Each discovered story table contributes one branch of a UNION
+        ordered by lookup preference; Chapters are aggregated per chapter
+        table with ``json_agg`` so no second query is needed.
+        
+        Args:
+            story_id: Story ID to fetch
+            user_id: Optional user ID for access control
+            
+        Returns:
+            (Story, Chapters) or None if the story was not found
+        """
+        await self._ensure_schema()
+        story_tables = self._story_variants()
+        chapter_tables = self._chapter_variants()
+        if not story_tables:
+            return None
+        
+        chapter_columns = "".join(
+            f", (SELECT json_agg(c ORDER BY c.chapter_number) FROM {table} c "
+            f"WHERE c.story_id = s.id) AS chapters_{position}"
+            for position, (table, _) in enumerate(chapter_tables)
+        )
+        user_filter = " AND s.user_id = $2" if user_id else ""
+        query = " UNION ALL ".join(
+            f"(SELECT {position} AS variant, to_jsonb(s) AS story{chapter_columns} "
+            f"FROM {table} s WHERE s.id = $1{user_filter})"
+            for position, (table, _) in enumerate(story_tables)
+        ) + " ORDER BY variant LIMIT 1"
+        params = [story_id, user_id] if user_id else [story_id]
+        
+        async with self.get_async_connection() as conn:
+            row = await conn.fetchrow(query, *params)
+        if row is None:
+            return None
+        
+        story = story_tables[row["variant"]][1](json.loads(row["story"]))
+        Chapters: List[Chapter] = []
+        # Same precedence as get_Chapters_async: the first table with rows wins
+        for position, (_, factory) in enumerate(chapter_tables):
+            rows = row[f"chapters_{position}"]
+            if rows:
+                Chapters = [factory(data) for data in json.loads(rows)]
+                break
+        return story, Chapters
+    
+    async def get_stories_async(
+        self,
+        story_ids: List[int],
+        user_id: Optional[uuid.UUID] = None
+    ) -> Dict[int, Story]:
+        """Get several Stories by ID in one query per table."""
+        Stories: Dict[int, Story] = {}
+        if not story_ids:
+            return Stories
+        
+        await self._ensure_schema()
+        async with self.get_async_connection() as conn:
+            for table, factory in self._story_variants():
+                remaining = [story_id for story_id in story_ids if story_id not in Stories]
+                if not remaining:
+                    break
                 
-                # Try Stories table
-                query = 'SELECT * FROM Stories WHERE id = %s'
-                params = [story_id]
+                query = f'SELECT * FROM {table} WHERE id = ANY($1::bigint[])'
+                params = [remaining]
                 
                 if user_id:
-                    query += ' AND user_id = %s'
+                    query += ' AND user_id = $2'
                     params.append(user_id)
                 
                 try:
-                    cur.execute(query, params)
-                    row = cur.fetchone()
-                    if row:
-                        columns = [desc[0] for desc in cur.description]
-                        data = dict(zip(columns, row))
-                        return Story.from_Stories_lowercase(data)
-                except Exception as e:
-                    logger.warning(f"Could not query Stories table: {e}")
-                
-                return None
+                    rows = await conn.fetch(query, *params)
+                    for row in rows:
+                        story = factory(dict(row))
+                        Stories[story.id] = story
+                except asyncpg.UndefinedTableError as e:
+                    logger.warning(f"Could not query {table} table: {e}")
+        
+        return Stories
     
     async def get_Chapters_async(self, story_id: int) -> List[Chapter]:
         """Get all Chapters for a story asynchronously."""
-        Chapters = []
-        
+        await self._ensure_schema()
         async with self.get_async_connection() as conn:
-            # Try Chapters table first
-            try:
-                rows = await conn.fetch(
-                    'SELECT * FROM "Chapters" WHERE story_id = $1 ORDER BY chapter_number',
-                    story_id
-                )
-                for row in rows:
-                    Chapters.append(Chapter.from_Chapters_table(dict(row)))
-                
-                if Chapters:
-                    return Chapters
-            except Exception as e:
-                logger.warning(f"Could not query Chapters table: {e}")
-            
-            # Try Chapters table
-            try:
-                rows = await conn.fetch(
-                    'SELECT * FROM Chapters WHERE story_id = $1 ORDER BY chapter_number',
-                    story_id
-                )
-                for row in rows:
-                    Chapters.append(Chapter.from_Chapters_lowercase(dict(row)))
-            except Exception as e:
-                logger.warning(f"Could not query Chapters table: {e}")
-        
-        return Chapters
-    
-    def get_Chapters_sync(self, story_id: int) -> List[Chapter]:
-        """Get all Chapters for a story synchronously."""
-        Chapters = []
-        
-        with self.get_sync_connection() as conn:
-            with conn.cursor() as cur:
-                # Try Chapters table first
-                try:
-                    cur.execute(
-                        'SELECT * FROM "Chapters" WHERE story_id = %s ORDER BY chapter_number',
-                        [story_id]
-                    )
-                    rows = cur.fetchall()
-                    columns = [desc[0] for desc in cur.description]
-                    
-                    for row in rows:
-                        data = dict(zip(columns, row))
-                        Chapters.append(Chapter.from_Chapters_table(data))
-                    
-                    if Chapters:
-                        return Chapters
-                except Exception as e:
-                    logger.warning(f"Could not query Chapters table: {e}")
-                
-                # Try Chapters table
+            for table, factory in self._chapter_variants():
                 try:
-                    cur.execute(
-                        'SELECT * FROM Chapters WHERE story_id = %s ORDER BY chapter_number',
-                        [story_id]
+                    rows = await conn.fetch(
+                        f'SELECT * FROM {table} WHERE story_id = $1 ORDER BY chapter_number',
+                        story_id
                     )
-                    rows = cur.fetchall()
-                    columns = [desc[0] for desc in cur.description]
-                    
-                    for row in rows:
-                        data = dict(zip(columns, row))
-                        Chapters.append(Chapter.from_Chapters_lowercase(data))
-                except Exception as e:
-                    logger.warning(f"Could not query Chapters table: {e}")
+                    if rows:
+                        return [factory(dict(row)) for row in rows]
+                except asyncpg.UndefinedTableError as e:
+                    logger.warning(f"Could not query {table} table: {e}")
         
-        return Chapters
+        return []
     
     async def get_user_Stories_async(self, user_id: uuid.UUID) -> List[Story]:
         """Get all Stories for a user asynchronously."""
         Stories = []
+        existing_ids = set()
         
+        await self._ensure_schema()
         async with self.get_async_connection() as conn:
-            # Get from Stories table
-            try:
-                rows = await conn.fetch(
-                    'SELECT * FROM "Stories" WHERE user_id = $1 ORDER BY created_at DESC',
-                    user_id
-                )
-                for row in rows:
-                    Stories.append(Story.from_Stories_table(dict(row)))
-            except Exception as e:
-                logger.warning(f"Could not query Stories table: {e}")
-            
-            # Get from Stories table (avoid duplicates)
-            try:
-                rows = await conn.fetch(
-                    'SELECT * FROM Stories WHERE user_id = $1 ORDER BY created_at DESC',
-                    user_id
-                )
-                existing_ids = {story.id for story in Stories}
-                for row in rows:
-                    story = Story.from_Stories_lowercase(dict(row))
-                    if story.id not in existing_ids:
-                        Stories.append(story)
-            except Exception as e:
-                logger.warning(f"Could not query Stories table: {e}")
+            # Earlier variants win when a story exists in more than one table
+            for table, factory in self._story_variants():
+                try:
+                    rows = await conn.fetch(
+                        f'SELECT * FROM {table} WHERE user_id = $1 ORDER BY created_at DESC',
+                        user_id
+                    )
+                    for row in rows:
+                        story = factory(dict(row))
+                        if story.id not in existing_ids:
+                            existing_ids.add(story.id)
+                            Stories.append(story)
+                except asyncpg.UndefinedTableError as e:
+                    logger.warning(f"Could not query {table} table: {e}")
         
         return Stories
 
@@ -0,0 +1,151 @@
+"""
+Content-addressed embedding vector cache.
+"""
+
+import asyncio
+import hashlib
+from array import array
+from typing import Any, Dict, List
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from config import settings
+from llm_cache import SQLiteKVStore
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _pack(vector: List[float]) -> bytes:
+    """Store vectors as float32, a quarter of their JSON size."""
+    return array("f", vector).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends unseen texts to the model.
+
+    Document vectors are cached by a SHA-256 of the model namespace and
+    the exact chunk text, so re-embedding a story costs API calls only
+    for chunks whose text changed. Query embeddings pass straight
+    through; they are rarely repeated verbatim.
+    """
+
+    def __init__(self, underlying: Embeddings, store: SQLiteKVStore, namespace: str):
+        self._underlying = underlying
+        self._store = store
+        self._namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self._namespace}\x00{text}".encode()).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, reusing cached vectors for known texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One vector per text, in order
+        """
+        keys = [self._key(text) for text in texts]
+        try:
+            cached = self._store.mget(list(dict.fromkeys(keys)))
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            cached = {}
+
+        vectors: Dict[str, List[float]] = {key: _unpack(data) for key, data in cached.items()}
+        # Identical chunks within the batch are embedded once
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        self.hits += len(texts) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = self._underlying.embed_documents(list(missing.values()))
+            for key, vector in zip(missing, fresh):
+                vectors[key] = vector
+                try:
+                    self._store.set(key, _pack(vector))
+                except Exception as e:
+                    logger.warning(f"Embedding cache write failed: {e}")
+
+        logger.debug(f"Embedded {len(texts)} texts ({len(missing)} via API)")
+        return [vectors[key] for key in keys]
+
+    def lookup(self, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        Full-precision vectors already cached for some texts, without any API call.
+
+        Returns:
+            Dict of text -> vector for the texts that were found
+        """
+        keys = {self._key(text): text for text in texts}
+        try:
+            cached = self._store.mget(list(keys))
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            return {}
+        return {keys[key]: _unpack(data) for key, data in cached.items()}
+
+    def uncached(self, texts: List[str]) -> List[str]:
+        """Distinct texts that would have to be sent to the model."""
+        keys = {self._key(text): text for text in texts}
+        try:
+            cached = self._store.mget(list(keys))
+        except Exception:
+            cached = {}
+        return [text for key, text in keys.items() if key not in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query (not cached)."""
+        return self._underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents."""
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query."""
+        return await self._underlying.aembed_query(text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counts and store size."""
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self._namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "store": self._store.get_stats()
+        }
+
+
+# Shared vector store for every embedding model; keys are namespaced by model
+embedding_store = SQLiteKVStore(
+    settings.EMBEDDING_CACHE_PATH,
+    settings.EMBEDDING_CACHE_MAX_BYTES,
+    table="embedding_vectors"
+)
+
+
+def create_openai_embeddings() -> CachedEmbeddings:
+    """The configured OpenAI embedding model behind the shared vector cache."""
+    return CachedEmbeddings(
+        OpenAIEmbeddings(
+            openai_api_key=settings.OPENAI_API_KEY,
+            model=settings.EMBEDDING_MODEL
+        ),
+        embedding_store,
+        namespace=f"openai:{settings.EMBEDDING_MODEL}"
+    )
@@ -0,0 +1,365 @@
+"""
+Indexed, story-scoped SQL over stored embeddings.
+"""
+
+import json
+import re
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from models.story_models import EmbeddingChunk
+from .database_service import db_service
+from .vector_storage import half_expression
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Every query is scoped to one story in one collection, which is what
+# scripts/add_embedding_metadata_indexes.sql indexes
+_STORY_ROWS = """
+cmetadata->>'story_id' = $1
+AND collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = $2)
+"""
+
+# Readers only see the story's active generation. Stories embedded
+# before generations existed have no pointer row and no generation key,
+# and the NULL comparison matches exactly those rows.
+_STORY_SCOPE = f"""
+{_STORY_ROWS}
+AND cmetadata->>'generation' IS NOT DISTINCT FROM (
+    SELECT active_generation FROM story_embedding_generations
+    WHERE story_id = $1 AND collection_name = $2
+)
+"""
+
+_CREATE_GENERATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS story_embedding_generations (
+    story_id TEXT NOT NULL,
+    collection_name TEXT NOT NULL,
+    active_generation TEXT NOT NULL,
+    previous_generation TEXT,
+    activated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (story_id, collection_name)
+)
+"""
+
+_ACTIVE_GENERATION_SQL = """
+SELECT active_generation FROM story_embedding_generations
+WHERE story_id = $1 AND collection_name = $2
+"""
+
+_ACTIVATE_SQL = """
+INSERT INTO story_embedding_generations (story_id, collection_name, active_generation)
+VALUES ($1, $2, $3)
+ON CONFLICT (story_id, collection_name) DO UPDATE
+SET previous_generation = story_embedding_generations.active_generation,
+    active_generation = EXCLUDED.active_generation,
+    activated_at = now()
+RETURNING previous_generation
+"""
+
+_DELETE_GENERATION_SQL = f"""
+DELETE FROM langchain_pg_embedding
+WHERE {_STORY_ROWS}
+  AND cmetadata->>'generation' IS NOT DISTINCT FROM $3
+"""
+
+_EXISTS_SQL = f"SELECT EXISTS (SELECT 1 FROM langchain_pg_embedding WHERE {_STORY_SCOPE})"
+
+_COUNT_SQL = f"SELECT COUNT(*) FROM langchain_pg_embedding WHERE {_STORY_SCOPE}"
+
+# Chapter-summary rows are retrieval helpers, not story text
+_CONTENT_ONLY = "AND cmetadata->>'chunk_type' IS DISTINCT FROM 'chapter_summary'"
+
+_LIST_SQL = f"""
+SELECT id, document, cmetadata
+FROM langchain_pg_embedding
+WHERE {_STORY_SCOPE}
+{_CONTENT_ONLY}
+ORDER BY (cmetadata->>'chapter_number')::int NULLS LAST, (cmetadata->>'chunk_index')::int NULLS LAST
+"""
+
+_CHAPTER_VERSIONS_SQL = f"""
+SELECT cmetadata->>'chapter_id' AS chapter_id,
+       cmetadata->>'content_hash' AS content_hash
+FROM langchain_pg_embedding
+WHERE {_STORY_SCOPE}
+GROUP BY 1, 2
+"""
+
+_DELETE_STALE_SQL = f"""
+DELETE FROM langchain_pg_embedding
+WHERE {_STORY_SCOPE}
+  AND (COALESCE(cmetadata->>'chapter_id', '') || ':' || COALESCE(cmetadata->>'content_hash', ''))
+      <> ALL($3::text[])
+"""
+
+_VECTORS_SQL = f"""
+SELECT id, document, cmetadata, embedding::real[] AS embedding
+FROM langchain_pg_embedding
+WHERE {_STORY_SCOPE}
+"""
+
+
+# Coarse-to-fine, two-stage search. The $6 chapters whose summaries best
+# match the query are picked first, and only their chunks (plus those of
+# chapters with no summary to rank) are searched; $6 = 0 searches every
+# chunk. Candidates come from the half-precision expression (which a
+# --precision half ANN index serves at half the size) and are re-ranked
+# by the full-precision vectors of just those rows.
+_SEARCH_SQL = f"""
+WITH summaries AS (
+    SELECT cmetadata->>'chapter_id' AS chapter_id, embedding
+    FROM langchain_pg_embedding
+    WHERE {_STORY_SCOPE}
+      AND cmetadata->>'chunk_type' = 'chapter_summary'
+      AND cmetadata->>'chapter_id' IS NOT NULL
+),
+chosen_chapters AS (
+    SELECT chapter_id FROM summaries
+    ORDER BY embedding <=> ($3::text)::vector
+    LIMIT $6::int
+),
+candidates AS (
+    SELECT id, document, cmetadata, embedding
+    FROM langchain_pg_embedding
+    WHERE {_STORY_SCOPE}
+    {_CONTENT_ONLY}
+      AND ($6::int = 0
+           OR cmetadata->>'chapter_id' IN (SELECT chapter_id FROM chosen_chapters)
+           OR cmetadata->>'chapter_id' IS NULL
+           OR cmetadata->>'chapter_id' NOT IN (SELECT chapter_id FROM summaries))
+    ORDER BY {half_expression()} <=> ($3::text)::halfvec({settings.VECTOR_DIMENSIONS})
+    LIMIT $5
+)
+SELECT id, document, cmetadata, 1 - (embedding <=> ($3::text)::vector) AS score
+FROM candidates
+ORDER BY embedding <=> ($3::text)::vector
+LIMIT $4
+"""
+
+
+def _psycopg(sql: str, *args: Any) -> Tuple[str, Dict[str, Any]]:
+    """Rewrite asyncpg ``$n`` placeholders and arguments for psycopg."""
+    params = {f"p{position}": value for position, value in enumerate(args, start=1)}
+    return re.sub(r"\$(\d+)", r"%(p\1)s", sql), params
+
+
+def _vector_literal(vector: List[float]) -> str:
+    return "[" + ",".join(f"{value:.8g}" for value in vector) + "]"
+
+
+def _metadata(value: Any) -> Dict[str, Any]:
+    """cmetadata arrives as a dict or as JSON text depending on the driver's codecs."""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value or {}
+
+
+def _affected_rows(status: str) -> int:
+    """Parse the row count from an asyncpg command status like ``DELETE 12``."""
+    try:
+        return int(status.split()[-1])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+class EmbeddingIndex:
+    """
+    Answers per-story questions about stored embeddings with plain SQL.
+
+    Existence, counts and chunk listings read only ``cmetadata`` on the
+    async pool, so they cost an index lookup instead of an embedding API
+    call plus a vector scan, and counts are exact rather than capped by a
+    search's ``k``.
+    """
+
+    def __init__(self, collection_name: Optional[str] = None):
+        self.db = db_service
+        self.collection_name = collection_name or settings.VECTOR_COLLECTION_NAME
+        self._schema_ready = False
+
+    async def ensure_schema(self):
+        """Create the generation pointer table if it does not exist yet."""
+        if self._schema_ready:
+            return
+        async with self.db.get_async_connection() as conn:
+            await conn.execute(_CREATE_GENERATIONS_SQL)
+        self._schema_ready = True
+
+    @asynccontextmanager
+    async def _connection(self):
+        """Pooled connection, once the pointer table every query reads exists."""
+        await self.ensure_schema()
+        async with self.db.get_async_connection() as conn:
+            yield conn
+
+    async def exists(self, story_id: int) -> bool:
+        """Whether a story has at least one chunk."""
+        async with self._connection() as conn:
+            return bool(await conn.fetchval(_EXISTS_SQL, str(story_id), self.collection_name))
+
+    async def count(self, story_id: int) -> int:
+        """Number of chunks stored for a story."""
+        async with self._connection() as conn:
+            return int(await conn.fetchval(_COUNT_SQL, str(story_id), self.collection_name))
+
+    async def list_chunks(self, story_id: int) -> List[EmbeddingChunk]:
+        """
+        List a story's chunks in reading order.
+
+        Args:
+            story_id: Story ID to list chunks for
+
+        Returns:
+            List of EmbeddingChunk objects
+        """
+        async with self._connection() as conn:
+            rows = await conn.fetch(_LIST_SQL, str(story_id), self.collection_name)
+
+        chunks = []
+        for row in rows:
+            metadata = _metadata(row["cmetadata"])
+            chunks.append(EmbeddingChunk(
+                chunk_id=str(row["id"]),
+                story_id=int(metadata.get("story_id", story_id)),
+                chapter_id=int(metadata.get("chapter_id") or 0),
+                chapter_number=int(metadata.get("chapter_number") or 0),
+                content=row["document"] or "",
+                chunk_index=int(metadata.get("chunk_index") or 0),
+                metadata=metadata
+            ))
+        return chunks
+
+    async def chapter_versions(self, story_id: int) -> Dict[str, Set[Optional[str]]]:
+        """
+        Content hashes currently embedded for each chapter of a story.
+
+        Returns:
+            Dict of chapter ID -> set of content hashes (None for rows
+            written before hashes were recorded)
+        """
+        async with self._connection() as conn:
+            rows = await conn.fetch(_CHAPTER_VERSIONS_SQL, str(story_id), self.collection_name)
+
+        versions: Dict[str, Set[Optional[str]]] = {}
+        for row in rows:
+            versions.setdefault(row["chapter_id"], set()).add(row["content_hash"])
+        return versions
+
+    async def delete_stale(self, story_id: int, keep: List[str]) -> int:
+        """
+        Delete a story's chunks that are not part of a current chapter version.
+
+        Args:
+            story_id: Story ID to clean up
+            keep: ``"<chapter_id>:<content_hash>"`` versions to keep
+
+        Returns:
+            Number of chunks deleted
+        """
+        async with self._connection() as conn:
+            status = await conn.execute(_DELETE_STALE_SQL, str(story_id), self.collection_name, keep)
+        return _affected_rows(status)
+
+    async def active_generation(self, story_id: int) -> Optional[str]:
+        """The generation readers currently see (None for unversioned stories)."""
+        async with self._connection() as conn:
+            return await conn.fetchval(_ACTIVE_GENERATION_SQL, str(story_id), self.collection_name)
+
+    async def load_vectors(self, story_id: int) -> List[Tuple[str, str, Dict[str, Any], List[float]]]:
+        """
+        Read a story's active chunks with their vectors.
+
+        Returns:
+            List of (id, document, metadata, vector) rows
+        """
+        async with self._connection() as conn:
+            rows = await conn.fetch(_VECTORS_SQL, str(story_id), self.collection_name)
+        return [
+            (row["id"], row["document"] or "", _metadata(row["cmetadata"]), row["embedding"])
+            for row in rows
+        ]
+
+    def load_vectors_sync(self, story_id: int) -> List[Tuple[str, str, Dict[str, Any], List[float]]]:
+        """Blocking variant of load_vectors for synchronous callers."""
+        with self.db.get_sync_connection() as conn:
+            rows = conn.execute(*_psycopg(_VECTORS_SQL, str(story_id), self.collection_name)).fetchall()
+        return [(row[0], row[1] or "", _metadata(row[2]), row[3]) for row in rows]
+
+    async def search(
+        self, story_id: int, query_vector: List[float], k: int, candidates: int, top_chapters: int = 0
+    ) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """
+        Top-k chunks of a story by cosine similarity, searched in two stages.
+
+        Args:
+            story_id: Story ID to search
+            query_vector: Query embedding
+            k: Number of chunks to return
+            candidates: Half-precision candidates to re-rank (at least k)
+            top_chapters: Only search chunks of this many chapters, picked
+                by summary similarity (0 searches every chunk)
+
+        Returns:
+            List of (id, document, metadata, score), best first
+        """
+        async with self._connection() as conn:
+            rows = await conn.fetch(
+                _SEARCH_SQL, str(story_id), self.collection_name,
+                _vector_literal(query_vector), k, max(candidates, k), max(top_chapters, 0)
+            )
+        return [(row["id"], row["document"] or "", _metadata(row["cmetadata"]), row["score"]) for row in rows]
+
+    def search_sync(
+        self, story_id: int, query_vector: List[float], k: int, candidates: int, top_chapters: int = 0
+    ) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """Blocking variant of search for synchronous callers."""
+        query = _psycopg(
+            _SEARCH_SQL, str(story_id), self.collection_name,
+            _vector_literal(query_vector), k, max(candidates, k), max(top_chapters, 0)
+        )
+        with self.db.get_sync_connection() as conn:
+            rows = conn.execute(*query).fetchall()
+        return [(row[0], row[1] or "", _metadata(row[2]), row[3]) for row in rows]
+
+    async def activate_generation(self, story_id: int, generation: str) -> Optional[str]:
+        """
+        Point readers at a fully written generation.
+
+        The flip is a single-row upsert, so readers see either the old
+        generation or the new one, never a mix.
+
+        Returns:
+            The generation that was active before (None if the story was
+            unversioned)
+        """
+        async with self._connection() as conn:
+            return await conn.fetchval(_ACTIVATE_SQL, str(story_id), self.collection_name, generation)
+
+    async def delete_generation(self, story_id: int, generation: Optional[str]) -> int:
+        """
+        Delete every chunk of one generation of a story.
+
+        Args:
+            story_id: Story ID
+            generation: Generation to delete (None for unversioned rows)
+
+        Returns:
+            Number of chunks deleted
+        """
+        async with self._connection() as conn:
+            status = await conn.execute(_DELETE_GENERATION_SQL, str(story_id), self.collection_name, generation)
+        return _affected_rows(status)
+
+
+def search_filter(story_id: Any, generation: Optional[str]) -> Dict[str, Any]:
+    """PGVector metadata filter matching a story's active generation."""
+    if generation is None:
+        return {"story_id": str(story_id), "chunk_type": "chapter_content", "generation": {"$exists": False}}
+    return {"story_id": str(story_id), "chunk_type": "chapter_content", "generation": generation}
+
+
+# Global embedding index instance
+embedding_index = EmbeddingIndex()
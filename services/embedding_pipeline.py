@@ -0,0 +1,341 @@
+"""
+Concurrent, rate-limited pipeline from chapter chunks to stored vectors.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Rough OpenAI tokenizer ratio for English prose
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    """Estimate the tokens an embedding request will be billed for."""
+    return sum(len(text) // CHARS_PER_TOKEN + 1 for text in texts)
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at ``per_minute`` tokens a minute.
+
+    A request larger than the capacity is let through once the bucket is
+    full, so oversized batches are slowed down rather than deadlocked.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self._rate = per_minute / 60.0
+        self._capacity = capacity or per_minute
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """
+        Wait until ``amount`` tokens are available and take them.
+
+        Returns:
+            Seconds spent waiting
+        """
+        amount = min(amount, self._capacity)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                delay = (amount - self._tokens) / self._rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= amount
+        return waited
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens: int) -> float:
+        """Reserve one request carrying ``tokens`` tokens; returns seconds waited."""
+        waited = await self._requests.acquire(1)
+        waited += await self._tokens.acquire(tokens)
+        return waited
+
+
+class EmbeddingBatcher:
+    """
+    Process-wide micro-batcher in front of an embeddings model.
+
+    Callers from any number of concurrent jobs submit texts and await
+    their vectors. Texts are collected for up to ``max_wait_ms`` (or until
+    a full batch is waiting), deduplicated and sent as one request, and
+    each caller's futures are resolved from the shared response. Requests
+    in flight are capped by ``max_concurrency`` and paced by the RPM/TPM
+    rate limiter; texts the embeddings wrapper can answer from its cache
+    do not count against the limits.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        rate_limiter: RateLimiter,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 10.0,
+        max_concurrency: int = 4
+    ):
+        self._embeddings = embeddings
+        self._limiter = rate_limiter
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._stats = {
+            "calls": 0,
+            "texts": 0,
+            "requests": 0,
+            "request_texts": 0,
+            "api_texts": 0,
+            "estimated_tokens": 0,
+            "rate_limit_wait_seconds": 0.0,
+            "failed_requests": 0
+        }
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts as part of the next shared batch.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One vector per text, in order
+        """
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future))
+            futures.append(future)
+        self._stats["calls"] += 1
+        self._stats["texts"] += len(texts)
+
+        # Full batches go out immediately; a partial one waits briefly for company
+        while len(self._pending) >= self.max_batch_size:
+            self._send(self._pending[:self.max_batch_size])
+            self._pending = self._pending[self.max_batch_size:]
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        """Send whatever is waiting once the collection window closes."""
+        self._timer = None
+        while self._pending:
+            self._send(self._pending[:self.max_batch_size])
+            self._pending = self._pending[self.max_batch_size:]
+
+    def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        task = asyncio.get_running_loop().create_task(self._request(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _request(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Embed one batch and route the vectors back to the waiting callers."""
+        # Callers that were cancelled no longer need their texts embedded
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            async with self._semaphore:
+                uncached = texts
+                if hasattr(self._embeddings, "uncached"):
+                    uncached = await asyncio.to_thread(self._embeddings.uncached, texts)
+                if uncached:
+                    tokens = estimate_tokens(uncached)
+                    self._stats["rate_limit_wait_seconds"] += await self._limiter.acquire(tokens)
+                    self._stats["estimated_tokens"] += tokens
+                    self._stats["api_texts"] += len(uncached)
+                vectors = await self._embeddings.aembed_documents(texts)
+        except Exception as e:
+            self._stats["failed_requests"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._stats["requests"] += 1
+        self._stats["request_texts"] += len(texts)
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics."""
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "rate_limit_wait_seconds": round(self._stats["rate_limit_wait_seconds"], 3),
+            "avg_request_texts": round(self._stats["request_texts"] / requests, 2) if requests else 0.0,
+            "pending": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+
+class EmbeddingPipeline:
+    """
+    Three-stage embedding pipeline.
+
+    A producer turns chapters into chunk batches as a stream, a bounded
+    pool of workers embeds batches concurrently, and a single writer
+    bulk-writes finished vectors. Queues between the stages are bounded,
+    so a long story never holds more than a few batches in memory.
+    Embedding goes through the shared EmbeddingBatcher, which fills
+    requests across every job running in the process and applies the
+    rate limits.
+    """
+
+    def __init__(
+        self,
+        batcher: EmbeddingBatcher,
+        writer: Any,
+        concurrency: int = 4,
+        batch_size: int = 64,
+        write_batch_size: int = 256
+    ):
+        self._batcher = batcher
+        self._writer = writer
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.write_batch_size = max(self.batch_size, write_batch_size)
+
+    async def run(self, source: Iterable[Tuple[List[str], List[Document]]]) -> Dict[str, Any]:
+        """
+        Embed and store every chunk produced by ``source``.
+
+        Args:
+            source: Iterable of (ids, documents), typically one item per
+                chapter, consumed lazily
+
+        Returns:
+            Dictionary of throughput statistics
+        """
+        stats = {
+            "chunks": 0,
+            "batches": 0,
+            "embed_seconds": 0.0,
+            "write_seconds": 0.0,
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size
+        }
+        started = time.perf_counter()
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def produce():
+            ids: List[str] = []
+            documents: List[Document] = []
+            for chapter_ids, chapter_documents in source:
+                ids.extend(chapter_ids)
+                documents.extend(chapter_documents)
+                while len(documents) >= self.batch_size:
+                    await embed_queue.put((ids[:self.batch_size], documents[:self.batch_size]))
+                    ids, documents = ids[self.batch_size:], documents[self.batch_size:]
+            if documents:
+                await embed_queue.put((ids, documents))
+            for _ in range(self.concurrency):
+                await embed_queue.put(None)
+
+        async def embed():
+            while True:
+                item = await embed_queue.get()
+                if item is None:
+                    return
+                ids, documents = item
+                texts = [document.page_content for document in documents]
+
+                embed_started = time.perf_counter()
+                vectors = await self._batcher.aembed_documents(texts)
+                stats["embed_seconds"] += time.perf_counter() - embed_started
+                stats["batches"] += 1
+                await write_queue.put((ids, documents, vectors))
+
+        async def write():
+            pending: List[Tuple[List[str], List[Document], List[List[float]]]] = []
+            pending_count = 0
+            finished = False
+            while not finished:
+                item = await write_queue.get()
+                if item is None:
+                    finished = True
+                else:
+                    pending.append(item)
+                    pending_count += len(item[0])
+                if pending and (finished or pending_count >= self.write_batch_size):
+                    await self._write(pending, stats)
+                    pending, pending_count = [], 0
+
+        async def embed_all():
+            try:
+                await asyncio.gather(*(embed() for _ in range(self.concurrency)))
+            finally:
+                await write_queue.put(None)
+
+        tasks = [asyncio.create_task(coro) for coro in (produce(), embed_all(), write())]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        elapsed = time.perf_counter() - started
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["chunks_per_second"] = round(stats["chunks"] / elapsed, 2) if elapsed else 0.0
+        for key in ("embed_seconds", "write_seconds"):
+            stats[key] = round(stats[key], 3)
+        return stats
+
+    async def _write(self, pending: List[Tuple[List[str], List[Document], List[List[float]]]], stats: Dict[str, Any]):
+        """Write a group of embedded batches in one call."""
+        ids: List[str] = []
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        vectors: List[List[float]] = []
+        for batch_ids, documents, batch_vectors in pending:
+            ids.extend(batch_ids)
+            texts.extend(document.page_content for document in documents)
+            metadatas.extend(document.metadata for document in documents)
+            vectors.extend(batch_vectors)
+
+        write_started = time.perf_counter()
+        await self._writer.aadd_embeddings(
+            texts=texts,
+            embeddings=vectors,
+            metadatas=metadatas,
+            ids=ids
+        )
+        stats["write_seconds"] += time.perf_counter() - write_started
+        stats["chunks"] += len(ids)
+        logger.debug(f"Wrote {len(ids)} embeddings")
@@ -3,22 +3,35 @@ Smart embedding service with async operations and intelligent caching.
 """
 
 import asyncio
-from typing import List, Optional, Dict, Any
+import hashlib
+import uuid
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import timedelta
 
 from langchain_postgres import PGVector
-from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
 from config import settings
-from models.story_models import StoryWithChapters, EmbeddingChunk
+from models.story_models import Story, Chapter, StoryWithChapters, EmbeddingChunk
 from .story_service import story_service
+from .embedding_index import embedding_index
 from .cache_service import cache_service
+from .cache_keys import make_tag
+from .embedding_cache import CachedEmbeddings, create_openai_embeddings
+from .embedding_pipeline import EmbeddingBatcher, EmbeddingPipeline, RateLimiter
+from .vector_writer import vector_writer
+from .vector_storage import pgvector_options
+from .story_vector_index import story_vector_index
 from logger_config import setup_logger
 
 logger = setup_logger(__name__)
 
+# Chunking parameters; part of each chapter's content hash so a change
+# in chunking re-embeds everything on the next incremental update
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+
 class EmbeddingService:
     """
     High-performance embedding service with smart caching and async operations.
@@ -27,11 +40,19 @@ class EmbeddingService:
     
     def __init__(self):
         self.story_service = story_service
+        self.index = embedding_index
+        self.writer = vector_writer
+        self.vector_index = story_vector_index
         self.cache = cache_service
         self._embeddings = None
         self._vectorstore = None
         self._text_splitter = None
         self._initialization_lock = asyncio.Lock()
+        # Shared by every story being embedded, so concurrent jobs fill
+        # the same requests and together stay under the API limits
+        self._batcher: Optional[EmbeddingBatcher] = None
+        self._gc_tasks: Set[asyncio.Task] = set()
+        self._pipeline_stats: Dict[str, Any] = {"runs": 0, "chunks": 0, "last_run": None}
     
     async def _ensure_initialized(self):
         """Ensure embeddings and vectorstore are initialized."""
@@ -46,29 +67,37 @@ class EmbeddingService:
             logger.info("Initializing embedding service...")
             
             # Initialize embeddings
-            self._embeddings = OpenAIEmbeddings(
-                openai_api_key=settings.OPENAI_API_KEY,
-                model="text-embedding-ada-002"
-            )
+            self._embeddings = self._create_embeddings()
             
             # Initialize vectorstore
             self._vectorstore = PGVector(
                 embeddings=self._embeddings,
                 connection=settings.get_postgres_connection_string(),
                 collection_name=settings.VECTOR_COLLECTION_NAME,
-                use_jsonb=True
+                use_jsonb=True,
+                **pgvector_options()
             )
             
             # Initialize text splitter
             self._text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=800,
-                chunk_overlap=200,
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
                 separators=["\n\n", "\n", ". ", " ", ""]
             )
             
             logger.info("Embedding service initialized successfully")
     
-    @cache_service.cached(ttl=timedelta(hours=24), key_prefix="embedding_exists")
+    @staticmethod
+    def _create_embeddings() -> CachedEmbeddings:
+        """Create the OpenAI embeddings client behind the content-hash vector cache."""
+        return create_openai_embeddings()
+    
+    @cache_service.cached(
+        ttl=timedelta(hours=24),
+        key_prefix="embedding_exists",
+        tags=("story:{story_id}", "embeddings:{story_id}"),
+        lease=True
+    )
     async def embeddings_exist(self, story_id: int) -> bool:
         """
         Check if embeddings exist for a story (cached).
@@ -78,23 +107,19 @@ class EmbeddingService:
             
         Returns:
             True if embeddings exist, False otherwise
+            
+        Raises:
+            Exception: Lookup errors propagate, so a failed check is never
+                cached as "no embeddings"
         """
-        await self._ensure_initialized()
-        
         try:
-            # Use a simple similarity search to check existence
-            results = self._vectorstore.similarity_search(
-                query="test",
-                k=1,
-                filter={"story_id": str(story_id)}
-            )
-            
-            exists = len(results) > 0
+            # Metadata-only lookup: no embedding call, no vector scan
+            exists = await self.index.exists(story_id)
             logger.debug(f"Embeddings exist for story {story_id}: {exists}")
             return exists
         except Exception as e:
             logger.error(f"Error checking embeddings for story {story_id}: {e}")
-            return False
+            raise
     
     async def get_embedding_count(self, story_id: int) -> int:
         """
@@ -106,27 +131,40 @@ class EmbeddingService:
         Returns:
             Number of embedding chunks
         """
-        await self._ensure_initialized()
-        
         try:
-            # Use similarity search with high k to count
-            results = self._vectorstore.similarity_search(
-                query="count",
-                k=1000,  # High limit to get all chunks
-                filter={"story_id": str(story_id)}
-            )
-            
-            count = len(results)
+            count = await self.index.count(story_id)
             logger.debug(f"Found {count} embeddings for story {story_id}")
             return count
         except Exception as e:
             logger.error(f"Error counting embeddings for story {story_id}: {e}")
             return 0
     
+    async def get_embedding_chunks(self, story_id: int) -> List[EmbeddingChunk]:
+        """
+        List the embedded chunks of a story in reading order.
+        
+        Args:
+            story_id: Story ID to list chunks for
+            
+        Returns:
+            List of EmbeddingChunk objects
+        """
+        try:
+            return await self.index.list_chunks(story_id)
+        except Exception as e:
+            logger.error(f"Error listing embeddings for story {story_id}: {e}")
+            return []
+    
     async def create_embeddings_async(self, story_id: int, force_recreate: bool = False) -> bool:
         """
         Create embeddings for a story asynchronously.
         
+        Chunks are written as a new generation alongside the current one
+        and the story's active pointer is flipped once they are all stored,
+        so the story stays searchable throughout and a failed run leaves the
+        old embeddings in place. The replaced generation is deleted in the
+        background.
+        
         Args:
             story_id: Story ID to create embeddings for
             force_recreate: Whether to recreate existing embeddings
@@ -154,46 +192,26 @@ class EmbeddingService:
                 logger.warning(f"No Chapters found for story {story_id}")
                 return False
             
-            # Delete existing embeddings if recreating
-            if force_recreate:
-                await self._delete_embeddings(story_id)
+            # Write a new generation next to the current one; readers keep
+            # seeing the old chunks until the pointer flips
+            generation = uuid.uuid4().hex[:12]
+            try:
+                stats = await self._embed_chapters(
+                    story_with_Chapters.story,
+                    [(chapter, None) for chapter in story_with_Chapters.Chapters],
+                    generation
+                )
+            except Exception:
+                self._schedule_gc(story_id, generation, delay=0)
+                raise
+            logger.info(f"Created {stats['chunks']} document chunks for story {story_id}")
             
-            # Process Chapters in batches for better performance
-            all_documents = []
-            
-            for chapter in story_with_Chapters.Chapters:
-                logger.debug(f"Processing chapter {chapter.chapter_number} for story {story_id}")
-                
-                # Split chapter content into chunks
-                chunks = self._text_splitter.split_text(chapter.content)
-                
-                for i, chunk in enumerate(chunks):
-                    doc = Document(
-                        page_content=chunk,
-                        metadata={
-                            "story_id": str(story_id),
-                            "chapter_id": str(chapter.id),
-                            "chapter_number": str(chapter.chapter_number),
-                            "chapter_title": chapter.title or f"Chapter {chapter.chapter_number}",
-                            "story_title": story_with_Chapters.story.title,
-                            "chunk_index": i,
-                            "chunk_type": "chapter_content",
-                            "source_table": chapter.source_table
-                        }
-                    )
-                    all_documents.append(doc)
-            
-            logger.info(f"Created {len(all_documents)} document chunks for story {story_id}")
-            
-            # Add documents to vectorstore in batches
-            batch_size = 50
-            for i in range(0, len(all_documents), batch_size):
-                batch = all_documents[i:i + batch_size]
-                await asyncio.to_thread(self._vectorstore.add_documents, batch)
-                logger.debug(f"Added batch {i//batch_size + 1}/{(len(all_documents) + batch_size - 1)//batch_size}")
+            previous = await self.index.activate_generation(story_id, generation)
+            self._schedule_gc(story_id, previous)
             
             # Invalidate existence cache
-            await self.cache.delete(f"embedding_exists:embeddings_exist:{story_id}")
+            await self.cache.invalidate_tags(make_tag("embeddings", story_id))
+            self.vector_index.invalidate(story_id)
             
             logger.info(f"Successfully created embeddings for story {story_id}")
             return True
@@ -202,33 +220,203 @@ class EmbeddingService:
             logger.error(f"Error creating embeddings for story {story_id}: {e}")
             return False
     
-    async def _delete_embeddings(self, story_id: int):
-        """Delete existing embeddings for a story."""
-        logger.info(f"Deleting existing embeddings for story {story_id}")
+    async def update_embeddings_async(self, story_id: int) -> Dict[str, Any]:
+        """
+        Incrementally bring a story's embeddings up to date.
+        
+        Only chapters whose content hash changed (or that were never
+        embedded) are split and embedded; chunks of edited or removed
+        Chapters are deleted afterwards, so readers never see a chapter
+        without chunks. The cost of a save is proportional to what changed,
+        not to the length of the story.
+        
+        Args:
+            story_id: Story ID to update embeddings for
+            
+        Returns:
+            Dictionary with what was embedded, kept and deleted
+        """
+        logger.info(f"Updating embeddings for story {story_id}")
         
         try:
-            # Use direct database deletion for better performance
-            import psycopg
-            connection_string = settings.get_postgres_connection_string()
-            if "postgresql+psycopg://" in connection_string:
-                connection_string = connection_string.replace("postgresql+psycopg://", "postgresql://")
-            
-            async def delete_from_db():
-                with psycopg.connect(connection_string) as conn:
-                    with conn.cursor() as cur:
-                        cur.execute(
-                            "DELETE FROM langchain_pg_embedding WHERE cmetadata->>'story_id' = %s",
-                            [str(story_id)]
-                        )
-                        deleted_count = cur.rowcount
-                        conn.commit()
-                        return deleted_count
-            
-            deleted_count = await asyncio.to_thread(delete_from_db)
-            logger.info(f"Deleted {deleted_count} existing embeddings for story {story_id}")
+            await self._ensure_initialized()
+            
+            story_with_Chapters = await self.story_service.get_story_with_Chapters(story_id)
+            if not story_with_Chapters:
+                logger.error(f"Story {story_id} not found")
+                return {"status": "error", "message": f"Story {story_id} not found"}
+            
+            if not story_with_Chapters.Chapters:
+                # Never treat a failed chapter read as "delete everything"
+                logger.warning(f"No Chapters found for story {story_id}")
+                return {"status": "error", "message": f"No Chapters found for story {story_id}"}
+            
+            generation = await self.index.active_generation(story_id)
+            embedded = await self.index.chapter_versions(story_id)
+            
+            current_versions = []
+            changed: List[Tuple[Chapter, str]] = []
+            for chapter in story_with_Chapters.Chapters:
+                content_hash = self._content_hash(chapter)
+                current_versions.append(f"{chapter.id}:{content_hash}")
+                if embedded.get(str(chapter.id)) != {content_hash}:
+                    changed.append((chapter, content_hash))
+            
+            added = 0
+            if changed:
+                stats = await self._embed_chapters(story_with_Chapters.story, changed, generation)
+                added = stats["chunks"]
+            
+            deleted = await self.index.delete_stale(story_id, current_versions)
+            
+            if added or deleted:
+                await self.cache.invalidate_tags(make_tag("embeddings", story_id))
+                self.vector_index.invalidate(story_id)
+            
+            summary = {
+                "status": "updated",
+                "chapters_embedded": len(changed),
+                "chapters_unchanged": len(story_with_Chapters.Chapters) - len(changed),
+                "chunks_added": added,
+                "chunks_deleted": deleted
+            }
+            logger.info(f"Embeddings updated for story {story_id}: {summary}")
+            return summary
             
         except Exception as e:
-            logger.error(f"Error deleting embeddings for story {story_id}: {e}")
+            logger.error(f"Error updating embeddings for story {story_id}: {e}")
+            return {"status": "error", "message": str(e)}
+    
+    @staticmethod
+    def _content_hash(chapter: Chapter) -> str:
+        """Hash chapter content and summary together with the chunking parameters."""
+        version = f"{CHUNK_SIZE}:{CHUNK_OVERLAP}:{chapter.content}"
+        if chapter.summary:
+            # Appended only when present, so unsummarised chapters keep their hashes
+            version += f"\x00summary:{chapter.summary}"
+        return hashlib.sha256(version.encode()).hexdigest()
+    
+    def _chapter_documents(
+        self,
+        story: Story,
+        chapter: Chapter,
+        content_hash: Optional[str] = None,
+        generation: Optional[str] = None
+    ) -> Tuple[List[str], List[Document]]:
+        """
+        Split a chapter into chunk documents with deterministic ids.
+        
+        Ids are derived from the generation, the chapter and its content
+        hash, so adding the same chapter version twice overwrites instead of
+        duplicating, while a new generation never touches the live rows.
+        A chapter with a summary also gets one "chapter_summary" document,
+        the coarse level of coarse-to-fine retrieval.
+        
+        Returns:
+            Tuple of (ids, documents)
+        """
+        content_hash = content_hash or self._content_hash(chapter)
+        chunks = self._text_splitter.split_text(chapter.content)
+        prefix = f"story-{story.id}-gen-{generation}" if generation else f"story-{story.id}"
+        
+        def metadata(chunk_index: int, chunk_type: str) -> Dict[str, Any]:
+            values = {
+                "story_id": str(story.id),
+                "chapter_id": str(chapter.id),
+                "chapter_number": str(chapter.chapter_number),
+                "chapter_title": chapter.title or f"Chapter {chapter.chapter_number}",
+                "story_title": story.title,
+                "chunk_index": chunk_index,
+                "chunk_type": chunk_type,
+                "content_hash": content_hash,
+                "source_table": chapter.source_table
+            }
+            if generation:
+                values["generation"] = generation
+            return values
+        
+        ids = []
+        documents = []
+        for i, chunk in enumerate(chunks):
+            ids.append(f"{prefix}-chapter-{chapter.id}-{content_hash[:16]}-{i}")
+            documents.append(Document(page_content=chunk, metadata=metadata(i, "chapter_content")))
+        
+        if chapter.summary:
+            ids.append(f"{prefix}-chapter-{chapter.id}-{content_hash[:16]}-summary")
+            documents.append(Document(page_content=chapter.summary, metadata=metadata(0, "chapter_summary")))
+        return ids, documents
+    
+    async def _embed_chapters(
+        self,
+        story: Story,
+        chapters: List[Tuple[Chapter, Optional[str]]],
+        generation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Chunk, embed and store Chapters through the embedding pipeline.
+        
+        Args:
+            story: Story the Chapters belong to
+            chapters: (chapter, content hash or None) pairs
+            generation: Embedding generation the chunks belong to
+            
+        Returns:
+            Pipeline throughput statistics
+        """
+        if self._batcher is None:
+            self._batcher = EmbeddingBatcher(
+                self._embeddings,
+                RateLimiter(settings.EMBEDDING_RPM, settings.EMBEDDING_TPM),
+                max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS,
+                max_concurrency=settings.EMBEDDING_CONCURRENCY
+            )
+        pipeline = EmbeddingPipeline(
+            self._batcher,
+            self.writer,
+            concurrency=settings.EMBEDDING_CONCURRENCY,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            write_batch_size=settings.EMBEDDING_WRITE_BATCH_SIZE
+        )
+        # Chapters are split lazily as the pipeline pulls them
+        stats = await pipeline.run(
+            self._chapter_documents(story, chapter, content_hash, generation)
+            for chapter, content_hash in chapters
+        )
+        
+        self._pipeline_stats["runs"] += 1
+        self._pipeline_stats["chunks"] += stats["chunks"]
+        self._pipeline_stats["last_run"] = stats
+        logger.info(
+            f"Embedded {stats['chunks']} chunks for story {story.id} in {stats['elapsed_seconds']}s "
+            f"({stats['chunks_per_second']} chunks/s)"
+        )
+        return stats
+    
+    def _schedule_gc(self, story_id: int, generation: Optional[str], delay: Optional[float] = None):
+        """
+        Delete a retired (or abandoned) generation in the background.
+        
+        By default the delete waits EMBEDDING_GC_DELAY_SECONDS so searches
+        that resolved the old pointer just before the flip can finish.
+        """
+        delay = settings.EMBEDDING_GC_DELAY_SECONDS if delay is None else delay
+        task = asyncio.create_task(self._collect_generation(story_id, generation, delay))
+        self._gc_tasks.add(task)
+        task.add_done_callback(self._gc_tasks.discard)
+    
+    async def _collect_generation(self, story_id: int, generation: Optional[str], delay: float):
+        """Delete one generation of a story's chunks."""
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            if generation is not None and generation == await self.index.active_generation(story_id):
+                return
+            deleted = await self.index.delete_generation(story_id, generation)
+            if deleted:
+                logger.info(f"Collected {deleted} chunks of generation {generation} for story {story_id}")
+        except Exception as e:
+            logger.error(f"Error collecting generation {generation} for story {story_id}: {e}")
     
     async def ensure_embeddings(self, story_id: int) -> Dict[str, Any]:
         """
@@ -285,16 +473,14 @@ class EmbeddingService:
         """Get the vectorstore for direct access (sync)."""
         if not self._vectorstore:
             # Initialize synchronously for compatibility
-            self._embeddings = OpenAIEmbeddings(
-                openai_api_key=settings.OPENAI_API_KEY,
-                model="text-embedding-ada-002"
-            )
+            self._embeddings = self._create_embeddings()
             
             self._vectorstore = PGVector(
                 embeddings=self._embeddings,
                 connection=settings.get_postgres_connection_string(),
                 collection_name=settings.VECTOR_COLLECTION_NAME,
-                use_jsonb=True
+                use_jsonb=True,
+                **pgvector_options()
             )
         
         return self._vectorstore
@@ -308,7 +494,12 @@ class EmbeddingService:
         return {
             "initialized": self._embeddings is not None and self._vectorstore is not None,
             "cache": cache_stats,
-            "text_splitter_chunk_size": getattr(self._text_splitter, 'chunk_size', 800) if self._text_splitter else None,
+            "embedding_cache": self._embeddings.get_stats() if self._embeddings else None,
+            "embedding_pipeline": self._pipeline_stats,
+            "embedding_batcher": self._batcher.get_stats() if self._batcher else None,
+            "vector_writer": self.writer.get_stats(),
+            "story_vector_index": self.vector_index.get_stats(),
+            "text_splitter_chunk_size": getattr(self._text_splitter, 'chunk_size', CHUNK_SIZE) if self._text_splitter else None,
             "vectorstore_collection": settings.VECTOR_COLLECTION_NAME
         }
 
@@ -0,0 +1,79 @@
+"""
+Guards against blocking work on the asyncio event loop.
+"""
+
+import asyncio
+from typing import Optional
+
+from config import settings
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class BlockingCallError(RuntimeError):
+    """A blocking call was made on a thread that is running an event loop."""
+
+
+def on_event_loop() -> bool:
+    """True when the current thread is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def assert_not_on_event_loop(operation: str) -> None:
+    """
+    Refuse a blocking operation on the event loop thread.
+
+    A blocking database call on the loop stalls every concurrent request
+    in the worker. ``BLOCKING_CALL_GUARD`` picks what happens: "error"
+    raises, "warn" logs and carries on, "off" skips the check.
+
+    Args:
+        operation: Name of the blocking call, for the message
+
+    Raises:
+        BlockingCallError: In "error" mode, when called on the loop
+    """
+    mode = settings.BLOCKING_CALL_GUARD
+    if mode == "off" or not on_event_loop():
+        return
+    message = (
+        f"Blocking call {operation} made on the event loop; "
+        "await the async variant or run it in a worker thread"
+    )
+    if mode == "warn":
+        logger.warning(message)
+        return
+    raise BlockingCallError(message)
+
+
+def enable_slow_callback_monitoring(
+    loop: Optional[asyncio.AbstractEventLoop] = None,
+    threshold_ms: Optional[float] = None
+) -> bool:
+    """
+    Log any loop callback that runs longer than the threshold.
+
+    Turns on asyncio debug mode, which reports slow callbacks through the
+    ``asyncio`` logger. Debug mode has overhead, so this is meant for
+    staging and load tests.
+
+    Args:
+        loop: Loop to monitor (the running loop if omitted)
+        threshold_ms: Slow-callback threshold (EVENT_LOOP_SLOW_CALLBACK_MS if omitted)
+
+    Returns:
+        True if monitoring was enabled
+    """
+    threshold_ms = settings.EVENT_LOOP_SLOW_CALLBACK_MS if threshold_ms is None else threshold_ms
+    if threshold_ms <= 0:
+        return False
+    loop = loop or asyncio.get_running_loop()
+    loop.set_debug(True)
+    loop.slow_callback_duration = threshold_ms / 1000
+    logger.info(f"Event loop slow-callback monitoring enabled ({threshold_ms}ms)")
+    return True
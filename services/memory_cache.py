@@ -0,0 +1,272 @@
+"""
+In-process memory tier for the caching service.
+"""
+
+import heapq
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+# Sentinel for lookups that found nothing (None is a cacheable value)
+MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate the memory footprint of a cached value in bytes.
+
+    Walks containers and pydantic models so that a list of full chapter
+    bodies weighs what it really costs, not what a single reference costs.
+
+    Args:
+        value: Value to measure
+
+    Returns:
+        Approximate size in bytes
+    """
+    seen = set()
+    stack = [value]
+    total = 0
+
+    while stack:
+        obj = stack.pop()
+        obj_id = id(obj)
+        if obj_id in seen:
+            continue
+        seen.add(obj_id)
+
+        total += sys.getsizeof(obj, 64)
+
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, BaseModel):
+            stack.append(obj.__dict__)
+
+    return total
+
+
+class _Entry:
+    """A single memory-tier entry."""
+
+    __slots__ = ("value", "size", "fresh_until", "expires_at", "tags")
+
+    def __init__(
+        self,
+        value: Any,
+        size: int,
+        fresh_until: float,
+        expires_at: float,
+        tags: Tuple[str, ...]
+    ):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class MemoryCache:
+    """
+    LRU memory tier bounded by approximate byte size.
+
+    Get, set and eviction are O(1): recency is tracked by an ordered dict.
+    Expiry is driven by a min-heap of deadlines that is drained on every
+    operation (and by ``expire``), so expired entries are released as soon
+    as their deadline passes instead of waiting to be read again.
+
+    Entries may carry tags; a tag index maps each tag to its keys so a
+    whole group can be invalidated in O(entries tagged). An entry may also
+    outlive its freshness by a stale window, during which lookups report
+    it as stale so callers can serve it while revalidating.
+
+    An optional observer is told about every entry stored (``stored(key,
+    size)``) and released (``released(key, size, reason)``, reason being
+    "deletes", "overwrites", "evictions" or "expirations").
+    """
+
+    def __init__(self, max_bytes: int, max_items: Optional[int] = None, observer: Any = None):
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._max_bytes = max_bytes
+        self._max_items = max_items
+        self._current_bytes = 0
+        self._observer = observer
+
+    @property
+    def max_bytes(self) -> int:
+        """Configured byte budget."""
+        return self._max_bytes
+
+    @property
+    def current_bytes(self) -> int:
+        """Approximate bytes currently held."""
+        return self._current_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over a snapshot of the live keys."""
+        self.expire()
+        return iter(list(self._entries.keys()))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a fresh value and mark it as most recently used."""
+        value, stale = self.lookup(key)
+        if value is MISSING or stale:
+            return default
+        return value
+
+    def lookup(self, key: str) -> Tuple[Any, bool]:
+        """
+        Get a live value, including one inside its stale window.
+
+        Returns:
+            Tuple of (value or MISSING, whether the value is stale)
+        """
+        self.expire()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING, False
+
+        self._entries.move_to_end(key)
+        return entry.value, entry.fresh_until <= time.monotonic()
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: float,
+        tags: Iterable[str] = (),
+        stale_seconds: float = 0.0
+    ) -> bool:
+        """
+        Store a value, evicting least recently used entries to stay in budget.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Time the value stays fresh, in seconds
+            tags: Invalidation tags for the entry
+            stale_seconds: Extra time the value may be served as stale
+
+        Returns:
+            True if the value was stored, False if it is larger than the budget
+        """
+        self.expire()
+
+        size = estimate_size(value) + sys.getsizeof(key)
+        if size > self._max_bytes or ttl_seconds + stale_seconds <= 0:
+            self.delete(key, "overwrites")
+            return False
+
+        self.delete(key, "overwrites")
+
+        now = time.monotonic()
+        fresh_until = now + ttl_seconds
+        expires_at = fresh_until + stale_seconds
+        tags = tuple(tags)
+        self._entries[key] = _Entry(value, size, fresh_until, expires_at, tags)
+        self._current_bytes += size
+        if self._observer is not None:
+            self._observer.stored(key, size)
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        heapq.heappush(self._expiry_heap, (expires_at, key))
+
+        self._evict()
+        self._compact_heap()
+        return True
+
+    def delete(self, key: str, reason: str = "deletes") -> bool:
+        """Remove a key; its heap slot is discarded lazily."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._release(key, entry, reason)
+        return True
+
+    def invalidate_tag(self, tag: str) -> List[str]:
+        """
+        Remove every entry carrying a tag.
+
+        Returns:
+            Keys that were removed
+        """
+        keys = list(self._tag_index.pop(tag, ()))
+        for key in keys:
+            self.delete(key)
+        return keys
+
+    def clear(self):
+        """Remove every entry."""
+        if self._observer is not None:
+            for key, entry in self._entries.items():
+                self._observer.released(key, entry.size, "deletes")
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._tag_index.clear()
+        self._current_bytes = 0
+
+    def expire(self) -> int:
+        """
+        Release every entry whose deadline has passed.
+
+        Returns:
+            Number of entries expired
+        """
+        now = time.monotonic()
+        expired = 0
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            # Skip heap slots left behind by overwrites and deletes
+            if entry is not None and entry.expires_at == expires_at:
+                self.delete(key, "expirations")
+                expired += 1
+
+        return expired
+
+    def _evict(self):
+        """Evict least recently used entries until within budget."""
+        while self._entries and (
+            self._current_bytes > self._max_bytes
+            or (self._max_items is not None and len(self._entries) > self._max_items)
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self._release(key, entry, "evictions")
+
+    def _release(self, key: str, entry: _Entry, reason: str):
+        """Account for an entry that has left the cache."""
+        self._current_bytes -= entry.size
+        if self._observer is not None:
+            self._observer.released(key, entry.size, reason)
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def _compact_heap(self):
+        """Rebuild the heap once stale slots outnumber live entries."""
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [
+                (entry.expires_at, key) for key, entry in self._entries.items()
+            ]
+            heapq.heapify(self._expiry_heap)
@@ -0,0 +1,55 @@
+"""
+asyncpg binary codec for the pgvector ``vector`` type.
+"""
+
+import struct
+from typing import List, Sequence
+
+import asyncpg
+
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_VECTOR_SCHEMA_SQL = """
+SELECT n.nspname
+FROM pg_type t
+JOIN pg_namespace n ON n.oid = t.typnamespace
+WHERE t.typname = 'vector'
+LIMIT 1
+"""
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """Encode pgvector's binary format: dimension, unused, then float4s, big-endian."""
+    dim = len(vector)
+    return struct.pack(f">HH{dim}f", dim, 0, *vector)
+
+
+def decode_vector(data: bytes) -> List[float]:
+    """Decode pgvector's binary format."""
+    dim, _ = struct.unpack_from(">HH", data)
+    return list(struct.unpack_from(f">{dim}f", data, 4))
+
+
+async def register_vector_codec(conn: asyncpg.Connection) -> bool:
+    """
+    Register the ``vector`` codec on a connection.
+
+    Used as the pool's ``init`` hook, so every pooled connection can COPY
+    and read embeddings as Python float lists.
+
+    Returns:
+        False if the pgvector extension is not installed
+    """
+    schema = await conn.fetchval(_VECTOR_SCHEMA_SQL)
+    if schema is None:
+        return False
+    await conn.set_type_codec(
+        "vector",
+        schema=schema,
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary"
+    )
+    return True
@@ -0,0 +1,342 @@
+"""
+Async repository for the Stories, Chapters and story_choices tables.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .database_service import db_service
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+STORIES_TABLE = '"Stories"'
+CHAPTERS_TABLE = '"Chapters"'
+CHOICES_TABLE = "story_choices"
+
+Row = Dict[str, Any]
+
+
+def _ident(name: str) -> str:
+    """Quote a column name."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _payload(value: Any) -> str:
+    """Serialize rows for jsonb_populate_record(set); UUIDs and dates become strings."""
+    return json.dumps(value, default=str)
+
+
+def _projection(columns: Optional[Iterable[str]], alias: str) -> str:
+    """JSON object expression for a row, optionally restricted to some columns."""
+    if not columns:
+        return f"to_jsonb({alias})"
+    pairs = ", ".join(f"'{column}', {alias}.{_ident(column)}" for column in columns)
+    return f"jsonb_build_object({pairs})"
+
+
+def _insert_sql(table: str, rows: Sequence[Row], param: str) -> str:
+    """
+    INSERT of the JSON array in ``param``, in array order, returning each
+    row's id and JSON form as ``saved``. Columns are the union of the
+    rows' keys.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    column_list = ", ".join(_ident(column) for column in columns)
+    return (
+        f"INSERT INTO {table} AS t ({column_list}) "
+        f"SELECT {column_list} FROM jsonb_populate_recordset(NULL::{table}, {param}::jsonb) "
+        f"WITH ORDINALITY AS r ORDER BY r.ordinality "
+        f"RETURNING t.id, to_jsonb(t) AS saved"
+    )
+
+
+def chapter_choice_records(
+    story_id: Optional[int],
+    chapter_number: int,
+    user_id: Optional[str],
+    choices: Sequence[Row]
+) -> List[Row]:
+    """
+    Map generated choices onto story_choices rows.
+
+    Generator output uses ``impact``/``type`` or ``story_impact``/
+    ``choice_type``; rows are numbered ``choice_1``, ``choice_2``, ... in
+    the order given. Missing values are left out so columns keep their
+    defaults.
+    """
+    records = []
+    for position, choice in enumerate(choices, 1):
+        record = {
+            "story_id": story_id,
+            "chapter_number": chapter_number,
+            "choice_id": f"choice_{position}",
+            "title": choice.get("title"),
+            "description": choice.get("description"),
+            "story_impact": choice.get("impact") or choice.get("story_impact") or "medium",
+            "choice_type": choice.get("type") or choice.get("choice_type") or "action",
+            "user_id": user_id,
+            "is_selected": False,
+        }
+        records.append({key: value for key, value in record.items() if value is not None})
+    return records
+
+
+def _decode(value: Optional[str]) -> Optional[Row]:
+    return json.loads(value) if value is not None else None
+
+
+class StoryRepository:
+    """
+    Reads and writes story data on the shared asyncpg pool.
+
+    Rows are returned as plain dicts built with ``to_jsonb``, so they have
+    the same shape the handlers used to get from the Supabase client
+    (timestamps and UUIDs as strings) and can be returned as JSON as-is.
+    Writes go through ``jsonb_populate_record(set)``, which lets Postgres
+    cast each value to its column type and only touches the columns that
+    were passed, leaving the rest to their defaults.
+    """
+
+    def __init__(self):
+        self.db = db_service
+
+    async def _fetch_rows(self, query: str, *args) -> List[Row]:
+        async with self.db.get_async_connection() as conn:
+            rows = await conn.fetch(query, *args)
+        return [json.loads(row[0]) for row in rows]
+
+    async def _fetch_row(self, query: str, *args) -> Optional[Row]:
+        async with self.db.get_async_connection() as conn:
+            return _decode(await conn.fetchval(query, *args))
+
+    async def _insert(self, table: str, rows: Sequence[Row]) -> List[Row]:
+        """
+        Insert rows in one statement and return them in input order.
+
+        Rows are inserted in input order, so their sequence-generated ids
+        ascend in that order too; sorting the RETURNING rows by id restores
+        it, as RETURNING itself has no guaranteed order.
+        """
+        if not rows:
+            return []
+        return await self._fetch_rows(
+            f"WITH inserted AS ({_insert_sql(table, rows, '$1')}) "
+            "SELECT saved FROM inserted ORDER BY id",
+            _payload(list(rows))
+        )
+
+    async def _update(self, table: str, row_id: Any, values: Row) -> Optional[Row]:
+        """Update columns of one row by id and return the updated row."""
+        assignments = ", ".join(f"{_ident(column)} = r.{_ident(column)}" for column in values)
+        return await self._fetch_row(
+            f"UPDATE {table} AS t SET {assignments} "
+            f"FROM jsonb_populate_record(NULL::{table}, $1::jsonb) AS r "
+            f"WHERE t.id = $2 RETURNING to_jsonb(t)",
+            _payload(values), row_id
+        )
+
+    # Stories
+
+    async def get_story(self, story_id: int, user_id: Optional[str] = None) -> Optional[Row]:
+        """
+        Get a story row, optionally only if it belongs to the user.
+
+        Args:
+            story_id: Story ID to fetch
+            user_id: Owner to check against
+
+        Returns:
+            Story row or None if not found (or not owned by the user)
+        """
+        if user_id is None:
+            return await self._fetch_row(
+                f"SELECT to_jsonb(s) FROM {STORIES_TABLE} s WHERE s.id = $1", story_id
+            )
+        return await self._fetch_row(
+            f"SELECT to_jsonb(s) FROM {STORIES_TABLE} s WHERE s.id = $1 AND s.user_id = $2",
+            story_id, str(user_id)
+        )
+
+    async def insert_story(self, story: Row) -> Row:
+        """Insert a story and return the saved row."""
+        return (await self._insert(STORIES_TABLE, [story]))[0]
+
+    async def update_story(self, story_id: int, values: Row) -> Optional[Row]:
+        """Update columns of a story and return the saved row."""
+        return await self._update(STORIES_TABLE, story_id, values)
+
+    # Chapters
+
+    async def list_chapters(
+        self,
+        story_id: int,
+        before_chapter: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[Row]:
+        """
+        Get a story's chapters in chapter order.
+
+        Args:
+            story_id: Story ID to fetch chapters for
+            before_chapter: Only chapters numbered below this
+            columns: Only these columns (all columns if omitted)
+
+        Returns:
+            List of chapter rows
+        """
+        query = f"SELECT {_projection(columns, 'c')} FROM {CHAPTERS_TABLE} c WHERE c.story_id = $1"
+        args: List[Any] = [story_id]
+        if before_chapter is not None:
+            query += " AND c.chapter_number < $2"
+            args.append(before_chapter)
+        return await self._fetch_rows(query + " ORDER BY c.chapter_number", *args)
+
+    async def get_chapter(self, chapter_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Row]:
+        """Get one chapter row by ID."""
+        return await self._fetch_row(
+            f"SELECT {_projection(columns, 'c')} FROM {CHAPTERS_TABLE} c WHERE c.id = $1", chapter_id
+        )
+
+    async def insert_chapter(self, chapter: Row) -> Row:
+        """Insert a chapter and return the saved row."""
+        return (await self._insert(CHAPTERS_TABLE, [chapter]))[0]
+
+    async def insert_chapters(self, chapters: Sequence[Row]) -> List[Row]:
+        """
+        Insert several chapters (e.g. an imported story) in one statement.
+
+        Returns:
+            Saved chapter rows, in the order given
+        """
+        return await self._insert(CHAPTERS_TABLE, chapters)
+
+    async def update_chapter(self, chapter_id: int, values: Row) -> Optional[Row]:
+        """Update columns of a chapter and return the saved row."""
+        return await self._update(CHAPTERS_TABLE, chapter_id, values)
+
+    # Choices
+
+    async def list_choices(
+        self,
+        story_id: int,
+        user_id: str,
+        chapter_number: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Get a user's choices for a story, ordered by chapter and choice.
+
+        Args:
+            story_id: Story ID to fetch choices for
+            user_id: Owner of the choices
+            chapter_number: Only choices offered after this chapter
+
+        Returns:
+            List of choice rows
+        """
+        query = (
+            f"SELECT to_jsonb(c) FROM {CHOICES_TABLE} c "
+            "WHERE c.story_id = $1 AND c.user_id = $2"
+        )
+        args: List[Any] = [story_id, str(user_id)]
+        if chapter_number is not None:
+            query += " AND c.chapter_number = $3"
+            args.append(chapter_number)
+        return await self._fetch_rows(query + " ORDER BY c.chapter_number, c.choice_id", *args)
+
+    async def insert_choices(self, choices: Sequence[Row]) -> List[Row]:
+        """
+        Insert choice rows in one statement.
+
+        Returns:
+            Saved choice rows, in the order given
+        """
+        return await self._insert(CHOICES_TABLE, choices)
+
+    async def insert_chapter_choices(
+        self,
+        story_id: Optional[int],
+        chapter_number: int,
+        user_id: Optional[str],
+        choices: Sequence[Row]
+    ) -> List[Row]:
+        """
+        Save the choices generated for a chapter in one statement.
+
+        See chapter_choice_records() for how choices map onto rows.
+
+        Args:
+            story_id: Story the chapter belongs to
+            chapter_number: Chapter the choices follow
+            user_id: Owner of the story
+            choices: Generated choice dicts
+
+        Returns:
+            Saved choice rows, in the order given
+        """
+        return await self.insert_choices(chapter_choice_records(story_id, chapter_number, user_id, choices))
+
+    async def update_choice(self, choice_id: int, values: Row) -> Optional[Row]:
+        """Update columns of a choice and return the saved row."""
+        return await self._update(CHOICES_TABLE, choice_id, values)
+
+    # Chapter commit
+
+    async def commit_chapter(
+        self,
+        chapter: Row,
+        choices: Sequence[Row] = (),
+        selected_choice_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Save a new chapter and everything that goes with it atomically.
+
+        One statement, built from data-modifying CTEs, inserts the chapter
+        (with its summary), inserts the choices offered after it, moves the
+        story's ``current_chapter`` to it and marks the choice that led to
+        it as selected. Either all of it is written or none of it is, in a
+        single round-trip.
+
+        Args:
+            chapter: Chapter row; must include story_id and chapter_number
+            choices: Choice rows to offer after the chapter
+            selected_choice_id: Database ID of the choice that led here
+
+        Returns:
+            Dict with the saved ``chapter``, ``choices`` (in input order),
+            updated ``story`` and ``selected_choice`` rows
+        """
+        story_id = chapter["story_id"]
+        parts = [
+            f"new_chapter AS ({_insert_sql(CHAPTERS_TABLE, [chapter], '$1')})",
+            f"story AS (UPDATE {STORIES_TABLE} AS t SET current_chapter = $3 "
+            "WHERE t.id = $2 RETURNING to_jsonb(t) AS saved)",
+            f"selected AS (UPDATE {CHOICES_TABLE} AS t SET is_selected = true, selected_at = now() "
+            "WHERE t.id = $4 AND t.story_id = $2 RETURNING to_jsonb(t) AS saved)"
+        ]
+        args: List[Any] = [_payload([chapter]), story_id, chapter["chapter_number"], selected_choice_id]
+        choices_column = "'[]'::jsonb"
+        if choices:
+            parts.append(f"new_choices AS ({_insert_sql(CHOICES_TABLE, choices, '$5')})")
+            args.append(_payload(list(choices)))
+            choices_column = "(SELECT coalesce(jsonb_agg(saved ORDER BY id), '[]') FROM new_choices)"
+
+        query = (
+            "WITH " + ", ".join(parts) + " SELECT "
+            "(SELECT saved FROM new_chapter) AS chapter, "
+            f"{choices_column} AS choices, "
+            "(SELECT saved FROM story) AS story, "
+            "(SELECT saved FROM selected) AS selected_choice"
+        )
+        async with self.db.get_async_connection() as conn:
+            row = await conn.fetchrow(query, *args)
+        return {
+            "chapter": _decode(row["chapter"]),
+            "choices": _decode(row["choices"]),
+            "story": _decode(row["story"]),
+            "selected_choice": _decode(row["selected_choice"])
+        }
+
+
+# Global story repository instance
+story_repository = StoryRepository()
@@ -3,12 +3,14 @@ Unified story service with async operations and smart caching.
 """
 
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import timedelta
 
 from models.story_models import Story, Chapter, StoryWithChapters
 from .database_service import db_service
+from .story_repository import story_repository
 from .cache_service import cache_service
+from .cache_keys import make_tag
 from logger_config import setup_logger
 
 logger = setup_logger(__name__)
@@ -17,13 +19,24 @@ class StoryService:
     """
     High-level story operations with caching and performance optimization.
     Provides a unified interface for all story-related operations.
+    
+    Read errors are logged and re-raised rather than turned into None or
+    an empty list, so the cache only ever stores real results: a failed
+    lookup must not be negative-cached as "not found" for every worker.
     """
     
     def __init__(self):
         self.db = db_service
         self.cache = cache_service
+        self.repository = story_repository
     
-    @cache_service.cached(ttl=timedelta(minutes=30), key_prefix="story")
+    @cache_service.cached(
+        ttl=timedelta(minutes=30),
+        key_prefix="story",
+        tags=("story:{story_id}", "user:{user_id}"),
+        negative_ttl=timedelta(seconds=30),
+        stale_ttl=timedelta(minutes=5)
+    )
     async def get_story(self, story_id: int, user_id: Optional[uuid.UUID] = None) -> Optional[Story]:
         """
         Get story by ID with caching.
@@ -38,10 +51,7 @@ class StoryService:
         logger.info(f"Fetching story {story_id} for user {user_id}")
         
         try:
-            # Try async first, fallback to sync
             story = await self.db.get_story_async(story_id, user_id)
-            if not story:
-                story = self.db.get_story_sync(story_id, user_id)
             
             if story:
                 logger.info(f"Found story {story_id}: {story.title}")
@@ -51,9 +61,44 @@ class StoryService:
             return story
         except Exception as e:
             logger.error(f"Error fetching story {story_id}: {e}")
-            return None
+            raise
     
-    @cache_service.cached(ttl=timedelta(minutes=15), key_prefix="Chapters")
+    @cache_service.cached_batch(
+        batch_arg="story_ids",
+        ttl=timedelta(minutes=30),
+        key_prefix="story",
+        tags=("story:{story_ids}", "user:{user_id}"),
+        negative_ttl=timedelta(seconds=30)
+    )
+    async def get_stories(
+        self,
+        story_ids: List[int],
+        user_id: Optional[uuid.UUID] = None
+    ) -> Dict[int, Story]:
+        """
+        Get several Stories by ID with per-story caching.
+        
+        Args:
+            story_ids: Story IDs to fetch
+            user_id: Optional user ID for access control
+            
+        Returns:
+            Dict of story ID -> Story for the Stories that were found
+        """
+        logger.info(f"Fetching {len(story_ids)} Stories for user {user_id}")
+        
+        try:
+            return await self.db.get_stories_async([int(story_id) for story_id in story_ids], user_id)
+        except Exception as e:
+            logger.error(f"Error fetching Stories {story_ids}: {e}")
+            raise
+    
+    @cache_service.cached(
+        ttl=timedelta(minutes=15),
+        key_prefix="Chapters",
+        tags=("story:{story_id}",),
+        stale_ttl=timedelta(minutes=5)
+    )
     async def get_Chapters(self, story_id: int) -> List[Chapter]:
         """
         Get all Chapters for a story with caching.
@@ -67,24 +112,28 @@ class StoryService:
         logger.info(f"Fetching Chapters for story {story_id}")
         
         try:
-            # Try async first, fallback to sync
             Chapters = await self.db.get_Chapters_async(story_id)
-            if not Chapters:
-                Chapters = self.db.get_Chapters_sync(story_id)
             
             logger.info(f"Found {len(Chapters)} Chapters for story {story_id}")
             return Chapters
         except Exception as e:
             logger.error(f"Error fetching Chapters for story {story_id}: {e}")
-            return []
+            raise
     
+    @cache_service.cached(
+        ttl=timedelta(minutes=15),
+        key_prefix="story_with_Chapters",
+        tags=("story:{story_id}", "user:{user_id}"),
+        negative_ttl=timedelta(seconds=30),
+        stale_ttl=timedelta(minutes=5)
+    )
     async def get_story_with_Chapters(
         self, 
         story_id: int, 
         user_id: Optional[uuid.UUID] = None
     ) -> Optional[StoryWithChapters]:
         """
-        Get story with all its Chapters in one optimized call.
+        Get story with all its Chapters in one database round-trip.
         
         Args:
             story_id: Story ID to fetch
@@ -95,16 +144,26 @@ class StoryService:
         """
         logger.info(f"Fetching complete story {story_id} with Chapters")
         
-        # Use caching for both story and Chapters
-        story = await self.get_story(story_id, user_id)
-        if not story:
-            return None
+        try:
+            result = await self.db.get_story_with_Chapters_async(story_id, user_id)
+        except Exception as e:
+            logger.error(f"Error fetching story {story_id} with Chapters: {e}")
+            raise
         
-        Chapters = await self.get_Chapters(story_id)
+        if result is None:
+            logger.warning(f"Story {story_id} not found")
+            return None
         
+        story, Chapters = result
+        logger.info(f"Found story {story_id} with {len(Chapters)} Chapters")
         return StoryWithChapters(story=story, Chapters=Chapters)
     
-    @cache_service.cached(ttl=timedelta(minutes=10), key_prefix="user_Stories")
+    @cache_service.cached(
+        ttl=timedelta(minutes=10),
+        key_prefix="user_Stories",
+        tags=("user:{user_id}",),
+        stale_ttl=timedelta(minutes=5)
+    )
     async def get_user_Stories(self, user_id: uuid.UUID) -> List[Story]:
         """
         Get all Stories for a user with caching.
@@ -123,7 +182,36 @@ class StoryService:
             return Stories
         except Exception as e:
             logger.error(f"Error fetching Stories for user {user_id}: {e}")
-            return []
+            raise
+    
+    async def commit_chapter(
+        self,
+        chapter: Dict,
+        choices: Optional[List[Dict]] = None,
+        selected_choice_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Save a new chapter, its choices and the story's progress atomically.
+        
+        Cached story data is dropped once the commit succeeds, so readers
+        see the new chapter.
+        
+        Args:
+            chapter: Chapter row; must include story_id and chapter_number
+            choices: Choice rows to offer after the chapter
+            selected_choice_id: Database ID of the choice that led here
+            
+        Returns:
+            Dict with the saved chapter, choices, story and selected choice
+        """
+        state = await self.repository.commit_chapter(chapter, choices or [], selected_choice_id)
+        await self.invalidate_story_cache(chapter["story_id"])
+        
+        logger.info(
+            f"Committed chapter {chapter['chapter_number']} of story {chapter['story_id']} "
+            f"with {len(state['choices'])} choices"
+        )
+        return state
     
     async def invalidate_story_cache(self, story_id: int):
         """
@@ -134,9 +222,7 @@ class StoryService:
         """
         logger.info(f"Invalidating cache for story {story_id}")
         
-        await self.cache.clear_pattern(f"story:{story_id}")
-        await self.cache.clear_pattern(f"Chapters:{story_id}")
-        await self.cache.clear_pattern(f"embedding:{story_id}")
+        await self.cache.invalidate_tags(make_tag("story", story_id))
     
     async def invalidate_user_cache(self, user_id: uuid.UUID):
         """
@@ -147,32 +233,7 @@ class StoryService:
         """
         logger.info(f"Invalidating cache for user {user_id}")
         
-        await self.cache.clear_pattern(f"user_Stories:{user_id}")
-    
-    def get_story_sync(self, story_id: int, user_id: Optional[uuid.UUID] = None) -> Optional[Story]:
-        """
-        Synchronous story fetch for compatibility.
-        
-        Args:
-            story_id: Story ID to fetch
-            user_id: Optional user ID for access control
-            
-        Returns:
-            Story object or None if not found
-        """
-        return self.db.get_story_sync(story_id, user_id)
-    
-    def get_Chapters_sync(self, story_id: int) -> List[Chapter]:
-        """
-        Synchronous Chapters fetch for compatibility.
-        
-        Args:
-            story_id: Story ID to fetch Chapters for
-            
-        Returns:
-            List of Chapter objects
-        """
-        return self.db.get_Chapters_sync(story_id)
+        await self.cache.invalidate_tags(make_tag("user", user_id))
     
     async def get_service_stats(self) -> dict:
         """Get service performance statistics."""
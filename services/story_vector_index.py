@@ -0,0 +1,351 @@
+"""
+In-process per-story vector index for chat retrieval.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from config import settings
+from .embedding_index import embedding_index
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+Row = Tuple[str, str, Dict[str, Any], List[float]]
+
+SUMMARY_CHUNK_TYPE = "chapter_summary"
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class StoryVectors:
+    """
+    One story's chunks as a row-normalised matrix plus parallel metadata.
+
+    The matrix is float32, float16 or int8. int8 rows are quantised
+    symmetrically with one float32 scale per row, a quarter of the
+    float32 size; reduced-precision searches over-fetch candidates and
+    re-rank them against full-precision vectors when a source for those
+    is given.
+
+    Chapter-summary rows form a coarse level: a search can first pick
+    the chapters whose summaries best match the query and then score only
+    those chapters' chunks, so its cost tracks the number of chapters
+    picked rather than the length of the story.
+    """
+
+    __slots__ = (
+        "story_id", "matrix", "scales", "ids", "documents", "metadatas",
+        "summary_rows", "chunk_rows", "chapter_rows", "nbytes", "loaded_at"
+    )
+
+    def __init__(self, story_id: str, rows: List[Row], dtype: np.dtype):
+        self.story_id = story_id
+        self.ids = [row[0] for row in rows]
+        self.documents = [row[1] for row in rows]
+        self.metadatas = [row[2] for row in rows]
+
+        summary_rows: List[int] = []
+        chunk_rows: List[int] = []
+        chapter_rows: Dict[str, List[int]] = {}
+        for position, metadata in enumerate(self.metadatas):
+            if metadata.get("chunk_type") == SUMMARY_CHUNK_TYPE:
+                summary_rows.append(position)
+            else:
+                chunk_rows.append(position)
+                chapter_rows.setdefault(str(metadata.get("chapter_id")), []).append(position)
+        self.summary_rows = np.asarray(summary_rows, dtype=np.intp)
+        self.chunk_rows = np.asarray(chunk_rows, dtype=np.intp)
+        self.chapter_rows = {chapter: np.asarray(members, dtype=np.intp) for chapter, members in chapter_rows.items()}
+
+        if rows:
+            matrix = np.asarray([row[3] for row in rows], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        self.scales: Optional[np.ndarray] = None
+        if dtype == np.int8:
+            scales = np.abs(matrix).max(axis=1, keepdims=True) / 127.0 if rows else np.zeros((0, 1), np.float32)
+            scales[scales == 0] = 1.0
+            self.matrix = np.round(matrix / scales).astype(np.int8)
+            self.scales = scales.ravel().astype(np.float32)
+        else:
+            self.matrix = matrix.astype(dtype, copy=False)
+
+        # Vectors plus a rough allowance for the chunk texts
+        self.nbytes = (
+            self.matrix.nbytes
+            + (self.scales.nbytes if self.scales is not None else 0)
+            + sum(len(document) for document in self.documents)
+        )
+        self.loaded_at = time.monotonic()
+
+    @property
+    def exact(self) -> bool:
+        return self.matrix.dtype == np.float32
+
+    def _scores(self, rows: np.ndarray, vector: np.ndarray) -> np.ndarray:
+        """Approximate cosine scores of the given rows."""
+        matrix = self.matrix[rows]
+        if self.scales is not None:
+            return (matrix @ vector) * self.scales[rows]
+        return (matrix @ vector.astype(matrix.dtype, copy=False)).astype(np.float32)
+
+    def select_chapters(self, vector: np.ndarray, top_chapters: int) -> np.ndarray:
+        """
+        Chunk rows of the chapters whose summaries best match the query.
+
+        Chapters without a summary embedding cannot be ranked and are
+        always kept. Returns every chunk row when there is nothing to
+        narrow down.
+        """
+        if top_chapters <= 0 or not len(self.summary_rows) or len(self.chapter_rows) <= top_chapters:
+            return self.chunk_rows
+
+        best = self.summary_rows[_top(self._scores(self.summary_rows, vector), top_chapters)]
+        chosen = {str(self.metadatas[row].get("chapter_id")) for row in best}
+        summarized = {str(self.metadatas[row].get("chapter_id")) for row in self.summary_rows}
+        chosen |= set(self.chapter_rows) - summarized
+        selected = [self.chapter_rows[chapter] for chapter in chosen if chapter in self.chapter_rows]
+        return np.concatenate(selected) if selected else self.chunk_rows
+
+    def search(
+        self,
+        query: List[float],
+        k: int,
+        full_vectors: Optional[Callable[[List[str]], Dict[str, List[float]]]] = None,
+        rerank_factor: int = 4,
+        top_chapters: int = 0
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k chunks by cosine similarity.
+
+        Args:
+            query: Query vector
+            k: Number of chunks to return
+            full_vectors: Returns full-precision vectors for chunk texts;
+                used to re-rank candidates of a reduced-precision matrix
+            rerank_factor: Candidates fetched per result before re-ranking
+            top_chapters: Only search chunks of this many chapters, picked
+                by summary similarity (0 searches every chunk)
+
+        Returns:
+            List of (row, score) pairs, best first
+        """
+        if not len(self.chunk_rows) or k <= 0:
+            return []
+        vector = _normalize(np.asarray(query, dtype=np.float32))
+        rows = self.select_chapters(vector, top_chapters)
+        scores = self._scores(rows, vector)
+
+        rerank = full_vectors is not None and not self.exact
+        candidates = _top(scores, k * max(rerank_factor, 1) if rerank else k)
+        hits = [(int(rows[position]), float(scores[position])) for position in candidates]
+        if not rerank:
+            return hits
+
+        found = full_vectors([self.documents[row] for row, _ in hits])
+        reranked = []
+        for row, score in hits:
+            full = found.get(self.documents[row])
+            if full is not None:
+                score = float(_normalize(np.asarray(full, dtype=np.float32)) @ vector)
+            reranked.append((row, score))
+        reranked.sort(key=lambda hit: hit[1], reverse=True)
+        return reranked[:k]
+
+    def to_documents(self, hits: List[Tuple[int, float]]) -> List[Document]:
+        """Turn search hits into Documents carrying their score."""
+        return [
+            Document(page_content=self.documents[row], metadata={**self.metadatas[row], "score": score})
+            for row, score in hits
+        ]
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class StoryVectorIndex:
+    """
+    Memory-bounded LRU of per-story vector matrices.
+
+    A story's active chunks are loaded from Postgres on its first query
+    and kept in process, so retrieval is one matrix-vector product
+    instead of a PGVector round-trip. Entries are dropped when the story
+    is re-embedded in this process, after ``ttl_seconds`` (to pick up
+    re-embeds done by other workers), and least recently used first when
+    the total size passes ``max_bytes``. Safe to use from threads and
+    from the event loop.
+    """
+
+    def __init__(self, max_bytes: int, dtype: str = "float32", ttl_seconds: float = 300.0):
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.ttl_seconds = ttl_seconds
+        self.index = embedding_index
+        self._entries: "OrderedDict[str, StoryVectors]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _lookup(self, story_id: str) -> Optional[StoryVectors]:
+        with self._lock:
+            entry = self._entries.get(story_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.loaded_at > self.ttl_seconds:
+                self._remove(story_id)
+                return None
+            self._entries.move_to_end(story_id)
+            self.hits += 1
+            return entry
+
+    def _store(self, story_id: str, rows: List[Row]) -> StoryVectors:
+        entry = StoryVectors(story_id, rows, self.dtype)
+        with self._lock:
+            self.loads += 1
+            if story_id in self._entries:
+                self._remove(story_id)
+            if entry.nbytes > self.max_bytes:
+                # Too big to keep; still answers this query
+                return entry
+            self._entries[story_id] = entry
+            self._total_bytes += entry.nbytes
+            while self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        logger.debug(f"Loaded {len(entry.ids)} vectors for story {story_id} ({entry.nbytes} bytes)")
+        return entry
+
+    def _remove(self, story_id: str):
+        entry = self._entries.pop(story_id)
+        self._total_bytes -= entry.nbytes
+
+    def get(self, story_id: Any) -> StoryVectors:
+        """Get a story's vectors, loading them with a blocking query if needed."""
+        story_id = str(story_id)
+        return self._lookup(story_id) or self._store(story_id, self.index.load_vectors_sync(story_id))
+
+    async def aget(self, story_id: Any) -> StoryVectors:
+        """Get a story's vectors, loading them on the async pool if needed."""
+        story_id = str(story_id)
+        return self._lookup(story_id) or self._store(story_id, await self.index.load_vectors(story_id))
+
+    def invalidate(self, story_id: Any):
+        """Drop a story's vectors after its embeddings changed."""
+        with self._lock:
+            if str(story_id) in self._entries:
+                self._remove(str(story_id))
+
+    def clear(self):
+        """Drop every story."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get residency and hit statistics."""
+        with self._lock:
+            return {
+                "stories": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "dtype": self.dtype.name,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
+
+
+class StoryVectorRetriever(BaseRetriever):
+    """Retriever answering top-k for one story from the in-process index."""
+
+    vector_index: Any
+    embeddings: Embeddings
+    story_id: str
+    k: int = 5
+    rerank_factor: int = 4
+    top_chapters: int = 0
+
+    def _search(self, vectors: StoryVectors, query_vector: List[float]) -> List[Document]:
+        # A cached embeddings wrapper holds the full-precision chunk vectors
+        full_vectors = getattr(self.embeddings, "lookup", None)
+        hits = vectors.search(query_vector, self.k, full_vectors, self.rerank_factor, self.top_chapters)
+        return vectors.to_documents(hits)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vectors = self.vector_index.get(self.story_id)
+        if not vectors.ids:
+            return []
+        return self._search(vectors, self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vectors = await self.vector_index.aget(self.story_id)
+        if not vectors.ids:
+            return []
+        return self._search(vectors, await self.embeddings.aembed_query(query))
+
+
+class StorySQLRetriever(BaseRetriever):
+    """Retriever running the coarse-to-fine, half-precision search in Postgres."""
+
+    index: Any
+    embeddings: Embeddings
+    story_id: str
+    k: int = 5
+    rerank_factor: int = 4
+    top_chapters: int = 0
+
+    @staticmethod
+    def _documents(rows: List[Tuple[str, str, Dict[str, Any], float]]) -> List[Document]:
+        return [
+            Document(page_content=document, metadata={**metadata, "score": float(score)})
+            for _, document, metadata, score in rows
+        ]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        rows = self.index.search_sync(
+            self.story_id, self.embeddings.embed_query(query), self.k, self.k * self.rerank_factor,
+            self.top_chapters
+        )
+        return self._documents(rows)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        rows = await self.index.search(
+            self.story_id, await self.embeddings.aembed_query(query), self.k, self.k * self.rerank_factor,
+            self.top_chapters
+        )
+        return self._documents(rows)
+
+
+# Global story vector index instance
+story_vector_index = StoryVectorIndex(
+    settings.STORY_VECTOR_INDEX_MAX_BYTES,
+    dtype=settings.STORY_VECTOR_INDEX_DTYPE,
+    ttl_seconds=settings.STORY_VECTOR_INDEX_TTL_SECONDS
+)
@@ -0,0 +1,90 @@
+"""
+Blocking access to the async data-access layer, for scripts.
+"""
+
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from models.story_models import Story, Chapter
+from .database_service import DatabaseService
+from .loop_guard import assert_not_on_event_loop
+
+
+class SyncDatabaseAdapter:
+    """
+    Synchronous facade over DatabaseService for scripts and CLIs.
+
+    Calls run on a private event loop owned by a single worker thread,
+    with a DatabaseService (and asyncpg pool) of its own, so scripts use
+    the same queries as the application without any psycopg code paths.
+    It must not be used from async code: calls made on an event loop
+    thread are refused by the blocking-call guard.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._db: Optional[DatabaseService] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-db")
+                self._executor.submit(self._create_loop).result()
+            return self._executor
+
+    def _create_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._db = DatabaseService()
+
+    def run(self, call: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Run ``call(db, *args, **kwargs)`` to completion and return its result.
+
+        Args:
+            call: Coroutine function taking the adapter's DatabaseService first
+        """
+        assert_not_on_event_loop("SyncDatabaseAdapter.run")
+        executor = self._start()
+        return executor.submit(
+            lambda: self._loop.run_until_complete(call(self._db, *args, **kwargs))
+        ).result()
+
+    def get_story(self, story_id: int, user_id: Optional[uuid.UUID] = None) -> Optional[Story]:
+        """Get story by ID."""
+        return self.run(DatabaseService.get_story_async, story_id, user_id)
+
+    def get_stories(self, story_ids: List[int], user_id: Optional[uuid.UUID] = None) -> Dict[int, Story]:
+        """Get several Stories by ID."""
+        return self.run(DatabaseService.get_stories_async, story_ids, user_id)
+
+    def get_Chapters(self, story_id: int) -> List[Chapter]:
+        """Get all Chapters for a story."""
+        return self.run(DatabaseService.get_Chapters_async, story_id)
+
+    def get_user_Stories(self, user_id: uuid.UUID) -> List[Story]:
+        """Get all Stories for a user."""
+        return self.run(DatabaseService.get_user_Stories_async, user_id)
+
+    def close(self):
+        """Close the pool and stop the worker thread."""
+        with self._lock:
+            if self._executor is None:
+                return
+            executor, self._executor = self._executor, None
+        executor.submit(lambda: self._loop.run_until_complete(self._db.close_async_pool())).result()
+        executor.submit(self._loop.close).result()
+        executor.shutdown()
+        self._loop = None
+        self._db = None
+
+    def __enter__(self) -> "SyncDatabaseAdapter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,439 @@
+"""
+Storage layout management for PGVector's embedding table: column typing,
+ANN indexes, search-time tuning and story partitioning.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from .database_service import db_service
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+LEGACY_TABLE = "langchain_pg_embedding_legacy"
+STAGING_TABLE = "langchain_pg_embedding_partitioned"
+
+# PGVector's default distance strategy is cosine
+_OPCLASS = "vector_cosine_ops"
+_HALF_OPCLASS = "halfvec_cosine_ops"
+
+_INDEX_METHODS = ("hnsw", "ivfflat")
+_PRECISIONS = ("full", "half")
+
+_DESCRIBE_SQL = """
+SELECT
+    (SELECT extversion FROM pg_extension WHERE extname = 'vector') AS pgvector_version,
+    format_type(a.atttypid, a.atttypmod) AS embedding_type,
+    c.relkind = 'p' AS partitioned,
+    (SELECT count(*) FROM pg_inherits WHERE inhparent = c.oid) AS partitions
+FROM pg_class c
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = 'embedding'
+WHERE c.oid = to_regclass($1)
+"""
+
+_INDEXES_SQL = """
+SELECT i.relname AS name, am.amname AS method, pg_relation_size(i.oid) AS bytes
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_am am ON am.oid = i.relam
+WHERE x.indrelid = to_regclass($1)
+ORDER BY i.relname
+"""
+
+_COLLECTION_ROWS_SQL = f"""
+SELECT c.name, count(e.id) AS rows
+FROM langchain_pg_collection c
+LEFT JOIN {EMBEDDING_TABLE} e ON e.collection_id = c.uuid
+GROUP BY c.name
+ORDER BY c.name
+"""
+
+# ANN indexes with what is needed to rebuild them on another table
+_ANN_INDEXES_SQL = """
+SELECT am.amname AS method, i.reloptions AS options,
+       position('halfvec' in pg_get_indexdef(i.oid)) > 0 AS half
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_am am ON am.oid = i.relam
+WHERE x.indrelid = to_regclass($1) AND am.amname = ANY($2::text[])
+ORDER BY i.relname
+"""
+
+# Indexes of a table and of its partitions
+_RELATION_INDEXES_SQL = """
+SELECT i.relname
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+WHERE x.indrelid = to_regclass($1)
+   OR x.indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass($1))
+ORDER BY i.relname
+"""
+
+_PARTITIONS_SQL = """
+SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = to_regclass($1)
+ORDER BY c.relname
+"""
+
+
+def ann_index_name(method: str, table: str = EMBEDDING_TABLE, precision: str = "full") -> str:
+    suffix = "_half" if precision == "half" else ""
+    return f"idx_{table}_{method}{suffix}"
+
+
+def _ann_rebuild_options(row: Any) -> Dict[str, Any]:
+    """create_ann_index() arguments reproducing an existing ANN index."""
+    options: Dict[str, Any] = {"method": row["method"], "precision": "half" if row["half"] else "full"}
+    for option in row["options"] or []:
+        key, _, value = option.partition("=")
+        if key in ("m", "ef_construction", "lists"):
+            options[key] = int(value)
+    return options
+
+
+def half_expression(dimensions: Optional[int] = None) -> str:
+    """
+    The half-precision view of the embedding column.
+
+    Indexing this expression (pgvector 0.7+) halves the ANN index while
+    the table keeps full-precision vectors for re-ranking; queries must
+    order by the identical expression to use the index.
+    """
+    return f"(embedding::halfvec({int(dimensions or settings.VECTOR_DIMENSIONS)}))"
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if rows > 1_000_000:
+        return int(math.sqrt(rows))
+    return max(rows // 1000, 10)
+
+
+def search_session_options() -> Dict[str, str]:
+    """
+    Session settings for ANN searches, from configuration.
+
+    Unset values keep the server defaults. ``hnsw.iterative_scan`` needs
+    pgvector 0.8+; it lets filtered searches keep scanning the graph
+    until ``k`` matches are found instead of returning fewer.
+    """
+    options = {}
+    if settings.VECTOR_HNSW_EF_SEARCH:
+        options["hnsw.ef_search"] = str(settings.VECTOR_HNSW_EF_SEARCH)
+    if settings.VECTOR_IVFFLAT_PROBES:
+        options["ivfflat.probes"] = str(settings.VECTOR_IVFFLAT_PROBES)
+    if settings.VECTOR_ITERATIVE_SCAN:
+        options["hnsw.iterative_scan"] = settings.VECTOR_ITERATIVE_SCAN
+        options["ivfflat.iterative_scan"] = "relaxed_order"
+    return options
+
+
+def pgvector_options() -> Dict[str, Any]:
+    """Extra PGVector constructor arguments: a typed column and search tuning."""
+    options: Dict[str, Any] = {"embedding_length": settings.VECTOR_DIMENSIONS}
+    session = search_session_options()
+    if session:
+        startup = " ".join(f"-c {name}={value}" for name, value in session.items())
+        options["engine_args"] = {"connect_args": {"options": startup}}
+    return options
+
+
+class VectorStorageManager:
+    """
+    Manages how embeddings are laid out and indexed in Postgres.
+
+    PGVector creates ``langchain_pg_embedding`` with an untyped vector
+    column and no ANN index, shared by every story. This manager types
+    the column, builds and drops HNSW/IVFFlat indexes (per partition when
+    the table is partitioned) and migrates the table to hash partitions
+    on ``cmetadata->>'story_id'``, so story-scoped queries are pruned to
+    one partition and its own, smaller ANN index.
+
+    DDL here is slow on large tables; it is meant to be run from
+    ``scripts/migrate_vector_storage.py``, not on the request path.
+    """
+
+    def __init__(self):
+        self.db = db_service
+
+    async def describe(self) -> Dict[str, Any]:
+        """
+        Report the current layout.
+
+        Returns:
+            Dictionary with pgvector version, column type, partitioning,
+            indexes and rows per collection
+        """
+        async with self.db.get_async_connection() as conn:
+            layout = await conn.fetchrow(_DESCRIBE_SQL, EMBEDDING_TABLE)
+            if layout is None:
+                return {"exists": False}
+            indexes = await conn.fetch(_INDEXES_SQL, EMBEDDING_TABLE)
+            collections = await conn.fetch(_COLLECTION_ROWS_SQL)
+        return {
+            "exists": True,
+            **dict(layout),
+            "indexes": [dict(row) for row in indexes],
+            "collections": {row["name"]: row["rows"] for row in collections},
+            "search_session_options": search_session_options()
+        }
+
+    async def set_dimensions(self, dimensions: int) -> bool:
+        """
+        Type the embedding column as ``vector(dimensions)``.
+
+        ANN indexes require a typed column. Refuses (returns False) if any
+        stored vector has a different length.
+        """
+        async with self.db.get_maintenance_connection() as conn:
+            mismatched = await conn.fetchval(
+                f"SELECT count(*) FROM {EMBEDDING_TABLE} WHERE vector_dims(embedding) <> $1", dimensions
+            )
+            if mismatched:
+                logger.error(f"{mismatched} embeddings are not {dimensions}-dimensional; column left untyped")
+                return False
+            await conn.execute(
+                f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({dimensions})"
+            )
+        logger.info(f"Typed {EMBEDDING_TABLE}.embedding as vector({dimensions})")
+        return True
+
+    def _index_options(self, method: str, rows: int, m: int, ef_construction: int, lists: Optional[int]) -> str:
+        if method == "hnsw":
+            return f"(m = {int(m)}, ef_construction = {int(ef_construction)})"
+        return f"(lists = {int(lists or ivfflat_lists(rows))})"
+
+    async def create_ann_index(
+        self,
+        method: str = "hnsw",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        precision: str = "full"
+    ) -> str:
+        """
+        Build an ANN index on the embedding column.
+
+        Plain tables are indexed ``CONCURRENTLY``. Partitioned tables get
+        the index declared on the parent only, built concurrently on each
+        partition and attached, so writes are never blocked either way.
+
+        Args:
+            method: "hnsw" (better recall/latency, slower build) or "ivfflat"
+            m: HNSW graph degree
+            ef_construction: HNSW build-time candidate list size
+            lists: IVFFlat list count (derived from the row count if omitted)
+            precision: "full" to index the vectors as stored, "half" to
+                index their half-precision form at half the size
+
+        Returns:
+            Name of the index
+        """
+        if method not in _INDEX_METHODS:
+            raise ValueError(f"Unknown vector index method '{method}'; expected one of {_INDEX_METHODS}")
+        if precision not in _PRECISIONS:
+            raise ValueError(f"Unknown vector index precision '{precision}'; expected one of {_PRECISIONS}")
+        name = ann_index_name(method, precision=precision)
+        key = f"{half_expression()} {_HALF_OPCLASS}" if precision == "half" else f"embedding {_OPCLASS}"
+
+        async with self.db.get_maintenance_connection() as conn:
+            rows = await conn.fetchval(f"SELECT count(*) FROM {EMBEDDING_TABLE}")
+            options = self._index_options(method, rows, m, ef_construction, lists)
+            # Index builds are memory hungry; give this session more room
+            await conn.execute("SET maintenance_work_mem = '512MB'")
+
+            partitions = [row["relname"] for row in await conn.fetch(_PARTITIONS_SQL, EMBEDDING_TABLE)]
+            if not partitions:
+                await conn.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON {EMBEDDING_TABLE} '
+                    f"USING {method} ({key}) WITH {options}"
+                )
+            else:
+                await conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{name}" ON ONLY {EMBEDDING_TABLE} '
+                    f"USING {method} ({key}) WITH {options}"
+                )
+                for partition in partitions:
+                    partition_index = ann_index_name(method, partition, precision)
+                    await conn.execute(
+                        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{partition_index}" ON {partition} '
+                        f"USING {method} ({key}) WITH {options}"
+                    )
+                    attached = await conn.fetchval(
+                        "SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass($1))",
+                        partition_index
+                    )
+                    if not attached:
+                        await conn.execute(f'ALTER INDEX "{name}" ATTACH PARTITION "{partition_index}"')
+            await conn.execute(f"ANALYZE {EMBEDDING_TABLE}")
+
+        logger.info(f"Built {method} index {name} over {rows} embeddings {options}")
+        return name
+
+    async def drop_ann_index(self, method: str, precision: str = "full") -> None:
+        """Drop an ANN index (and its per-partition children)."""
+        if method not in _INDEX_METHODS:
+            raise ValueError(f"Unknown vector index method '{method}'; expected one of {_INDEX_METHODS}")
+        async with self.db.get_maintenance_connection() as conn:
+            await conn.execute(f'DROP INDEX IF EXISTS "{ann_index_name(method, precision=precision)}"')
+
+    async def partition_by_story(
+        self,
+        partitions: int = 16,
+        dimensions: Optional[int] = None,
+        batch_size: int = 5000
+    ) -> Dict[str, Any]:
+        """
+        Move the embedding table onto hash partitions of ``story_id``.
+
+        Rows are copied into a partitioned staging table in id order, in
+        batches, while the application keeps running. The final catch-up
+        and the table swap happen in one short transaction that locks the
+        old table against writes. The old table is kept as
+        ``langchain_pg_embedding_legacy`` for rollback, with its indexes
+        renamed to match; the new table and its partitions and indexes take
+        the canonical names, and any ANN index the old table had is rebuilt
+        on the partitions afterwards.
+
+        Postgres cannot enforce a unique ``id`` across expression
+        partitions, so ``id`` gets a plain index; the application's COPY
+        writer already deletes an id before rewriting it.
+
+        Args:
+            partitions: Number of hash partitions
+            dimensions: Vector dimensions for the typed column
+            batch_size: Rows copied per batch
+
+        Returns:
+            Dictionary with rows copied and the new layout
+        """
+        dimensions = dimensions or settings.VECTOR_DIMENSIONS
+        copied = 0
+
+        async with self.db.get_maintenance_connection() as conn:
+            layout = await conn.fetchrow(_DESCRIBE_SQL, EMBEDDING_TABLE)
+            if layout is None:
+                raise ValueError(f"{EMBEDDING_TABLE} does not exist")
+            if layout["partitioned"]:
+                logger.info(f"{EMBEDDING_TABLE} is already partitioned")
+                return {"status": "already_partitioned", "partitions": layout["partitions"]}
+            if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", LEGACY_TABLE):
+                raise ValueError(f"{LEGACY_TABLE} already exists; drop it before migrating again")
+
+            await conn.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            await conn.execute(f"""
+                CREATE TABLE {STAGING_TABLE} (
+                    id VARCHAR NOT NULL,
+                    collection_id UUID REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+                    embedding vector({int(dimensions)}),
+                    document VARCHAR,
+                    cmetadata JSONB
+                ) PARTITION BY HASH ((cmetadata->>'story_id'))
+            """)
+            for remainder in range(partitions):
+                await conn.execute(
+                    f"CREATE TABLE {STAGING_TABLE}_p{remainder} PARTITION OF {STAGING_TABLE} "
+                    f"FOR VALUES WITH (MODULUS {int(partitions)}, REMAINDER {remainder})"
+                )
+            await conn.execute(f'CREATE INDEX "idx_{STAGING_TABLE}_id" ON {STAGING_TABLE} (id)')
+            await conn.execute(
+                f'CREATE INDEX "idx_{STAGING_TABLE}_story_id" ON {STAGING_TABLE} '
+                "((cmetadata->>'story_id'), collection_id)"
+            )
+            await conn.execute(
+                f'CREATE INDEX "idx_{STAGING_TABLE}_cmetadata_gin" ON {STAGING_TABLE} '
+                "USING gin (cmetadata jsonb_path_ops)"
+            )
+
+            last_id = ""
+            while True:
+                batch_last = await conn.fetchval(
+                    f"SELECT max(id) FROM (SELECT id FROM {EMBEDDING_TABLE} "
+                    "WHERE id > $1 ORDER BY id LIMIT $2) batch",
+                    last_id, batch_size
+                )
+                if batch_last is None:
+                    break
+                status = await conn.execute(
+                    f"INSERT INTO {STAGING_TABLE} SELECT id, collection_id, embedding, document, cmetadata "
+                    f"FROM {EMBEDDING_TABLE} WHERE id > $1 AND id <= $2",
+                    last_id, batch_last
+                )
+                copied += int(status.split()[-1])
+                last_id = batch_last
+                logger.info(f"Copied {copied} embeddings into {STAGING_TABLE}")
+
+            async with conn.transaction():
+                await conn.execute(f"LOCK TABLE {EMBEDDING_TABLE} IN EXCLUSIVE MODE")
+                # Catch up with writes and deletes made while copying. The
+                # COPY writer rewrites a chunk under the same id, so rows
+                # copied before a rewrite are replaced, not just missing ones.
+                await conn.execute(
+                    f"DELETE FROM {STAGING_TABLE} s WHERE NOT EXISTS "
+                    f"(SELECT 1 FROM {EMBEDDING_TABLE} e WHERE e.id = s.id)"
+                )
+                await conn.execute(
+                    f"DELETE FROM {STAGING_TABLE} s USING {EMBEDDING_TABLE} e WHERE e.id = s.id "
+                    "AND (s.collection_id, s.document, s.cmetadata, s.embedding) "
+                    "IS DISTINCT FROM (e.collection_id, e.document, e.cmetadata, e.embedding)"
+                )
+                status = await conn.execute(
+                    f"INSERT INTO {STAGING_TABLE} SELECT id, collection_id, embedding, document, cmetadata "
+                    f"FROM {EMBEDDING_TABLE} e WHERE NOT EXISTS "
+                    f"(SELECT 1 FROM {STAGING_TABLE} s WHERE s.id = e.id)"
+                )
+                copied += int(status.split()[-1])
+
+                ann_indexes = [
+                    _ann_rebuild_options(row)
+                    for row in await conn.fetch(_ANN_INDEXES_SQL, EMBEDDING_TABLE, list(_INDEX_METHODS))
+                ]
+                # Index names are schema-wide: move the old table's names
+                # out of the way and give the new table the canonical ones,
+                # so later CREATE INDEX IF NOT EXISTS calls hit this table
+                await self._rename_relations(conn, EMBEDDING_TABLE, EMBEDDING_TABLE, LEGACY_TABLE)
+                await conn.execute(f"ALTER TABLE {EMBEDDING_TABLE} RENAME TO {LEGACY_TABLE}")
+                await self._rename_relations(conn, STAGING_TABLE, STAGING_TABLE, EMBEDDING_TABLE)
+                await conn.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO {EMBEDDING_TABLE}")
+            await conn.execute(f"ANALYZE {EMBEDDING_TABLE}")
+
+        logger.info(f"Partitioned {EMBEDDING_TABLE} into {partitions} partitions ({copied} rows)")
+
+        # Rebuild the ANN indexes the old table had, per partition
+        rebuilt = [await self.create_ann_index(**options) for options in ann_indexes]
+        return {
+            "status": "partitioned",
+            "partitions": partitions,
+            "rows_copied": copied,
+            "ann_indexes": rebuilt
+        }
+
+    async def _rename_relations(self, conn, table: str, old: str, new: str) -> None:
+        """
+        Rename a table's indexes and partitions from ``old`` to ``new``.
+
+        Only names containing ``old`` are changed, at its first occurrence.
+        """
+        indexes = [row["relname"] for row in await conn.fetch(_RELATION_INDEXES_SQL, table)]
+        partitions = [row["relname"] for row in await conn.fetch(_PARTITIONS_SQL, table)]
+        for kind, names in (("INDEX", indexes), ("TABLE", partitions)):
+            for name in names:
+                if old in name:
+                    await conn.execute(f'ALTER {kind} "{name}" RENAME TO "{name.replace(old, new, 1)}"')
+
+    async def drop_legacy_table(self) -> None:
+        """Drop the pre-partitioning table once the new layout is verified."""
+        async with self.db.get_maintenance_connection() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
+
+    async def list_partitions(self) -> List[str]:
+        """Names of the embedding table's partitions (empty when not partitioned)."""
+        async with self.db.get_async_connection() as conn:
+            return [row["relname"] for row in await conn.fetch(_PARTITIONS_SQL, EMBEDDING_TABLE)]
+
+
+# Global vector storage manager instance
+vector_storage = VectorStorageManager()
@@ -0,0 +1,105 @@
+"""
+Bulk writer for PGVector's embedding table using binary COPY.
+"""
+
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from .database_service import db_service
+from logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_EMBEDDING_COLUMNS = ["id", "collection_id", "embedding", "document", "cmetadata"]
+
+_COLLECTION_SQL = "SELECT uuid FROM langchain_pg_collection WHERE name = $1"
+
+_DELETE_IDS_SQL = "DELETE FROM langchain_pg_embedding WHERE id = ANY($1::varchar[])"
+
+
+class PgVectorCopyWriter:
+    """
+    Streams embeddings into ``langchain_pg_embedding`` with binary COPY.
+
+    Rows are written in the same layout PGVector uses (string id,
+    collection uuid, vector, document, jsonb metadata), so PGVector reads
+    them back unchanged. Each call runs in one transaction on a pooled
+    connection: rows with the same ids are deleted first, which gives
+    PGVector's upsert-by-id behaviour without per-row INSERTs.
+    """
+
+    def __init__(self, collection_name: Optional[str] = None):
+        self.db = db_service
+        self.collection_name = collection_name or settings.VECTOR_COLLECTION_NAME
+        self._collection_id: Optional[uuid.UUID] = None
+        self.rows_written = 0
+        self.copy_seconds = 0.0
+
+    async def _get_collection_id(self, conn) -> uuid.UUID:
+        """Look up (once) the uuid of the collection rows belong to."""
+        if self._collection_id is None:
+            collection_id = await conn.fetchval(_COLLECTION_SQL, self.collection_name)
+            if collection_id is None:
+                raise ValueError(f"Vector collection '{self.collection_name}' does not exist")
+            self._collection_id = collection_id
+        return self._collection_id
+
+    async def aadd_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Write precomputed embeddings.
+
+        Args:
+            texts: Chunk texts
+            embeddings: One vector per text
+            metadatas: One metadata dict per text
+            ids: One row id per text (random ids if omitted)
+
+        Returns:
+            Row ids written, in order
+        """
+        if not texts:
+            return []
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+
+        started = time.perf_counter()
+        async with self.db.get_async_connection() as conn:
+            collection_id = await self._get_collection_id(conn)
+            records = (
+                (row_id, collection_id, vector, text, json.dumps(metadata))
+                for row_id, vector, text, metadata in zip(ids, embeddings, texts, metadatas)
+            )
+            async with conn.transaction():
+                await conn.execute(_DELETE_IDS_SQL, ids)
+                await conn.copy_records_to_table(
+                    "langchain_pg_embedding",
+                    records=records,
+                    columns=_EMBEDDING_COLUMNS
+                )
+
+        elapsed = time.perf_counter() - started
+        self.rows_written += len(ids)
+        self.copy_seconds += elapsed
+        logger.debug(f"Copied {len(ids)} embeddings in {elapsed:.3f}s")
+        return ids
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get write statistics."""
+        return {
+            "rows_written": self.rows_written,
+            "copy_seconds": round(self.copy_seconds, 3),
+            "rows_per_second": round(self.rows_written / self.copy_seconds, 1) if self.copy_seconds else 0.0
+        }
+
+
+# Global vector writer instance
+vector_writer = PgVectorCopyWriter()
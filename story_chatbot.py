@@ -18,12 +18,13 @@ Architecture:
 - Memory management for context-aware conversations
 """
 
+import asyncio
 from typing import Dict, Any, Optional, List
 from enum import Enum
 from dataclasses import dataclass
 import traceback
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 from langchain_postgres import PGVector
@@ -32,6 +33,10 @@ from supabase import create_client, Client
 # Local imports
 from config import settings
 from logger_config import logger
+from services.embedding_index import embedding_index, search_filter
+from services.embedding_cache import CachedEmbeddings, create_openai_embeddings
+from services.story_vector_index import StorySQLRetriever, StoryVectorRetriever, story_vector_index
+from services.vector_storage import pgvector_options
 from exceptions import (
     ChatbotError, AuthorizationError, StoryNotFoundError,
     VectorStoreError, DatabaseConnectionError
@@ -157,7 +162,7 @@ User message: "{message}"
 Respond with only the intent category (one word): query, modify, multiverse, or other
 """
     
-    def classify(self, message: str) -> IntentType:
+    async def classify(self, message: str) -> IntentType:
         """
         Classify a user message into an intent type.
         
@@ -172,7 +177,7 @@ Respond with only the intent category (one word): query, modify, multiverse, or
         """
         try:
             prompt = self._classification_prompt.format(message=message)
-            response = self.llm.invoke(prompt)
+            response = await self.llm.ainvoke(prompt)
             intent_str = response.content.strip().lower()
             
             # Map string response to enum
@@ -203,6 +208,7 @@ class VectorStoreManager:
     def __init__(self):
         """Initialize the vector store manager."""
         self.vectorstore: Optional[PGVector] = None
+        self.embeddings: Optional[CachedEmbeddings] = None
         self._initialize_vectorstore()
     
     def _initialize_vectorstore(self) -> None:
@@ -214,13 +220,16 @@ class VectorStoreManager:
         """
         try:
             connection_string = settings.get_postgres_connection_string()
-            embeddings = OpenAIEmbeddings(openai_api_key=settings.OPENAI_API_KEY)
+            # Cached wrapper, so reduced-precision searches can re-rank
+            # against the full-precision chunk vectors
+            self.embeddings = create_openai_embeddings()
             
             self.vectorstore = PGVector(
-                embeddings=embeddings,
+                embeddings=self.embeddings,
                 connection=connection_string,
                 collection_name=settings.VECTOR_COLLECTION_NAME,
-                use_jsonb=True
+                use_jsonb=True,
+                **pgvector_options()
             )
             
             logger.info("Vector store initialized successfully")
@@ -229,7 +238,7 @@ class VectorStoreManager:
             logger.error(f"Failed to initialize vector store: {e}")
             raise VectorStoreError(f"Vector store initialization failed: {e}")
     
-    def get_retriever(self, story_id: str, k: int = None):
+    async def get_retriever(self, story_id: str, k: int = None):
         """
         Get a retriever configured for a specific story.
         
@@ -248,11 +257,40 @@ class VectorStoreManager:
         
         search_k = k or settings.VECTOR_SEARCH_K
         
+        if settings.STORY_VECTOR_INDEX_ENABLED:
+            # Stories are small enough to search in process
+            return StoryVectorRetriever(
+                vector_index=story_vector_index,
+                embeddings=self.embeddings,
+                story_id=str(story_id),
+                k=search_k,
+                rerank_factor=settings.VECTOR_RERANK_FACTOR,
+                top_chapters=settings.VECTOR_COARSE_CHAPTERS
+            )
+        
+        if settings.VECTOR_SEARCH_PRECISION == "half":
+            return StorySQLRetriever(
+                index=embedding_index,
+                embeddings=self.embeddings,
+                story_id=str(story_id),
+                k=search_k,
+                rerank_factor=settings.VECTOR_RERANK_FACTOR,
+                top_chapters=settings.VECTOR_COARSE_CHAPTERS
+            )
+        
         try:
+            # Only search the story's active embedding generation; without
+            # it a half-written re-index would mix into the results, so a
+            # failed lookup fails the retriever. The PGVector retriever
+            # filters on metadata alone, so this path scores every chunk of
+            # the story (no coarse chapter pass).
+            generation = await embedding_index.active_generation(story_id)
+            story_filter = search_filter(story_id, generation)
+            
             return self.vectorstore.as_retriever(
                 search_kwargs={
                     "k": search_k,
-                    "filter": {"story_id": story_id}
+                    "filter": story_filter
                 }
             )
         except Exception as e:
@@ -296,7 +334,7 @@ class StoryChatbot:
             logger.error(f"Failed to initialize story chatbot: {e}")
             raise ChatbotError(f"Chatbot initialization failed: {e}")
     
-    def chat(
+    async def chat(
         self,
         user_id: str,
         story_id: str,
@@ -323,7 +361,7 @@ class StoryChatbot:
         
         try:
             # Validate user owns the story
-            if not self._validate_story_ownership(user_id, story_id):
+            if not await self._validate_story_ownership(user_id, story_id):
                 return ChatResponse(
                     type="error",
                     content="You do not have access to this story.",
@@ -331,11 +369,11 @@ class StoryChatbot:
                 ).__dict__
             
             # Classify user intent
-            intent = self.intent_classifier.classify(message)
+            intent = await self.intent_classifier.classify(message)
             
             # Route to appropriate handler
             if intent == IntentType.QUERY:
-                return self._handle_query(user_id, story_id, message)
+                return await self._handle_query(user_id, story_id, message)
             elif intent == IntentType.MODIFY:
                 return self._handle_modify(user_id, story_id, message)
             elif intent == IntentType.MULTIVERSE:
@@ -353,7 +391,7 @@ class StoryChatbot:
                 metadata={"error": str(e)}
             ).__dict__
     
-    def _validate_story_ownership(self, user_id: str, story_id: str) -> bool:
+    async def _validate_story_ownership(self, user_id: str, story_id: str) -> bool:
         """
         Validate that a user owns a specific story.
         
@@ -368,9 +406,11 @@ class StoryChatbot:
             DatabaseConnectionError: If database query fails.
         """
         try:
-            result = self.supabase.table("Stories").select("id").eq(
+            # The Supabase client is blocking; keep it off the event loop
+            query = self.supabase.table("Stories").select("id").eq(
                 "id", story_id
-            ).eq("user_id", user_id).single().execute()
+            ).eq("user_id", user_id).single()
+            result = await asyncio.to_thread(query.execute)
             
             return bool(result.data)
             
@@ -378,7 +418,7 @@ class StoryChatbot:
             logger.error(f"Story ownership validation failed: {e}")
             raise DatabaseConnectionError(f"Failed to validate story ownership: {e}")
     
-    def _handle_query(self, user_id: str, story_id: str, message: str) -> Dict[str, Any]:
+    async def _handle_query(self, user_id: str, story_id: str, message: str) -> Dict[str, Any]:
         """
         Handle story content queries using RAG.
         
@@ -394,7 +434,7 @@ class StoryChatbot:
         
         try:
             # Get retriever for the story
-            retriever = self.vector_manager.get_retriever(story_id)
+            retriever = await self.vector_manager.get_retriever(story_id)
             
             # Get conversational memory
             memory = self.memory_manager.get_memory(user_id, story_id)
@@ -408,8 +448,9 @@ class StoryChatbot:
                 output_key="answer"
             )
             
-            # Process the query
-            result = chain.invoke({"question": message})
+            # Process the query; the async path keeps retrieval on the
+            # async pool instead of blocking the event loop
+            result = await chain.ainvoke({"question": message})
             
             # Extract unique chapter sources (not individual chunks)
             raw_sources = result.get("source_documents", [])
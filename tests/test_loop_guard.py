@@ -0,0 +1,121 @@
+"""
+Blocking database calls are refused on the event loop, and async story
+reads never touch the psycopg path.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import psycopg
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+from services.database_service import DatabaseService, db_service
+from services.loop_guard import BlockingCallError
+from services.story_service import StoryService
+from services.story_vector_index import StorySQLRetriever
+
+
+class FakeConnection:
+    """asyncpg connection stand-in for a database where every table exists but is empty."""
+
+    def __init__(self):
+        self.queries = []
+
+    async def fetch(self, query, *args):
+        self.queries.append(query)
+        if "to_regclass" in query:
+            return [{"name": name, "present": True} for name in args[0]]
+        return []
+
+    async def fetchrow(self, query, *args):
+        self.queries.append(query)
+        return None
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+class FakeIndex:
+    """Embedding index whose blocking search must not be used on the loop."""
+
+    def search_sync(self, *args):
+        raise AssertionError("search_sync called")
+
+    async def search(self, story_id, query_vector, k, candidates, top_chapters=0):
+        return [("chunk-1", "The dragon wakes.", {"story_id": story_id, "chapter_id": "7"}, 0.9)]
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+@pytest.fixture
+def guard_error(monkeypatch):
+    monkeypatch.setattr(settings, "BLOCKING_CALL_GUARD", "error")
+
+
+@pytest.fixture
+def no_psycopg(monkeypatch):
+    def connect(*args, **kwargs):
+        raise AssertionError("psycopg.connect called")
+    monkeypatch.setattr(psycopg, "connect", connect)
+
+
+@pytest.fixture
+def story_service(monkeypatch):
+    database = DatabaseService()
+    pool = FakePool()
+    database._async_pool = pool
+    service = StoryService()
+    monkeypatch.setattr(service, "db", database)
+    return service, pool.connection
+
+
+def test_sync_connection_refused_on_event_loop(guard_error, no_psycopg):
+    async def connect_on_loop():
+        db_service.get_sync_connection()
+
+    with pytest.raises(BlockingCallError):
+        asyncio.run(connect_on_loop())
+
+
+def test_sync_connection_allowed_off_event_loop(guard_error, monkeypatch):
+    connection = object()
+    monkeypatch.setattr(psycopg, "connect", lambda *args, **kwargs: connection)
+
+    assert db_service.get_sync_connection() is connection
+
+
+def test_missing_story_read_stays_async(guard_error, no_psycopg, story_service):
+    service, connection = story_service
+
+    async def read_missing_story():
+        return await service.get_story(-101), await service.get_Chapters(-101)
+
+    story, chapters = asyncio.run(read_missing_story())
+
+    assert story is None
+    assert chapters == []
+    # Discovery, then one lookup per story table and chapter table
+    assert len(connection.queries) == 5
+
+
+def test_sql_retriever_searches_on_the_async_pool(guard_error):
+    retriever = StorySQLRetriever(index=FakeIndex(), embeddings=FakeEmbeddings(), story_id="42", k=1)
+
+    documents = asyncio.run(retriever.ainvoke("Who wakes?"))
+
+    assert [document.page_content for document in documents] == ["The dragon wakes."]
+    assert documents[0].metadata["score"] == 0.9